@@ -8,6 +8,8 @@ def run_commit(
     config: Optional[str] = None,
     repo: Optional[str] = None,
     language: Optional[str] = None,
+    fresh: bool = False,
+    deadline: Optional[float] = None,
 ) -> None:
     from cmai.cli.session import CommitSession
 
@@ -16,6 +18,8 @@ def run_commit(
         config=config,
         repo=repo,
         language=language,
+        fresh=fresh,
+        deadline=deadline,
     )
 
 
@@ -30,11 +34,25 @@ def run_commit(
 @click.option(
     "--language", "-l", help="The language for the response", default=None, type=str
 )
+@click.option(
+    "--fresh",
+    is_flag=True,
+    default=False,
+    help="Ignore cached commit messages for the staged changes",
+)
+@click.option(
+    "--deadline",
+    help="Seconds to wait for a message before falling back to local heuristics",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+)
 def commit_command(
     message: str,
     config: Optional[str] = None,
     repo: Optional[str] = None,
     language: Optional[str] = None,
+    fresh: bool = False,
+    deadline: Optional[float] = None,
 ) -> None:
     """Normalize informal commit messages"""
     try:
@@ -43,6 +61,8 @@ def commit_command(
             config=config,
             repo=repo,
             language=language,
+            fresh=fresh,
+            deadline=deadline,
         )
     except Exception as e:
         raise click.ClickException(str(e))
@@ -20,9 +20,11 @@ from cmai.cli.ui.commit import (
 from cmai.config.settings import settings
 from cmai.core.commit_spec import resolve_commit_rules
 from cmai.core.commit_validator import validate_commit_message
+from cmai.core.deadline import Deadline
 from cmai.core.logger_factory import LoggerFactory
 from cmai.core.normalizer import Normalizer
 from cmai.providers.base import AIResponse
+from cmai.providers.provider_factory import close_provider_pool
 from cmai.utils.git_staged_analyzer import GitStagedAnalyzer
 
 
@@ -41,20 +43,24 @@ async def normalize_commit_async(
     validation_errors: Optional[list[str]] = None,
     additional_prompt: Optional[str] = None,
     use_file_summary_for_large_diff: Optional[bool] = None,
+    use_cache: bool = True,
+    normalizer: Optional[Normalizer] = None,
+    deadline: Optional[Deadline] = None,
 ) -> AIResponse:
     logger = _get_logger()
     if config:
         settings.load_from_env(config)
 
     config_dict = settings.model_dump()
-    if "API_BASE" in config_dict:
-        config_dict["API_BASE"] = "***"
-    if "API_KEY" in config_dict:
-        config_dict["API_KEY"] = "***"
+    for key in config_dict:
+        if key.endswith(("API_BASE", "API_KEY")):
+            config_dict[key] = "***"
     logger.debug(f"Using configuration: {json.dumps(config_dict, indent=2)}")
     logger.info(f"Normalizing commit message: {message}")
 
-    normalizer = Normalizer()
+    # A session passes its own normalizer so regenerations can reuse the diff
+    # insights computed for the same staged snapshot.
+    normalizer = normalizer or Normalizer()
     try:
         return await normalizer.normalize_commit(
             user_input=message,
@@ -65,30 +71,52 @@ async def normalize_commit_async(
             validation_errors=validation_errors,
             additional_prompt=additional_prompt,
             use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+            use_cache=use_cache,
+            deadline=deadline,
         )
     except Exception as e:
         logger.error(f"Error normalizing commit message: {e}")
         raise click.ClickException(f"Failed to normalize commit message: {e}")
+    finally:
+        # Pooled provider connections belong to this event loop.
+        await close_provider_pool()
 
 
 class CommitSession:
+    def __init__(self) -> None:
+        self.normalizer = Normalizer()
+        self.deadline_seconds: Optional[float] = None
+
     def run(
         self,
         message: str,
         config: Optional[str] = None,
         repo: Optional[str] = None,
         language: Optional[str] = None,
+        fresh: bool = False,
+        deadline: Optional[float] = None,
     ) -> None:
         if config:
             settings.load_from_env(config)
 
-        use_file_summary_for_large_diff = self._resolve_large_diff_mode(repo)
+        if deadline is None:
+            deadline = settings.DEADLINE_SECONDS
+        self.deadline_seconds = deadline if deadline and deadline > 0 else None
+
+        budget = self._start_deadline()
+        # Under a deadline nobody waits to answer the large-diff prompt, so the
+        # default mode is used.
+        use_file_summary_for_large_diff = (
+            self._resolve_large_diff_mode(repo) if budget is None else None
+        )
         result, elapsed_time = self._generate_message(
             message=message,
             config=config,
             repo=repo,
             language=language,
             use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+            fresh=fresh,
+            deadline=budget,
         )
         content = result.content
 
@@ -97,6 +125,7 @@ class CommitSession:
         display_generation_result(
             content=content,
             token_usage=result.tokens_used,
+            cached_tokens=result.cached_tokens,
             elapsed_time=elapsed_time,
             suggest_split=result.suggest_split,
             split_reason=result.split_reason,
@@ -135,6 +164,7 @@ class CommitSession:
                 display_generation_result(
                     content=content,
                     token_usage=result.tokens_used,
+                    cached_tokens=result.cached_tokens,
                     elapsed_time=elapsed_time,
                     suggest_split=result.suggest_split,
                     split_reason=result.split_reason,
@@ -145,14 +175,18 @@ class CommitSession:
                 show_commit_aborted()
                 break
 
+    def _start_deadline(self) -> Optional[Deadline]:
+        if self.deadline_seconds is None:
+            return None
+        return Deadline(self.deadline_seconds)
+
     def _resolve_large_diff_mode(self, repo: Optional[str]) -> Optional[bool]:
         analyzer = GitStagedAnalyzer(repo_path=repo)
         staged_entries = analyzer.get_staged_entries()
         if not staged_entries:
             raise click.ClickException("No staged changes found in the repository.")
 
-        _, is_truncated = analyzer.render_prompt_entries(staged_entries)
-        if not is_truncated:
+        if not analyzer.exceeds_prompt_budget(staged_entries):
             return None
 
         return prompt_large_diff_mode()
@@ -165,6 +199,8 @@ class CommitSession:
         repo: Optional[str],
         language: Optional[str],
         use_file_summary_for_large_diff: Optional[bool],
+        fresh: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> tuple[AIResponse, float]:
         started_at = time.time()
         result = asyncio.run(
@@ -174,6 +210,9 @@ class CommitSession:
                 repo=repo,
                 language=language,
                 use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+                use_cache=not fresh,
+                normalizer=self.normalizer,
+                deadline=deadline,
             )
         )
         return result, time.time() - started_at
@@ -201,6 +240,8 @@ class CommitSession:
                 validation_errors=validation_errors,
                 additional_prompt=additional_prompt,
                 use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+                normalizer=self.normalizer,
+                deadline=self._start_deadline(),
             )
         )
         return result, time.time() - started_at
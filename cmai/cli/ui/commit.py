@@ -29,10 +29,14 @@ def display_generation_result(
     split_groups: Iterable[str],
     *,
     regenerated: bool = False,
+    cached_tokens: Optional[int] = None,
 ) -> None:
     label = "Regenerated commit message" if regenerated else "Commit message"
     click.echo(click.style(f"{label}: {content}", fg="green"))
-    click.echo(click.style(f"Tokens used: {token_usage}", fg="blue"))
+    usage_text = f"Tokens used: {token_usage}"
+    if cached_tokens:
+        usage_text += f" ({cached_tokens} cached)"
+    click.echo(click.style(usage_text, fg="blue"))
     click.echo(click.style(f"Elapsed time: {elapsed_time:.2f} seconds", fg="yellow"))
 
     if not suggest_split:
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 from typing import Optional
 
@@ -10,6 +11,9 @@ from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 DEFAULT_SETTINGS_PATH = Path.home() / ".config" / "cmai" / "settings.env"
+DEFAULT_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "cmai"
+)
 
 PROMPT_TEMPLATE_VARIABLES = ("{user_input}", "{diff_content}", "{language}")
 LEGACY_PROMPT_TEMPLATE_VARIABLES = {
@@ -24,10 +28,11 @@ DEFAULT_PROMPT_TEMPLATE = (
     "User intent: {user_input}\n"
     "Staged changes: {diff_content}\n"
     "Output language: {language}\n"
-    "You must follow the commit specification rules provided later. If there is any "
-    "conflict, those rules take highest priority.\n"
+    "You must follow the commit specification rules given in this prompt. If there "
+    "is any conflict, those rules take highest priority.\n"
     "Return only the final commit message text. Do not add explanations, code fences, "
-    "prefixes, suffixes, or multiple lines.\n"
+    "prefixes, suffixes, or multiple lines, except for a trailing block that the "
+    "rules above explicitly ask for.\n"
 )
 
 
@@ -103,6 +108,10 @@ class Settings(BaseSettings):
     MAX_TOKEN: int = 8192
 
     OLLAMA_HOST: Optional[str] = None
+    OLLAMA_WARMUP: bool = True
+    OLLAMA_KEEP_ALIVE: Optional[str] = "10m"
+    OLLAMA_MIN_NUM_CTX: int = 8192
+    OLLAMA_MAX_NUM_CTX: int = 32768
 
     RESPONSE_LANGUAGE: str = "English"
     ENABLE_THINKING: bool = True
@@ -120,14 +129,65 @@ class Settings(BaseSettings):
     PROMPT_TEMPLATE: str = DEFAULT_PROMPT_TEMPLATE
 
     MAX_DIFF_LENGTH: int = 8000
+    MAX_DIFF_TOKENS: Optional[int] = None
+    MODEL_CONTEXT_WINDOW: Optional[int] = None
+    DIFF_CONTEXT_RATIO: float = 0.5
+    TOKEN_ESTIMATOR: str = "auto"
     MAX_DIFF_FILE_LINES: int = 50
     MAX_DIFF_FILES_FOR_AI: int = 30
+    STAT_ONLY_CHANGED_LINES: int = 5000
     ENABLE_SPLIT_SUGGESTION: bool = True
     SPLIT_CONFIDENCE_THRESHOLD: float = 0.75
     DIFF_SUMMARY_CONCURRENCY: int = 5
+    MAX_PROVIDER_CONCURRENCY: int = 16
+    DIFF_SUMMARY_BATCH_TOKENS: int = 3000
+    DIFF_SUMMARY_BATCH_MAX_FILES: int = 12
+    AGGREGATE_MODE: str = "merged"
+    SUMMARY_REDUCE_FAN_IN: int = 20
+    MAX_SUMMARY_CALLS: int = 120
     RETRY_MAX_ATTEMPTS: int = 5
+    RETRY_TRANSIENT_MAX_ATTEMPTS: int = 3
     RETRY_BASE_DELAY_SECONDS: float = 2.0
     RETRY_MAX_DELAY_SECONDS: float = 30.0
+    DEADLINE_SECONDS: Optional[float] = None
+    ENABLE_HEDGING: bool = False
+    HEDGE_PERCENTILE: float = 90.0
+    HEDGE_DELAY_SECONDS: float = 5.0
+    HEDGE_PROVIDER: Optional[str] = None
+    HEDGE_MODEL: Optional[str] = None
+    ENABLE_PROVIDER_POOL: bool = True
+    HTTP2: bool = False
+    HTTP_MAX_CONNECTIONS: int = 32
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+
+    SUMMARY_PROVIDER: Optional[str] = None
+    SUMMARY_MODEL: Optional[str] = None
+    SUMMARY_MAX_TOKENS: Optional[int] = None
+    SUMMARY_ENABLE_THINKING: Optional[bool] = None
+    SUMMARY_API_KEY: Optional[str] = None
+    SUMMARY_API_BASE: Optional[str] = None
+    AGGREGATE_PROVIDER: Optional[str] = None
+    AGGREGATE_MODEL: Optional[str] = None
+    AGGREGATE_MAX_TOKENS: Optional[int] = None
+    AGGREGATE_ENABLE_THINKING: Optional[bool] = None
+    AGGREGATE_API_KEY: Optional[str] = None
+    AGGREGATE_API_BASE: Optional[str] = None
+    FINAL_PROVIDER: Optional[str] = None
+    FINAL_MODEL: Optional[str] = None
+    FINAL_MAX_TOKENS: Optional[int] = None
+    FINAL_ENABLE_THINKING: Optional[bool] = None
+    FINAL_API_KEY: Optional[str] = None
+    FINAL_API_BASE: Optional[str] = None
+
+    CACHE_DIR: Optional[str] = None
+    ENABLE_STAGED_SNAPSHOT_CACHE: bool = True
+    # Snapshots hold staged patch text, so writing them to disk is opt-in.
+    PERSIST_STAGED_SNAPSHOTS: bool = False
+    ENABLE_SUMMARY_CACHE: bool = True
+    SUMMARY_CACHE_MAX_ENTRIES: int = 5000
+    ENABLE_MESSAGE_CACHE: bool = True
+    MESSAGE_CACHE_MAX_ENTRIES: int = 500
 
     @field_validator("PROMPT_TEMPLATE", mode="before")
     @classmethod
@@ -143,6 +203,13 @@ class Settings(BaseSettings):
         # BaseSettings also accepts this runtime-only configuration argument.
         return cls(_env_file=str(path))  # pyright: ignore[reportCallIssue]
 
+    def resolve_cache_dir(self) -> Path:
+        """Directory for cached analysis results; never created eagerly."""
+
+        if self.CACHE_DIR:
+            return Path(self.CACHE_DIR).expanduser()
+        return DEFAULT_CACHE_DIR
+
     def load_from_env(self, env_file: str | Path | None = None) -> None:
         """Reload this shared instance while preserving references held elsewhere."""
 
@@ -0,0 +1,100 @@
+"""Adaptive concurrency limit for provider calls."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from cmai.core.logger_factory import LoggerFactory
+
+
+@dataclass
+class _Slot:
+    started_at: float
+
+
+class AdaptiveConcurrencyLimiter:
+    """Additive-increase / multiplicative-decrease limit on in-flight calls.
+
+    Every successful call raises the limit by ``1 / limit``, roughly one extra
+    slot per round of calls. A rate-limit error multiplies the limit by
+    ``decrease_factor``; errors from calls started before the last decrease
+    belong to the same burst and do not cut the limit again.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self.logger = LoggerFactory().get_logger("ConcurrencyLimiter")
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.decrease_factor = min(0.9, max(0.1, decrease_factor))
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.current = 0
+        self.peak = 0
+        self._last_decrease_at = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @asynccontextmanager
+    async def slot(
+        self, is_rate_limit: Callable[[BaseException], bool]
+    ) -> AsyncIterator[None]:
+        slot = await self._acquire()
+        try:
+            yield
+        except BaseException as exc:
+            await self._release(
+                slot, rate_limited=is_rate_limit(exc), succeeded=False
+            )
+            raise
+        await self._release(slot, rate_limited=False, succeeded=True)
+
+    def _get_condition(self) -> asyncio.Condition:
+        # The limit outlives a single event loop (each regenerate runs its own),
+        # while the condition is bound to the loop that first uses it.
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.current = 0
+        return self._condition
+
+    async def _acquire(self) -> _Slot:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.current < int(self.limit))
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+            return _Slot(started_at=time.monotonic())
+
+    async def _release(
+        self, slot: _Slot, rate_limited: bool, succeeded: bool
+    ) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.current -= 1
+            if rate_limited:
+                if slot.started_at >= self._last_decrease_at:
+                    self.limit = max(
+                        float(self.minimum), self.limit * self.decrease_factor
+                    )
+                    self._last_decrease_at = time.monotonic()
+                    self.logger.info(
+                        f"Rate limited, provider concurrency limit lowered to "
+                        f"{int(self.limit)} (current {self.current}, peak {self.peak})"
+                    )
+            elif succeeded and self.limit < self.maximum:
+                previous = int(self.limit)
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+                if int(self.limit) > previous:
+                    self.logger.debug(
+                        f"Provider concurrency limit raised to {int(self.limit)} "
+                        f"(current {self.current}, peak {self.peak})"
+                    )
+            condition.notify_all()
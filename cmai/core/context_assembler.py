@@ -0,0 +1,295 @@
+"""Assemble the staged-change context with one representation per file."""
+
+from dataclasses import dataclass
+import heapq
+import math
+from typing import Callable, Mapping, Optional
+
+from cmai.core.token_estimator import TokenEstimator
+from cmai.utils.git_staged_analyzer import StagedFileChange
+
+FIDELITY_PATCH = "patch"
+FIDELITY_HUNKS = "hunks"
+FIDELITY_PREVIEW = "preview"
+FIDELITY_SUMMARY = "summary"
+FIDELITY_STAT = "stat"
+FIDELITY_STRUCTURAL = "structural"
+FIDELITY_COLLAPSED = "collapsed"
+
+# Share of a file's information each representation is assumed to carry.
+FIDELITY_VALUES = {
+    FIDELITY_STAT: 0.1,
+    FIDELITY_SUMMARY: 0.5,
+    FIDELITY_PREVIEW: 0.7,
+    FIDELITY_HUNKS: 0.85,
+    FIDELITY_PATCH: 1.0,
+}
+AREA_WEIGHTS = {
+    "test": 0.7,
+    "ci": 0.6,
+    "docs": 0.5,
+}
+
+
+def changed_line_count(entry: StagedFileChange) -> int:
+    if entry.added_lines is not None or entry.removed_lines is not None:
+        return (entry.added_lines or 0) + (entry.removed_lines or 0)
+    diff = entry.preview_diff if entry.is_preview_only else entry.full_diff
+    return sum(
+        1
+        for line in diff.splitlines()
+        if line[:1] in {"+", "-"} and not line.startswith(("+++", "---"))
+    )
+
+
+@dataclass(frozen=True)
+class FileContext:
+    path: str
+    fidelity: str
+    text: str
+    tokens: int
+    value: float = 0.0
+
+
+@dataclass(frozen=True)
+class AssembledContext:
+    files: list[FileContext]
+    budget: int
+
+    @property
+    def tokens(self) -> int:
+        return sum(item.tokens for item in self.files)
+
+    def fidelity_counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for item in self.files:
+            counts[item.fidelity] = counts.get(item.fidelity, 0) + 1
+        return counts
+
+
+class ContextAssembler:
+    """Choose the full patch, packed hunks, a preview, a summary, or a stat line.
+
+    Every file starts at its cheapest representation. Upgrades are then taken
+    greedily by estimated value gained per token until the budget is spent, so
+    small files usually keep their whole patch while large ones fall back to
+    their leading hunks, a preview or their summary. When even the cheapest
+    representations do not fit, the least valuable files are collapsed into
+    one line.
+
+    ``hunk_packer`` renders the leading whole hunks of a patch that fit into a
+    token share, or returns None; without it there is no packed-hunks level.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        estimator: TokenEstimator,
+        preview_lines: int,
+        hunk_packer: Optional[Callable[[StagedFileChange, int], Optional[str]]] = None,
+    ) -> None:
+        self.budget = budget
+        self.estimator = estimator
+        self.preview_lines = preview_lines
+        self.hunk_packer = hunk_packer
+        self._hunk_share = budget
+
+    def assemble(
+        self,
+        entries: list[StagedFileChange],
+        summaries: Optional[Mapping[str, str]] = None,
+        areas: Optional[Mapping[str, str]] = None,
+    ) -> AssembledContext:
+        summaries = summaries or {}
+        areas = areas or {}
+        # Packed hunks get an equal share of the budget per patch; the greedy
+        # upgrades decide which files can afford them.
+        patches = sum(
+            1
+            for entry in entries
+            if not (entry.is_structural_change or entry.is_stat_only)
+        )
+        self._hunk_share = self.budget // max(1, patches)
+        options = [
+            self._options_for(
+                entry, summaries.get(entry.path), areas.get(entry.path, "core")
+            )
+            for entry in entries
+        ]
+
+        chosen = [0] * len(options)
+        spent = sum(candidates[0].tokens for candidates in options)
+        if spent > self.budget:
+            return self._collapse(entries, options)
+        upgrades: list[tuple[float, int, int, int]] = []
+        for index in range(len(options)):
+            self._push_upgrades(upgrades, options, index, 0)
+
+        while upgrades:
+            _, _, index, level = heapq.heappop(upgrades)
+            current = options[index][chosen[index]]
+            if level <= chosen[index]:
+                continue
+            extra = options[index][level].tokens - current.tokens
+            if spent + extra > self.budget:
+                continue
+            chosen[index] = level
+            spent += extra
+            self._push_upgrades(upgrades, options, index, level)
+
+        return AssembledContext(
+            files=[options[index][level] for index, level in enumerate(chosen)],
+            budget=self.budget,
+        )
+
+    def _collapse(
+        self, entries: list[StagedFileChange], options: list[list[FileContext]]
+    ) -> AssembledContext:
+        """Keep the most valuable cheapest lines and fold the rest into one."""
+
+        total_added = sum(entry.added_lines or 0 for entry in entries)
+        total_removed = sum(entry.removed_lines or 0 for entry in entries)
+        reserve = self.estimator.count(
+            self._collapsed_text(len(entries), total_added, total_removed)
+        )
+        ranked = sorted(
+            range(len(options)), key=lambda index: -options[index][0].value
+        )
+        kept: set[int] = set()
+        spent = reserve
+        for index in ranked:
+            tokens = options[index][0].tokens
+            if spent + tokens > self.budget:
+                continue
+            kept.add(index)
+            spent += tokens
+
+        files = [options[index][0] for index in sorted(kept)]
+        folded = [entry for index, entry in enumerate(entries) if index not in kept]
+        text = self._collapsed_text(
+            len(folded),
+            sum(entry.added_lines or 0 for entry in folded),
+            sum(entry.removed_lines or 0 for entry in folded),
+        )
+        files.append(
+            FileContext(
+                path="",
+                fidelity=FIDELITY_COLLAPSED,
+                text=text,
+                tokens=self.estimator.count(text),
+            )
+        )
+        return AssembledContext(files=files, budget=self.budget)
+
+    @staticmethod
+    def _collapsed_text(count: int, added: int, removed: int) -> str:
+        return f"... and {count} more files (+{added} -{removed} lines)"
+
+    def _push_upgrades(
+        self,
+        upgrades: list[tuple[float, int, int, int]],
+        options: list[list[FileContext]],
+        index: int,
+        level: int,
+    ) -> None:
+        current = options[index][level]
+        for target in range(level + 1, len(options[index])):
+            candidate = options[index][target]
+            gain = candidate.value - current.value
+            if gain <= 0:
+                continue
+            extra = max(1, candidate.tokens - current.tokens)
+            # heapq is a min-heap; order by the best value per extra token.
+            heapq.heappush(upgrades, (-gain / extra, extra, index, target))
+
+    def _options_for(
+        self, entry: StagedFileChange, summary: Optional[str], area: str
+    ) -> list[FileContext]:
+        if entry.is_structural_change:
+            text = (
+                f"Renamed file: {entry.old_path or '(unknown source)'} -> {entry.path}"
+                if entry.status == "renamed"
+                else f"Deleted file: {entry.path}"
+            )
+            return [self._context(entry, FIDELITY_STRUCTURAL, text, 0.0)]
+
+        weight = self._file_weight(entry, area)
+        stat = self._context(
+            entry,
+            FIDELITY_STAT,
+            f"{entry.path} ({entry.status}): {self._stat_text(entry)}",
+            weight * FIDELITY_VALUES[FIDELITY_STAT],
+        )
+        if entry.is_stat_only:
+            return [stat]
+
+        options = [stat]
+        if summary:
+            options.append(
+                self._context(
+                    entry,
+                    FIDELITY_SUMMARY,
+                    f"{entry.path} ({entry.status}, summary): {summary}",
+                    weight * FIDELITY_VALUES[FIDELITY_SUMMARY],
+                )
+            )
+        has_distinct_preview = (
+            entry.is_preview_only or entry.preview_diff != entry.full_diff
+        )
+        if entry.preview_diff and has_distinct_preview:
+            options.append(
+                self._context(
+                    entry,
+                    FIDELITY_PREVIEW,
+                    f"{entry.path} ({entry.status}, first {self.preview_lines} "
+                    f"changed lines):\n{entry.preview_diff}",
+                    weight * FIDELITY_VALUES[FIDELITY_PREVIEW],
+                )
+            )
+        if self.hunk_packer and entry.full_diff and not entry.is_preview_only:
+            packed = self.hunk_packer(entry, self._hunk_share)
+            if packed:
+                options.append(
+                    self._context(
+                        entry,
+                        FIDELITY_HUNKS,
+                        packed,
+                        weight * FIDELITY_VALUES[FIDELITY_HUNKS],
+                    )
+                )
+        if entry.full_diff and not entry.is_preview_only:
+            options.append(
+                self._context(
+                    entry,
+                    FIDELITY_PATCH,
+                    f"{entry.path} ({entry.status}):\n{entry.full_diff}",
+                    weight * FIDELITY_VALUES[FIDELITY_PATCH],
+                )
+            )
+        return sorted(options, key=lambda item: (item.tokens, item.value))
+
+    def _context(
+        self, entry: StagedFileChange, fidelity: str, text: str, value: float
+    ) -> FileContext:
+        return FileContext(
+            path=entry.path,
+            fidelity=fidelity,
+            text=text,
+            tokens=self.estimator.count(text),
+            value=value,
+        )
+
+    def _file_weight(self, entry: StagedFileChange, area: str) -> float:
+        changed = changed_line_count(entry)
+        return AREA_WEIGHTS.get(area, 1.0) * (1.0 + math.log1p(changed))
+
+    @staticmethod
+    def _stat_text(entry: StagedFileChange) -> str:
+        if entry.is_stat_only:
+            return entry.full_diff
+        if entry.added_lines is None and entry.removed_lines is None:
+            return "patch omitted."
+        return (
+            f"+{entry.added_lines or 0} -{entry.removed_lines or 0} lines, "
+            "patch omitted."
+        )
@@ -0,0 +1,49 @@
+"""Time budget for one commit message run, split across pipeline stages."""
+
+import time
+from typing import Callable, Optional
+
+STAGE_COLLECT = "collect"
+STAGE_SUMMARIES = "summaries"
+STAGE_AGGREGATE = "aggregate"
+STAGE_FINAL = "final"
+
+# Share of the total budget by which each stage has to finish. Checkpoints are
+# cumulative, so time left over by a fast stage goes to the later ones. The
+# final stage stops short of the full budget to leave time for the local
+# fallback message and for printing the result.
+STAGE_CHECKPOINTS = {
+    STAGE_COLLECT: 0.1,
+    STAGE_SUMMARIES: 0.55,
+    STAGE_AGGREGATE: 0.7,
+    STAGE_FINAL: 0.95,
+}
+
+
+class Deadline:
+    """End-to-end budget with one checkpoint per pipeline stage.
+
+    The clock starts when the deadline is created. A stage that runs past its
+    checkpoint is expected to stop waiting for the provider and fall back to
+    its local heuristic.
+    """
+
+    def __init__(
+        self, seconds: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.seconds = max(0.0, seconds)
+        self._clock = clock
+        self.started_at = clock()
+
+    def remaining(self, stage: Optional[str] = None) -> float:
+        """Seconds left until the stage checkpoint, or the whole budget."""
+
+        share = STAGE_CHECKPOINTS[stage] if stage is not None else 1.0
+        end = self.started_at + self.seconds * share
+        return max(0.0, end - self._clock())
+
+    def expired(self, stage: Optional[str] = None) -> bool:
+        return self.remaining(stage) <= 0.0
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
@@ -0,0 +1,147 @@
+"""Hedged provider calls: race a duplicate request against a slow one."""
+
+import asyncio
+from dataclasses import dataclass, field
+import math
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from cmai.providers.base import AIResponse
+
+HEDGE_PRIMARY = "primary"
+HEDGE_SECONDARY = "hedge"
+MAX_LATENCY_SAMPLES = 200
+# Below this many recorded latencies the configured fixed delay is used.
+MIN_LATENCY_SAMPLES = 10
+
+ProviderCall = Callable[[], Awaitable[AIResponse]]
+
+
+@dataclass
+class HedgeStats:
+    """Recent primary-call latencies plus hedge rate and win counts."""
+
+    latencies: list[float] = field(default_factory=list)
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        rank = math.ceil(max(0.0, min(100.0, pct)) / 100 * len(ordered))
+        return ordered[max(0, rank - 1)]
+
+    def record(self, outcome: "HedgeOutcome") -> None:
+        self.requests += 1
+        if outcome.hedged:
+            self.hedged += 1
+        if outcome.winner == HEDGE_SECONDARY:
+            self.hedge_wins += 1
+        if outcome.primary_latency is not None:
+            self.latencies.append(outcome.primary_latency)
+            del self.latencies[:-MAX_LATENCY_SAMPLES]
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.requests if self.requests else 0.0
+
+    def to_payload(self) -> dict[str, Any]:
+        return {
+            "latencies": self.latencies,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Optional[dict[str, Any]]) -> "HedgeStats":
+        if not payload:
+            return cls()
+        try:
+            return cls(
+                latencies=[float(item) for item in payload.get("latencies", [])],
+                requests=int(payload.get("requests", 0)),
+                hedged=int(payload.get("hedged", 0)),
+                hedge_wins=int(payload.get("hedge_wins", 0)),
+            )
+        except (TypeError, ValueError):
+            return cls()
+
+
+@dataclass(frozen=True)
+class HedgeOutcome:
+    response: AIResponse
+    winner: str
+    hedged: bool
+    # Time until the primary call finished, or until it was cancelled after
+    # losing; the latter is a lower bound of its real latency.
+    primary_latency: Optional[float]
+
+
+async def hedged_call(
+    primary: ProviderCall,
+    hedge: ProviderCall,
+    delay: float,
+    is_valid: Callable[[AIResponse], bool],
+) -> HedgeOutcome:
+    """Start ``primary``; start ``hedge`` if it is not done after ``delay``.
+
+    A primary call that fails or returns an invalid answer before the delay
+    starts the hedge at once. The first valid answer wins and the other call
+    is cancelled. When neither call produces a valid answer, the primary
+    call's error or answer is returned.
+    """
+
+    started_at = time.monotonic()
+    primary_task = asyncio.create_task(primary())
+    tasks = {primary_task: HEDGE_PRIMARY}
+    primary_latency: Optional[float] = None
+    hedge_task: Optional[asyncio.Task[AIResponse]] = None
+    results: dict[str, asyncio.Task[AIResponse]] = {}
+
+    try:
+        pending: set[asyncio.Task[AIResponse]] = {primary_task}
+        timeout: Optional[float] = max(0.0, delay)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = tasks[task]
+                results[name] = task
+                if name == HEDGE_PRIMARY:
+                    primary_latency = time.monotonic() - started_at
+                if not task.cancelled() and task.exception() is None:
+                    response = task.result()
+                    if is_valid(response):
+                        return HedgeOutcome(
+                            response=response,
+                            winner=name,
+                            hedged=hedge_task is not None,
+                            primary_latency=(
+                                primary_latency
+                                if primary_latency is not None
+                                else time.monotonic() - started_at
+                            ),
+                        )
+            if hedge_task is None:
+                hedge_task = asyncio.create_task(hedge())
+                tasks[hedge_task] = HEDGE_SECONDARY
+                pending.add(hedge_task)
+                timeout = None
+    finally:
+        losers = [task for task in tasks if not task.done()]
+        for task in losers:
+            task.cancel()
+        if losers:
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    fallback = results.get(HEDGE_PRIMARY) or results[HEDGE_SECONDARY]
+    return HedgeOutcome(
+        response=fallback.result(),
+        winner=tasks[fallback],
+        hedged=hedge_task is not None,
+        primary_latency=primary_latency,
+    )
@@ -1,19 +1,61 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+import copy
+from dataclasses import dataclass, field
 import re
-from typing import Any, Optional
+import threading
+from typing import Any, Callable, Optional, Sequence
 from tqdm import tqdm
 
 from cmai.config.settings import normalize_prompt_template_variables, settings
 from cmai.core.commit_spec import build_commit_rules_prompt, resolve_commit_rules
+from cmai.core.concurrency import AdaptiveConcurrencyLimiter
+from cmai.core.context_assembler import ContextAssembler, changed_line_count
+from cmai.core.deadline import (
+    STAGE_AGGREGATE,
+    STAGE_COLLECT,
+    STAGE_FINAL,
+    STAGE_SUMMARIES,
+    Deadline,
+)
+from cmai.core.hedging import HedgeStats, hedged_call
 from cmai.core.logger_factory import LoggerFactory
+from cmai.core.retry_policy import (
+    RETRY_RATE_LIMIT,
+    RETRY_TRANSIENT,
+    backoff_delay,
+    classify_error,
+)
+from cmai.core.stage_routing import (
+    ROUTE_AGGREGATE,
+    ROUTE_FINAL,
+    ROUTE_SUMMARY,
+    ROUTED_STAGES,
+    StageRoute,
+    resolve_stage_route,
+    route_credentials,
+    validate_stage_route,
+)
+from cmai.core.summary_reducer import (
+    HierarchicalSummaryReducer,
+    ReductionResult,
+    SummaryNode,
+)
+from cmai.core.token_estimator import get_token_estimator
 from cmai.utils.git_staged_analyzer import GitStagedAnalyzer, StagedFileChange
-from cmai.providers.base import AIResponse
+from cmai.utils.result_cache import ResultCache, build_result_key
+from cmai.providers.base import AIResponse, ProviderTimings
+from cmai.providers.ollama_provider import OLLAMA_OUTPUT_RESERVE
 from cmai.providers.provider_factory import create_provider
 
 
 STRUCTURAL_CHANGE_STATUSES = frozenset({"deleted", "renamed"})
+# Bump when the file-summary prompts change so cached summaries are not reused.
+SUMMARY_PROMPT_VERSION = 2
+# Bump when final prompt assembly changes so cached messages are not reused.
+MESSAGE_PROMPT_VERSION = 3
+AGGREGATE_MODE_MERGED = "merged"
+AGGREGATE_MODE_SEPARATE = "separate"
+SPLIT_DECISION_MARKER = "=== split decision ==="
 
 
 @dataclass(frozen=True)
@@ -23,6 +65,7 @@ class FileDiffSummary:
     summary: str
     tags: tuple[str, ...]
     area: str
+    source: str = "ai"
 
 
 @dataclass(frozen=True)
@@ -32,12 +75,82 @@ class DiffInsights:
     suggest_split: bool
     split_reason: str
     split_groups: list[str]
+    directory_summaries: list[SummaryNode] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class PreparedDiffContext:
+    """Diff context and insights for one staged snapshot, reused on regenerate."""
+
+    key: Optional[tuple[object, ...]]
+    diff_content: str
+    diff_insights: DiffInsights
+
+
+def _run_detached(func: Callable[[], Any]) -> "asyncio.Future[Any]":
+    """Run a blocking call in a daemon thread.
+
+    Unlike ``asyncio.to_thread``, a call abandoned after a deadline neither
+    delays ``asyncio.run`` shutting down nor keeps the process alive.
+    """
+
+    loop = asyncio.get_running_loop()
+    future: "asyncio.Future[Any]" = loop.create_future()
+
+    def resolve(result: Any, error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run() -> None:
+        result, error = None, None
+        try:
+            result = func()
+        except BaseException as exc:
+            error = exc
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # The event loop already closed after the caller gave up.
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
 
 
 class Normalizer:
     def __init__(self) -> None:
         self.logger = LoggerFactory().get_logger("Normalizer")
         self.stream_logger = LoggerFactory().get_stream_logger("Normalizer")
+        self._summary_cache: Optional[ResultCache] = None
+        self._message_cache: Optional[ResultCache] = None
+        self._hedge_stats_cache: Optional[ResultCache] = None
+        self._hedge_provider: Any = None
+        # Provider calls made by the last file summary pass; with batching and
+        # cached summaries this differs from the number of files summarized.
+        self._summary_calls = 0
+        self._prepared_context: Optional[PreparedDiffContext] = None
+        self._concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        self._deadline: Optional[Deadline] = None
+        self._stage: Optional[str] = None
+        self._deadline_hit = False
+        self._provider_timings: list[ProviderTimings] = []
+        # (host, model, num_ctx) of local models this instance already warmed.
+        self._warmed_models: set[tuple[Any, Any, Any]] = set()
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """Limit on in-flight provider calls shared by every pipeline stage."""
+
+        if self._concurrency_limiter is None:
+            self._concurrency_limiter = AdaptiveConcurrencyLimiter(
+                initial=settings.DIFF_SUMMARY_CONCURRENCY,
+                maximum=settings.MAX_PROVIDER_CONCURRENCY,
+            )
+        return self._concurrency_limiter
 
     async def normalize_commit(
         self,
@@ -49,44 +162,105 @@ class Normalizer:
         validation_errors: Optional[list[str]] = None,
         additional_prompt: Optional[str] = None,
         use_file_summary_for_large_diff: Optional[bool] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None,
     ) -> AIResponse:
+        self._deadline = deadline
+        self._deadline_hit = False
+        # Async provider clients hold connections bound to the event loop of
+        # one run, so the secondary hedge provider is not reused across runs;
+        # within a run the factory's pool shares the connections.
+        self._hedge_provider = None
+        self._provider_timings = []
+        self._enter_stage(STAGE_COLLECT)
         git_analyzer = GitStagedAnalyzer(repo_path=repo_path)
-        staged_entries = git_analyzer.get_staged_entries()
+        snapshot = git_analyzer.get_staged_snapshot()
+        staged_entries = list(snapshot.entries)
 
         if not staged_entries:
             raise ValueError("No staged changes found in the repository.")
 
-        cached_diff, is_truncated = git_analyzer.render_prompt_entries(staged_entries)
-        if not cached_diff:
-            raise ValueError("No staged textual changes found in the repository.")
-
-        provider = create_provider()
-        enable_ai_summary = True
-        if is_truncated and use_file_summary_for_large_diff is not None:
-            enable_ai_summary = use_file_summary_for_large_diff
-
-        if is_truncated and not enable_ai_summary:
-            cached_diff = self._build_file_list_context(staged_entries)
-
-        diff_insights = await self._build_diff_insights(
-            provider=provider,
-            entries=staged_entries,
-            language=language or settings.RESPONSE_LANGUAGE,
-            is_truncated=is_truncated,
-            enable_ai_summary=enable_ai_summary,
+        rules = resolve_commit_rules(settings)
+        message_cache_key = None
+        if not (previous_message or validation_errors or additional_prompt):
+            message_cache_key = self._message_cache_key(
+                staged_entries,
+                user_input=user_input,
+                prompt_template=prompt_template,
+                language=language or settings.RESPONSE_LANGUAGE,
+                rules_prompt=build_commit_rules_prompt(rules),
+                use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+            )
+        if use_cache and message_cache_key is not None:
+            cached_response = self._load_cached_message(message_cache_key)
+            if cached_response is not None:
+                self.logger.info("Using cached commit message for staged patch")
+                return cached_response
+
+        providers = self._create_stage_providers()
+        provider = providers[ROUTE_FINAL]
+        self._pin_context_size(
+            providers,
+            self._estimate_final_prompt_tokens(
+                git_analyzer,
+                user_input=user_input,
+                prompt_template=prompt_template,
+                rules_prompt=build_commit_rules_prompt(rules),
+            ),
         )
-
-        diff_content = self._compose_diff_context(cached_diff, diff_insights)
+        self._start_warm_up(providers)
+        context_key = (
+            (
+                snapshot.tree_id,
+                snapshot.head_id,
+                language or settings.RESPONSE_LANGUAGE,
+                use_file_summary_for_large_diff,
+            )
+            if snapshot.tree_id is not None
+            else None
+        )
+        prepared = self._prepared_context
+        if (
+            prepared is not None
+            and context_key is not None
+            and prepared.key == context_key
+        ):
+            self.logger.debug("Reusing diff insights for unchanged staged snapshot")
+        else:
+            prepared = await self._prepare_diff_context(
+                git_analyzer,
+                providers,
+                staged_entries,
+                language=language or settings.RESPONSE_LANGUAGE,
+                use_file_summary_for_large_diff=use_file_summary_for_large_diff,
+                key=context_key,
+            )
+            # Insights degraded by the deadline are not reused on regenerate.
+            if not self._deadline_hit:
+                self._prepared_context = prepared
+        diff_content = prepared.diff_content
+        diff_insights = prepared.diff_insights
 
         prompt_template = normalize_prompt_template_variables(prompt_template)
-        prompt = (
+        rendered_template = (
             prompt_template.replace("{user_input}", user_input)
             .replace("{diff_content}", diff_content)
             .replace("{language}", language or settings.RESPONSE_LANGUAGE)
         )
 
-        rules = resolve_commit_rules(settings)
-        prompt_parts = [prompt, build_commit_rules_prompt(rules)]
+        # Static instructions come first, then the staged changes, then notes
+        # that differ per attempt, so calls share the longest possible prefix
+        # with the provider's prompt cache.
+        instruction_parts = [build_commit_rules_prompt(rules)]
+        request_split_decision = self._requests_split_decision(diff_insights)
+        if request_split_decision:
+            instruction_parts.append(self._build_split_decision_instructions())
+        instructions = "\n\n".join(instruction_parts)
+        prompt_parts = [instructions, rendered_template]
+        cache_breakpoints = [
+            len(instructions),
+            len(instructions) + len("\n\n") + len(rendered_template),
+        ]
 
         if previous_message:
             prompt_parts.append(f"Previous generated message: {previous_message}")
@@ -97,14 +271,25 @@ class Normalizer:
             )
         if additional_prompt:
             prompt_parts.append(f"User additional prompt: {additional_prompt}")
+        if request_split_decision:
+            prompt_parts.append(
+                "End your answer with the split decision block described above."
+            )
 
         prompt = "\n\n".join(prompt_parts)
+        self._enter_stage(STAGE_FINAL)
+        if settings.AGGREGATE_MODE != AGGREGATE_MODE_SEPARATE:
+            self.stream_logger.info("\nGenerating final commit message...\n")
 
         try:
-            response = await self._call_provider_with_retry(
+            # The split decision block is not part of the message, so the raw
+            # answer is not streamed; only the extracted message is echoed.
+            response = await self._generate_final_message(
                 provider,
                 prompt,
-                diff_content=diff_content,
+                diff_content,
+                cache_breakpoints,
+                echo=not request_split_decision,
             )
         except Exception as e:
             self.logger.warning(
@@ -121,13 +306,407 @@ class Normalizer:
                 tokens_used=0,
             )
 
-        return response.model_copy(
+        content = response.content
+        suggest_split = diff_insights.suggest_split
+        split_reason = diff_insights.split_reason
+        split_groups = diff_insights.split_groups
+        if request_split_decision and response.provider != "local":
+            content, decision = self._extract_split_decision(content)
+            if decision is not None and decision[0]:
+                suggest_split, split_reason, split_groups = decision
+            self.stream_logger.info(f"{content}\n\n")
+
+        response = response.model_copy(
             update={
-                "suggest_split": diff_insights.suggest_split,
-                "split_reason": diff_insights.split_reason,
-                "split_groups": diff_insights.split_groups,
+                "content": content,
+                "suggest_split": suggest_split,
+                "split_reason": split_reason,
+                "split_groups": split_groups,
             }
         )
+        self._log_provider_timings()
+        if (
+            message_cache_key is not None
+            and response.provider != "local"
+            and not self._deadline_hit
+        ):
+            self._store_cached_message(message_cache_key, response)
+        return response
+
+    def _estimate_final_prompt_tokens(
+        self,
+        git_analyzer: GitStagedAnalyzer,
+        *,
+        user_input: str,
+        prompt_template: str,
+        rules_prompt: str,
+    ) -> int:
+        """Upper estimate of the final prompt: its fixed parts plus the diff budget."""
+
+        fixed_parts = "\n\n".join(
+            [
+                rules_prompt,
+                self._build_split_decision_instructions(),
+                prompt_template,
+                user_input,
+            ]
+        )
+        return (
+            git_analyzer.token_estimator.count(fixed_parts)
+            + git_analyzer.max_diff_tokens
+        )
+
+    def _pin_context_size(
+        self, providers: dict[str, Any], final_prompt_tokens: int
+    ) -> None:
+        """Give every local model one context size for the whole run.
+
+        Sized for the final call, the largest request, so summary calls on the
+        same model do not make the server reload it with another ``num_ctx``.
+        """
+
+        final_provider = providers[ROUTE_FINAL]
+        needed = final_prompt_tokens + (
+            getattr(final_provider, "max_tokens", None) or OLLAMA_OUTPUT_RESERVE
+        )
+        for provider in providers.values():
+            context_size = getattr(provider, "context_size", None)
+            if context_size is not None:
+                provider.num_ctx = context_size(needed)
+
+    def _start_warm_up(self, providers: dict[str, Any]) -> None:
+        """Preload local models in daemon threads while the summaries run.
+
+        Each model is warmed with the context size of its first request, once
+        per Normalizer; regenerating reuses the loaded model.
+        """
+
+        if not settings.OLLAMA_WARMUP:
+            return
+        for provider in providers.values():
+            warm_up = getattr(provider, "warm_up", None)
+            target = (
+                getattr(provider, "host", None),
+                getattr(provider, "model", None),
+                getattr(provider, "num_ctx", None),
+            )
+            if warm_up is None or target in self._warmed_models:
+                continue
+            self._warmed_models.add(target)
+            # Not awaited: requests sent before the model is loaded simply
+            # queue on the server.
+            _run_detached(warm_up).add_done_callback(self._log_warm_up_result)
+
+    def _log_warm_up_result(self, future: "asyncio.Future[Any]") -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.warning(f"Model warm-up failed: {future.exception()}")
+
+    def _log_provider_timings(self) -> None:
+        if not self._provider_timings:
+            return
+        total = ProviderTimings.total(self._provider_timings)
+        self.logger.info(
+            f"Provider timings over {len(self._provider_timings)} calls: "
+            f"{total.describe()}"
+        )
+
+    def _enter_stage(self, stage: str) -> None:
+        self._stage = stage
+        if self._deadline is not None:
+            self.logger.debug(
+                f"Entering {stage} stage after {self._deadline.elapsed():.1f}s, "
+                f"{self._deadline.remaining(stage):.1f}s until its checkpoint"
+            )
+
+    def _stage_remaining(self) -> Optional[float]:
+        """Seconds left in the current stage, or None without a deadline."""
+
+        if self._deadline is None:
+            return None
+        return self._deadline.remaining(self._stage)
+
+    def _create_stage_providers(self) -> dict[str, Any]:
+        """One provider per routed stage; unrouted stages share the default."""
+
+        providers: dict[str, Any] = {}
+        default_provider = None
+        for stage in ROUTED_STAGES:
+            route = resolve_stage_route(stage)
+            validate_stage_route(stage, route)
+            if route.is_default:
+                if default_provider is None:
+                    default_provider = create_provider()
+                providers[stage] = default_provider
+            else:
+                providers[stage] = self._create_routed_provider(stage, route)
+        return providers
+
+    def _create_routed_provider(self, stage: str, route: StageRoute) -> Any:
+        # Pooled instances are shared with other stages, so the overrides go
+        # on a shallow copy that still uses the same client.
+        provider = copy.copy(
+            create_provider(
+                route.provider,
+                model=route.model,
+                log_creation=False,
+                **route_credentials(stage, route),
+            )
+        )
+        if route.provider:
+            provider.provider = route.provider
+        if route.max_tokens is not None:
+            provider.max_tokens = route.max_tokens
+        if route.enable_thinking is not None:
+            provider.enable_thinking = route.enable_thinking
+        provider_name = getattr(provider, "provider", None) or settings.PROVIDER
+        self.logger.info(
+            f"Routing {stage.lower()} stage to {provider_name} "
+            f"with model {getattr(provider, 'model', None)}"
+        )
+        return provider
+
+    async def _generate_final_message(
+        self,
+        provider: Any,
+        prompt: str,
+        diff_content: str,
+        cache_breakpoints: Sequence[int] = (),
+        echo: bool = True,
+    ) -> AIResponse:
+        request_kwargs = {
+            "diff_content": diff_content,
+            "cache_breakpoints": list(cache_breakpoints),
+        }
+        if not settings.ENABLE_HEDGING:
+            return await self._call_provider_with_retry(
+                provider, prompt, silent=not echo, **request_kwargs
+            )
+
+        hedge_provider = self._get_hedge_provider(provider)
+        stats_key = build_result_key(
+            [
+                getattr(provider, "provider", None) or settings.PROVIDER,
+                getattr(provider, "model", None) or settings.MODEL,
+            ]
+        )
+        stats_cache = self._get_hedge_stats_cache()
+        stats = HedgeStats.from_payload(stats_cache.get(stats_key))
+        delay = stats.percentile(settings.HEDGE_PERCENTILE)
+        if delay is None:
+            delay = settings.HEDGE_DELAY_SECONDS
+
+        # Both requests are silent: a primary that streamed part of its answer
+        # before losing would otherwise leave it above the winner's output.
+        # Only the winning answer is echoed.
+        outcome = await hedged_call(
+            lambda: self._call_provider_with_retry(
+                provider, prompt, silent=True, **request_kwargs
+            ),
+            lambda: self._call_provider_with_retry(
+                hedge_provider, prompt, silent=True, **request_kwargs
+            ),
+            delay=delay,
+            is_valid=lambda response: bool(response.content.strip()),
+        )
+        if echo:
+            self.stream_logger.info(f"{outcome.response.content}\n\n")
+        stats.record(outcome)
+        stats_cache.put(stats_key, stats.to_payload())
+        self.logger.info(
+            f"Final call {'hedged' if outcome.hedged else 'not hedged'} after "
+            f"{delay:.1f}s hedge delay, won by {outcome.winner} "
+            f"(hedge rate {stats.hedge_rate * 100:.0f}%, "
+            f"hedge wins {stats.hedge_wins}/{stats.hedged})"
+        )
+        return outcome.response
+
+    def _get_hedge_provider(self, provider: Any) -> Any:
+        """Secondary provider for hedged requests, or the primary one."""
+
+        if not (settings.HEDGE_PROVIDER or settings.HEDGE_MODEL):
+            return provider
+        if self._hedge_provider is None:
+            self._hedge_provider = create_provider(
+                settings.HEDGE_PROVIDER,
+                model=settings.HEDGE_MODEL,
+                log_creation=False,
+            )
+        return self._hedge_provider
+
+    def _get_hedge_stats_cache(self) -> ResultCache:
+        if self._hedge_stats_cache is None:
+            self._hedge_stats_cache = ResultCache(
+                settings.resolve_cache_dir(), table="hedge_stats", max_entries=50
+            )
+        return self._hedge_stats_cache
+
+    def _requests_split_decision(self, diff_insights: DiffInsights) -> bool:
+        """Ask for a split decision only when a split is conceivable.
+
+        That takes at least two eligible files in different areas; otherwise
+        the block would only add output the user has to wait for.
+        """
+
+        if (
+            settings.AGGREGATE_MODE == AGGREGATE_MODE_SEPARATE
+            or not settings.ENABLE_SPLIT_SUGGESTION
+        ):
+            return False
+        eligible = self._split_eligible_summaries(diff_insights.file_summaries)
+        return len({item.area for item in eligible}) >= 2
+
+    def _build_split_decision_instructions(self) -> str:
+        return (
+            "After the commit message, output this block in plain text:\n"
+            f"{SPLIT_DECISION_MARKER}\n"
+            "Suggest Split: <yes|no>\n"
+            "Confidence: <0.00-1.00>\n"
+            "Split Reason: <short reason, empty when no>\n"
+            "Split Groups:\n"
+            "- <group 1>\n"
+            "- <group 2>\n"
+            "Suggest a split only when the staged changes are largely independent "
+            "topics. A deletion or rename must never be a reason to suggest "
+            "splitting.\n"
+            "This block is the only exception to the single-message rule."
+        )
+
+    def _extract_split_decision(
+        self, raw_text: str
+    ) -> tuple[str, Optional[tuple[bool, str, list[str]]]]:
+        """Separate the commit message from the trailing split decision block."""
+
+        lines = raw_text.splitlines()
+        marker_index = None
+        for index, line in enumerate(lines):
+            if line.strip().lower() == SPLIT_DECISION_MARKER:
+                marker_index = index
+        if marker_index is None:
+            return raw_text, None
+
+        content = "\n".join(lines[:marker_index]).strip()
+        block = "\n".join(lines[marker_index + 1 :])
+        parsed = self._parse_labeled_text(block)
+        suggest_split = self._parse_bool(parsed.get("suggest split", ""))
+        confidence = self._parse_float(parsed.get("confidence", ""))
+        threshold = max(0.0, min(1.0, settings.SPLIT_CONFIDENCE_THRESHOLD))
+        if confidence < threshold:
+            suggest_split = False
+        return content, (
+            suggest_split,
+            parsed.get("split reason", "").strip(),
+            self._parse_bullets_after_label(block, "split groups")[:6],
+        )
+
+    def _message_cache_key(
+        self,
+        staged_entries: list[StagedFileChange],
+        *,
+        user_input: str,
+        prompt_template: str,
+        language: str,
+        rules_prompt: str,
+        use_file_summary_for_large_diff: Optional[bool],
+    ) -> Optional[str]:
+        """Key a final message by the staged patch id and the user's intent."""
+
+        if not settings.ENABLE_MESSAGE_CACHE:
+            return None
+        patch_id = GitStagedAnalyzer.staged_patch_id(staged_entries)
+        if patch_id is None:
+            return None
+        return build_result_key(
+            [
+                MESSAGE_PROMPT_VERSION,
+                patch_id,
+                user_input,
+                language,
+                rules_prompt,
+                prompt_template,
+                settings.PROVIDER,
+                settings.MODEL,
+                resolve_stage_route(ROUTE_FINAL),
+                settings.ENABLE_SPLIT_SUGGESTION,
+                settings.AGGREGATE_MODE,
+                use_file_summary_for_large_diff is not False,
+            ]
+        )
+
+    def _get_message_cache(self) -> ResultCache:
+        if self._message_cache is None:
+            self._message_cache = ResultCache(
+                settings.resolve_cache_dir(),
+                table="commit_messages",
+                max_entries=settings.MESSAGE_CACHE_MAX_ENTRIES,
+            )
+        return self._message_cache
+
+    def _load_cached_message(self, key: str) -> Optional[AIResponse]:
+        payload = self._get_message_cache().get(key)
+        if not payload:
+            return None
+        try:
+            return AIResponse.model_validate(payload)
+        except ValueError as e:
+            self.logger.debug(f"Ignoring unreadable cached commit message: {e}")
+            return None
+
+    def _store_cached_message(self, key: str, response: AIResponse) -> None:
+        self._get_message_cache().put(key, response.model_dump())
+
+    async def _prepare_diff_context(
+        self,
+        git_analyzer: GitStagedAnalyzer,
+        providers: dict[str, Any],
+        staged_entries: list[StagedFileChange],
+        *,
+        language: str,
+        use_file_summary_for_large_diff: Optional[bool],
+        key: Optional[tuple[object, ...]],
+    ) -> PreparedDiffContext:
+        if not staged_entries:
+            raise ValueError("No staged textual changes found in the repository.")
+        is_truncated = git_analyzer.exceeds_prompt_budget(staged_entries)
+
+        enable_ai_summary = True
+        if is_truncated and use_file_summary_for_large_diff is not None:
+            enable_ai_summary = use_file_summary_for_large_diff
+
+        self._enter_stage(STAGE_SUMMARIES)
+        if enable_ai_summary and self._deadline and self._deadline.expired(
+            STAGE_SUMMARIES
+        ):
+            self.logger.warning(
+                "Deadline reached while collecting the diff, using local summaries"
+            )
+            self._deadline_hit = True
+            enable_ai_summary = False
+
+        diff_insights = await self._build_diff_insights(
+            provider=providers[ROUTE_SUMMARY],
+            entries=staged_entries,
+            language=language,
+            is_truncated=is_truncated,
+            enable_ai_summary=enable_ai_summary,
+            aggregate_provider=providers[ROUTE_AGGREGATE],
+        )
+
+        if is_truncated and not enable_ai_summary:
+            diff_content = self._compose_diff_context(
+                self._build_file_list_context(staged_entries), diff_insights
+            )
+        else:
+            diff_content = self._compose_diff_context(
+                self._assemble_file_context(
+                    git_analyzer, staged_entries, diff_insights
+                ),
+                diff_insights,
+                include_file_summaries=False,
+            )
+
+        return PreparedDiffContext(
+            key=key, diff_content=diff_content, diff_insights=diff_insights
+        )
 
     async def _build_diff_insights(
         self,
@@ -136,31 +715,59 @@ class Normalizer:
         language: str,
         is_truncated: bool,
         enable_ai_summary: bool,
+        aggregate_provider: Any = None,
     ) -> DiffInsights:
-        limited_entries = entries[: max(1, settings.MAX_DIFF_FILES_FOR_AI)]
         if not enable_ai_summary:
-            return self._heuristic_diff_insights(limited_entries, is_truncated)
+            return self._heuristic_diff_insights(entries, is_truncated)
 
-        file_summaries = await self._summarize_files_with_ai(
+        summarized_entries = self._select_entries_for_ai_summary(entries)
+        ai_summaries = await self._summarize_files_with_ai(
             provider=provider,
-            entries=limited_entries,
+            entries=summarized_entries,
             language=language,
         )
 
-        if not file_summaries:
-            return self._heuristic_diff_insights(limited_entries, is_truncated)
+        if not ai_summaries:
+            return self._heuristic_diff_insights(entries, is_truncated)
 
-        (
-            aggregate,
-            suggest_split,
-            split_reason,
-            split_groups,
-        ) = await self._aggregate_with_ai(
-            provider=provider,
-            file_summaries=file_summaries,
-            language=language,
-        )
+        # Files past the AI summary cap keep a heuristic summary so they still
+        # reach the directory and repo reductions.
+        summaries_by_path = {item.path: item for item in ai_summaries}
+        file_summaries = [
+            summaries_by_path.get(entry.path) or self._heuristic_file_summary(entry)
+            for entry in entries
+        ]
 
+        self._enter_stage(STAGE_AGGREGATE)
+        aggregate_provider = aggregate_provider or provider
+        directory_summaries: list[SummaryNode] = []
+        repo_summary = ""
+        if len(file_summaries) > max(2, settings.SUMMARY_REDUCE_FAN_IN):
+            reduction = await self._reduce_file_summaries(
+                aggregate_provider,
+                file_summaries,
+                language=language,
+                max_calls=settings.MAX_SUMMARY_CALLS - self._summary_calls,
+            )
+            directory_summaries = reduction.directory_summaries
+            repo_summary = reduction.repo_summary
+
+        if settings.AGGREGATE_MODE == AGGREGATE_MODE_SEPARATE:
+            (
+                aggregate,
+                suggest_split,
+                split_reason,
+                split_groups,
+            ) = await self._aggregate_with_ai(
+                provider=aggregate_provider,
+                file_summaries=ai_summaries,
+                language=language,
+            )
+        else:
+            # The final call returns the split decision with the message.
+            aggregate, suggest_split, split_reason, split_groups = "", False, "", []
+
+        aggregate = repo_summary or aggregate
         if not aggregate:
             aggregate = self._heuristic_aggregate(file_summaries, is_truncated)
 
@@ -183,7 +790,64 @@ class Normalizer:
             suggest_split=suggest_split,
             split_reason=split_reason,
             split_groups=split_groups,
+            directory_summaries=directory_summaries,
+        )
+
+    def _select_entries_for_ai_summary(
+        self, entries: list[StagedFileChange]
+    ) -> list[StagedFileChange]:
+        """Keep the files with the most changed lines within MAX_DIFF_FILES_FOR_AI.
+
+        Structural and stat-only entries never need a model call, so they are
+        always kept and do not count against the cap.
+        """
+
+        limit = max(1, settings.MAX_DIFF_FILES_FOR_AI)
+        candidates = [
+            index
+            for index, entry in enumerate(entries)
+            if not (entry.is_structural_change or entry.is_stat_only)
+        ]
+        selected = set(
+            sorted(
+                candidates,
+                key=lambda index: (-changed_line_count(entries[index]), index),
+            )[:limit]
         )
+        return [
+            entry
+            for index, entry in enumerate(entries)
+            if index in selected or entry.is_structural_change or entry.is_stat_only
+        ]
+
+    async def _reduce_file_summaries(
+        self,
+        provider: Any,
+        file_summaries: list[FileDiffSummary],
+        *,
+        language: str,
+        max_calls: int,
+    ) -> ReductionResult:
+        async def call(prompt: str) -> str:
+            result = await self._call_provider_with_retry(
+                provider, prompt, silent=True
+            )
+            return result.content
+
+        reducer = HierarchicalSummaryReducer(
+            call,
+            fan_in=settings.SUMMARY_REDUCE_FAN_IN,
+            concurrency=self.concurrency_limiter.maximum,
+            max_calls=max_calls,
+            language=language,
+        )
+        nodes = [SummaryNode(item.path, item.summary) for item in file_summaries]
+        reduction = await reducer.reduce(nodes)
+        self.logger.debug(
+            f"Reduced {len(nodes)} file summaries in {reduction.depth} levels "
+            f"with {reduction.calls} calls"
+        )
+        return reduction
 
     async def _summarize_files_with_ai(
         self,
@@ -191,91 +855,312 @@ class Normalizer:
         entries: list[StagedFileChange],
         language: str,
     ) -> list[FileDiffSummary]:
-        del provider
-        concurrency = max(1, settings.DIFF_SUMMARY_CONCURRENCY)
+        self._summary_calls = 0
         if not entries:
             return []
 
+        # All files share one provider, so requests reuse its keep-alive
+        # connections. The adaptive limiter decides how many provider calls run
+        # at once; the semaphore only bounds the work units started.
+        limiter = self.concurrency_limiter
+        semaphore = asyncio.Semaphore(limiter.maximum)
         summaries: list[Optional[FileDiffSummary]] = [None] * len(entries)
-
-        with ThreadPoolExecutor(max_workers=concurrency) as executor:
-            futures = [
-                executor.submit(
-                    self._summarize_file_with_ai_in_thread,
-                    index,
-                    entry,
-                    language,
-                )
-                for index, entry in enumerate(entries)
-            ]
-
+        cache_keys = [
+            self._summary_cache_key(provider, entry, language) for entry in entries
+        ]
+        pending: list[tuple[int, StagedFileChange]] = []
+        for index, entry in enumerate(entries):
+            cached = self._load_cached_summary(cache_keys[index], entry)
+            if cached is None:
+                pending.append((index, entry))
+            else:
+                summaries[index] = cached
+
+        async def summarize(
+            batch: list[tuple[int, StagedFileChange]],
+        ) -> list[tuple[int, FileDiffSummary]]:
+            async with semaphore:
+                if len(batch) > 1:
+                    return await self._summarize_batch_with_ai(
+                        provider, batch, language
+                    )
+                index, entry = batch[0]
+                return [
+                    await self._summarize_file_with_ai(
+                        provider, index, entry, language
+                    )
+                ]
+
+        tasks = [
+            asyncio.create_task(summarize(batch))
+            for batch in self._plan_summary_batches(pending)
+        ]
+        try:
             with tqdm(
                 total=len(entries),
                 desc="Summarizing files",
                 unit="file",
             ) as progress:
-                for completed in as_completed(futures):
-                    index, file_summary = completed.result()
-                    summaries[index] = file_summary
-                    progress.update(1)
-
+                progress.update(len(entries) - len(pending))
+                for completed in asyncio.as_completed(tasks):
+                    results = await completed
+                    for index, file_summary in results:
+                        summaries[index] = file_summary
+                        self._store_cached_summary(cache_keys[index], file_summary)
+                    progress.update(len(results))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        self.logger.debug(
+            f"File summaries finished with provider concurrency limit "
+            f"{int(limiter.limit)} (peak {limiter.peak} in flight)"
+        )
         return [item for item in summaries if item is not None]
 
+    def _summary_cache_key(
+        self, provider: Any, entry: StagedFileChange, language: str
+    ) -> Optional[str]:
+        """Content address of one file summary, or None when not cacheable."""
+
+        if entry.is_structural_change or entry.is_stat_only:
+            return None
+        if not entry.new_blob and not entry.old_blob:
+            return None
+        return build_result_key(
+            [
+                SUMMARY_PROMPT_VERSION,
+                entry.old_blob or "",
+                entry.new_blob or "",
+                entry.path,
+                entry.status,
+                getattr(provider, "provider", None) or settings.PROVIDER,
+                getattr(provider, "model", None) or settings.MODEL,
+                language,
+                settings.MAX_DIFF_FILE_LINES,
+            ]
+        )
+
+    def _get_summary_cache(self) -> Optional[ResultCache]:
+        if not settings.ENABLE_SUMMARY_CACHE:
+            return None
+        if self._summary_cache is None:
+            self._summary_cache = ResultCache(
+                settings.resolve_cache_dir(),
+                table="file_summaries",
+                max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+            )
+        return self._summary_cache
+
+    def _load_cached_summary(
+        self, key: Optional[str], entry: StagedFileChange
+    ) -> Optional[FileDiffSummary]:
+        cache = self._get_summary_cache() if key else None
+        if cache is None or key is None:
+            return None
+        payload = cache.get(key)
+        if not payload:
+            return None
+        return FileDiffSummary(
+            path=entry.path,
+            status=entry.status,
+            summary=str(payload.get("summary", "")),
+            tags=tuple(payload.get("tags", ())),
+            area=str(payload.get("area", "")) or self._infer_area(entry.path),
+        )
+
+    def _store_cached_summary(
+        self, key: Optional[str], file_summary: FileDiffSummary
+    ) -> None:
+        cache = self._get_summary_cache() if key else None
+        if cache is None or key is None or file_summary.source != "ai":
+            return
+        cache.put(
+            key,
+            {
+                "summary": file_summary.summary,
+                "tags": list(file_summary.tags),
+                "area": file_summary.area,
+            },
+        )
+
+    def _plan_summary_batches(
+        self, entries: list[tuple[int, StagedFileChange]]
+    ) -> list[list[tuple[int, StagedFileChange]]]:
+        """Pack small file diffs into shared requests under a token cap.
+
+        Files that need no model call or do not fit the cap keep their own
+        unit; a batch holding a single file is sent as a per-file request.
+        """
+
+        token_cap = settings.DIFF_SUMMARY_BATCH_TOKENS
+        max_files = max(1, settings.DIFF_SUMMARY_BATCH_MAX_FILES)
+        if token_cap <= 0 or max_files == 1:
+            return [[item] for item in entries]
+
+        estimator = get_token_estimator(
+            resolve_stage_route(ROUTE_SUMMARY).model or settings.MODEL,
+            settings.TOKEN_ESTIMATOR,
+        )
+        units: list[list[tuple[int, StagedFileChange]]] = []
+        batch: list[tuple[int, StagedFileChange]] = []
+        batch_tokens = 0
+        for index, entry in entries:
+            if entry.is_structural_change or entry.is_stat_only:
+                units.append([(index, entry)])
+                continue
+
+            tokens = estimator.count(entry.preview_diff) + estimator.count(entry.path)
+            if tokens > token_cap // 2:
+                units.append([(index, entry)])
+                continue
+
+            if batch and (
+                batch_tokens + tokens > token_cap or len(batch) >= max_files
+            ):
+                units.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append((index, entry))
+            batch_tokens += tokens
+
+        if batch:
+            units.append(batch)
+        return units
+
+    async def _summarize_batch_with_ai(
+        self,
+        provider: Any,
+        batch: list[tuple[int, StagedFileChange]],
+        language: str,
+    ) -> list[tuple[int, FileDiffSummary]]:
+        file_sections = [
+            f"=== File {number} ===\n"
+            f"File path: {entry.path}\n"
+            f"File status: {entry.status}\n"
+            f"Diff snippet:\n{entry.preview_diff}"
+            for number, (_, entry) in enumerate(batch, start=1)
+        ]
+        instructions = (
+            "Summarize each staged file diff below. Use plain text format only.\n"
+            f"Output language: {language}\n"
+            "For every file, in the same order, output one block exactly in this shape:\n"
+            "File: <file path>\n"
+            "Summary: <one sentence, <=18 words>\n"
+            "Tags: <comma-separated short tags>\n"
+            "Area: <ui|database|api|test|docs|ci|core>\n"
+            "Separate blocks with a blank line. No markdown, no code fences, no JSON.\n\n"
+        )
+        prompt = instructions + "\n\n".join(file_sections)
+
+        parsed_blocks: dict[str, dict[str, str]] = {}
+        self._summary_calls += 1
+        try:
+            result = await self._call_provider_with_retry(
+                provider,
+                prompt,
+                silent=True,
+                cache_breakpoints=[len(instructions)],
+            )
+            parsed_blocks = self._parse_file_blocks(result.content)
+        except Exception as e:
+            self.logger.debug(f"Batched file summary failed, retrying per file: {e}")
+
+        results: list[tuple[int, FileDiffSummary]] = []
+        for index, entry in batch:
+            file_summary = self._file_summary_from_fields(
+                entry, parsed_blocks.get(entry.path, {})
+            )
+            if file_summary is None:
+                results.append(
+                    await self._summarize_file_with_ai(
+                        provider, index, entry, language
+                    )
+                )
+            else:
+                results.append((index, file_summary))
+        return results
+
+    def _parse_file_blocks(self, raw_text: str) -> dict[str, dict[str, str]]:
+        block_lines: dict[str, list[str]] = {}
+        current: Optional[list[str]] = None
+        for line in raw_text.splitlines():
+            if line.strip().lower().startswith("file:"):
+                path = line.split(":", 1)[1].strip().strip("`")
+                current = block_lines.setdefault(path, [])
+            elif current is not None:
+                current.append(line)
+
+        return {
+            path: self._parse_labeled_text("\n".join(lines))
+            for path, lines in block_lines.items()
+        }
+
+    def _file_summary_from_fields(
+        self, entry: StagedFileChange, fields: dict[str, str]
+    ) -> Optional[FileDiffSummary]:
+        summary = fields.get("summary", "").strip()
+        if not summary:
+            return None
+
+        tags = self._split_csv(fields.get("tags", ""))
+        area = fields.get("area", "").strip().lower()
+        return FileDiffSummary(
+            path=entry.path,
+            status=entry.status,
+            summary=summary,
+            tags=tuple(tags)[:5],
+            area=area or self._infer_area(entry.path),
+        )
+
     def _build_file_list_context(self, entries: list[StagedFileChange]) -> list[str]:
         lines = [
-            f"Total staged changes exceed {settings.MAX_DIFF_LENGTH} characters.",
+            "Total staged changes exceed the diff context budget.",
             "Using staged file list only:",
         ]
         lines.extend(f"- {entry.path} ({entry.status})" for entry in entries)
         return ["\n".join(lines)]
 
-    def _summarize_file_with_ai_in_thread(
+    async def _summarize_file_with_ai(
         self,
+        provider: Any,
         index: int,
         entry: StagedFileChange,
         language: str,
     ) -> tuple[int, FileDiffSummary]:
-        if entry.is_structural_change:
+        if entry.is_structural_change or entry.is_stat_only:
             return index, self._heuristic_file_summary(entry)
 
-        prompt = (
+        # The instructions are identical for every file and come first, so the
+        # provider can serve them from its prompt cache.
+        instructions = (
             "Summarize one staged file diff. Use plain text format only.\n"
             f"Output language: {language}\n"
-            f"File path: {entry.path}\n"
-            f"File status: {entry.status}\n"
-            "Diff snippet:\n"
-            f"{entry.preview_diff}\n"
             "Output exactly in this shape:\n"
             "Summary: <one sentence, <=18 words>\n"
             "Tags: <comma-separated short tags>\n"
             "Area: <ui|database|api|test|docs|ci|core>\n"
-            "No markdown, no code fences, no JSON."
+            "No markdown, no code fences, no JSON.\n"
+        )
+        prompt = (
+            instructions + f"File path: {entry.path}\n"
+            f"File status: {entry.status}\n"
+            "Diff snippet:\n"
+            f"{entry.preview_diff}\n"
         )
 
+        self._summary_calls += 1
         try:
-            provider = create_provider(log_creation=False)
-            result = asyncio.run(
-                self._call_provider_with_retry(
-                    provider,
-                    prompt,
-                    silent=True,
-                )
+            result = await self._call_provider_with_retry(
+                provider,
+                prompt,
+                silent=True,
+                cache_breakpoints=[len(instructions)],
             )
-            parsed = self._parse_labeled_text(result.content)
-            summary = parsed.get("summary", "").strip()
-            tags = self._split_csv(parsed.get("tags", ""))
-            area = parsed.get("area", "").strip().lower()
-            if summary:
-                return (
-                    index,
-                    FileDiffSummary(
-                        path=entry.path,
-                        status=entry.status,
-                        summary=summary,
-                        tags=tuple(tags)[:5],
-                        area=area or self._infer_area(entry.path),
-                    ),
-                )
+            file_summary = self._file_summary_from_fields(
+                entry, self._parse_labeled_text(result.content)
+            )
+            if file_summary is not None:
+                return index, file_summary
         except Exception:
             pass
 
@@ -311,24 +1196,27 @@ class Normalizer:
                 f"- path={item.path}; status={item.status}; area={item.area}; tags={','.join(item.tags)}; summary={item.summary}"
             )
 
-        prompt = (
+        instructions = (
             "You are analyzing staged file-level change summaries. Use plain text format only.\n"
             f"Output language: {language}\n"
-            "All file summaries (use these for the aggregate summary):\n"
+            "Rules: suggest_split should be true only when eligible changes are largely independent topics. "
+            "A deletion or rename must never be a reason to suggest splitting.\n"
+            "Output exactly in this shape:\n"
+            "Aggregate Summary: <one or two sentences>\n"
+            "Suggest Split: <yes|no>\n"
+            "Confidence: <0.00-1.00>\n"
+            "Split Reason: <short reason, empty when no>\n"
+            "Split Groups:\n"
+            "- <group 1>\n"
+            "- <group 2>\n"
+            "No markdown, no code fences, no JSON.\n"
+        )
+        prompt = (
+            instructions
+            + "All file summaries (use these for the aggregate summary):\n"
             + "\n".join(data_lines)
             + "\nSummaries eligible for the split decision (deleted and renamed files are excluded):\n"
             + "\n".join(split_candidate_lines)
-            + "\nRules: suggest_split should be true only when eligible changes are largely independent topics. "
-            + "A deletion or rename must never be a reason to suggest splitting.\n"
-            + "Output exactly in this shape:\n"
-            + "Aggregate Summary: <one or two sentences>\n"
-            + "Suggest Split: <yes|no>\n"
-            + "Confidence: <0.00-1.00>\n"
-            + "Split Reason: <short reason, empty when no>\n"
-            + "Split Groups:\n"
-            + "- <group 1>\n"
-            + "- <group 2>\n"
-            + "No markdown, no code fences, no JSON."
         )
 
         try:
@@ -337,6 +1225,7 @@ class Normalizer:
                 provider,
                 prompt,
                 silent=True,
+                cache_breakpoints=[len(instructions)],
             )
             parsed = self._parse_labeled_text(result.content)
             aggregate = parsed.get("aggregate summary", "").strip()
@@ -368,15 +1257,52 @@ class Normalizer:
             heuristic_groups,
         )
 
+    def _assemble_file_context(
+        self,
+        git_analyzer: GitStagedAnalyzer,
+        entries: list[StagedFileChange],
+        diff_insights: DiffInsights,
+    ) -> list[str]:
+        summaries = {}
+        areas = {}
+        for item in diff_insights.file_summaries:
+            areas[item.path] = item.area
+            if item.source == "ai":
+                tags = f" tags=[{', '.join(item.tags)}]" if item.tags else ""
+                summaries[item.path] = f"{item.summary}{tags}"
+
+        assembler = ContextAssembler(
+            budget=git_analyzer.max_diff_tokens,
+            estimator=git_analyzer.token_estimator,
+            preview_lines=git_analyzer.max_diff_file_lines,
+            hunk_packer=git_analyzer.render_partial_hunks,
+        )
+        assembled = assembler.assemble(entries, summaries=summaries, areas=areas)
+        self.logger.debug(
+            f"Assembled {assembled.tokens}/{assembled.budget} context tokens: "
+            f"{assembled.fidelity_counts()}"
+        )
+        return [item.text for item in assembled.files]
+
     def _compose_diff_context(
-        self, cached_diff: list[str], diff_insights: DiffInsights
+        self,
+        cached_diff: list[str],
+        diff_insights: DiffInsights,
+        include_file_summaries: bool = True,
     ) -> str:
         context_parts = []
         if diff_insights.aggregate_summary:
             context_parts.append("AI aggregate diff summary:")
             context_parts.append(diff_insights.aggregate_summary)
 
-        if diff_insights.file_summaries:
+        if diff_insights.directory_summaries:
+            context_parts.append("Directory summaries:")
+            for node in diff_insights.directory_summaries:
+                context_parts.append(
+                    f"- {node.path or '.'}/ ({node.file_count} files): {node.summary}"
+                )
+
+        if include_file_summaries and diff_insights.file_summaries:
             context_parts.append("File-level summaries:")
             for item in diff_insights.file_summaries:
                 tags = f" tags=[{', '.join(item.tags)}]" if item.tags else ""
@@ -428,6 +1354,7 @@ class Normalizer:
             summary=summary,
             tags=(area, entry.status),
             area=area,
+            source="heuristic",
         )
 
     def _heuristic_aggregate(
@@ -563,48 +1490,98 @@ class Normalizer:
         prompt: str,
         **kwargs,
     ) -> AIResponse:
-        attempts = max(5, settings.RETRY_MAX_ATTEMPTS)
-        base_delay = max(2.0, settings.RETRY_BASE_DELAY_SECONDS)
-        max_delay = max(base_delay, settings.RETRY_MAX_DELAY_SECONDS, 30.0)
-        retry_scale = 1.5
-
-        for attempt in range(1, attempts + 1):
+        limits = {
+            RETRY_RATE_LIMIT: max(1, settings.RETRY_MAX_ATTEMPTS),
+            RETRY_TRANSIENT: max(1, settings.RETRY_TRANSIENT_MAX_ATTEMPTS),
+        }
+        base_delay = max(0.0, settings.RETRY_BASE_DELAY_SECONDS)
+        max_delay = max(base_delay, settings.RETRY_MAX_DELAY_SECONDS)
+        # Rate limits and transient failures draw from separate attempt budgets.
+        attempts = {RETRY_RATE_LIMIT: 0, RETRY_TRANSIENT: 0}
+
+        async def invoke() -> AIResponse:
+            async with self.concurrency_limiter.slot(self._is_rate_limit_error):
+                response = await self._invoke_provider(provider, prompt, **kwargs)
+            timings = getattr(response, "timings", None)
+            if timings is not None:
+                self._provider_timings.append(timings)
+            return response
+
+        while True:
+            timeout = self._stage_remaining()
+            if timeout is not None and timeout <= 0.0:
+                self._deadline_hit = True
+                raise asyncio.TimeoutError(
+                    f"Deadline reached in the {self._stage} stage"
+                )
             try:
-                return await provider.normalize_commit(prompt, **kwargs)
+                return await asyncio.wait_for(invoke(), timeout)
             except Exception as exc:
-                if not self._is_rate_limit_error(exc) or attempt >= attempts:
+                if timeout is not None and isinstance(exc, asyncio.TimeoutError):
+                    # The call was cut off at the stage checkpoint.
+                    self._deadline_hit = True
+                    raise
+                decision = classify_error(exc)
+                if not decision.retryable:
+                    raise
+                attempts[decision.kind] += 1
+                attempt = attempts[decision.kind]
+                limit = limits[decision.kind]
+                if attempt >= limit:
                     raise
 
-                wait_seconds = min(
-                    max_delay,
-                    base_delay * (2 ** (attempt - 1)) * retry_scale,
-                )
-                self.logger.warning(
-                    "Rate limit detected, retrying in %.1fs (attempt %d/%d): %s",
-                    wait_seconds,
-                    attempt,
-                    attempts,
-                    exc,
-                )
-                self.stream_logger.info(
-                    f"\n检测到模型限流，{wait_seconds:.1f}s 后自动重试（{attempt}/{attempts}）...\n"
+                if decision.retry_after is not None and (
+                    decision.retry_after > max_delay
+                ):
+                    # Retrying before the server's reset time would only fail
+                    # again, and an interactive run should not sleep for it.
+                    self.logger.warning(
+                        f"Not retrying, the provider asks to wait "
+                        f"{decision.retry_after:.0f}s (limit {max_delay:.0f}s): "
+                        f"{exc}"
+                    )
+                    raise
+                wait_seconds = backoff_delay(
+                    attempt, base_delay, max_delay, decision.retry_after
                 )
+                remaining = self._stage_remaining()
+                if remaining is not None and wait_seconds >= remaining:
+                    self._deadline_hit = True
+                    self.logger.warning(
+                        f"Not retrying, {remaining:.1f}s left in the "
+                        f"{self._stage} stage: {exc}"
+                    )
+                    raise
+                if decision.kind == RETRY_RATE_LIMIT:
+                    self.logger.warning(
+                        f"Rate limit detected, retrying in {wait_seconds:.1f}s "
+                        f"(attempt {attempt}/{limit}): {exc}"
+                    )
+                    self.stream_logger.info(
+                        f"\n检测到模型限流，{wait_seconds:.1f}s 后自动重试"
+                        f"（{attempt}/{limit}）...\n"
+                    )
+                else:
+                    self.logger.warning(
+                        f"Transient provider error (status {decision.status_code}), "
+                        f"retrying in {wait_seconds:.1f}s "
+                        f"(attempt {attempt}/{limit}): {exc}"
+                    )
                 await asyncio.sleep(wait_seconds)
 
-        raise RuntimeError("Provider retry failed unexpectedly")
+    async def _invoke_provider(
+        self, provider: Any, prompt: str, **kwargs: Any
+    ) -> AIResponse:
+        if getattr(provider, "uses_blocking_client", False):
+            # Keep the shared loop free while a synchronous SDK call runs; the
+            # provider instance and its connection pool are still shared.
+            return await _run_detached(
+                lambda: asyncio.run(provider.normalize_commit(prompt, **kwargs))
+            )
+        return await provider.normalize_commit(prompt, **kwargs)
 
-    def _is_rate_limit_error(self, exc: Exception) -> bool:
-        message = str(exc).lower()
-        keywords = (
-            "429",
-            "rate limit",
-            "too many requests",
-            "rpm limit",
-            "limit exceeded",
-            "throttl",
-            "quota",
-        )
-        return any(token in message for token in keywords)
+    def _is_rate_limit_error(self, exc: BaseException) -> bool:
+        return classify_error(exc).kind == RETRY_RATE_LIMIT
 
     def _build_fallback_commit_message(
         self,
@@ -0,0 +1,236 @@
+"""Classification of provider errors and jittered retry delays."""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import re
+import time
+from typing import Any, Mapping, Optional
+
+RETRY_RATE_LIMIT = "rate_limit"
+RETRY_TRANSIENT = "transient"
+RETRY_FATAL = "fatal"
+
+RATE_LIMIT_STATUS_CODES = frozenset({429})
+# Statuses whose ``Retry-After`` header is a promise about when to come back;
+# on other errors it is ignored.
+RETRY_AFTER_STATUS_CODES = frozenset({429, 503})
+TRANSIENT_STATUS_CODES = frozenset(
+    {408, 425, 500, 502, 503, 504, 520, 522, 524, 529}
+)
+# Exception class names raised by httpx, or by vendor SDKs used in custom
+# providers, for dropped connections and timeouts. Matched by name so that
+# optional SDKs do not have to be importable.
+TRANSIENT_ERROR_NAMES = frozenset(
+    {
+        "APIConnectionError",
+        "APITimeoutError",
+        "TransportError",
+        "TimeoutException",
+        "ConnectError",
+        "ReadError",
+        "WriteError",
+        "RemoteProtocolError",
+        "ConnectionError",
+        "TimeoutError",
+    }
+)
+RATE_LIMIT_ERROR_NAMES = frozenset({"RateLimitError"})
+RATE_LIMIT_KEYWORDS = (
+    "429",
+    "rate limit",
+    "too many requests",
+    "rpm limit",
+    "limit exceeded",
+    "throttl",
+)
+# Billing and account quota errors do not recover by waiting, even when they
+# arrive as a 429 (OpenAI reports ``insufficient_quota`` that way).
+FATAL_KEYWORDS = (
+    "insufficient_quota",
+    "insufficient quota",
+    "insufficient balance",
+    "billing",
+    "余额不足",
+)
+# (remaining, reset) header pairs; a bucket with nothing remaining is the one
+# that caused the rate limit.
+RATE_LIMIT_BUCKET_HEADERS = (
+    ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+    ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    ("x-ratelimit-remaining", "x-ratelimit-reset"),
+    ("anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+    ("anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+    ("ratelimit-remaining", "ratelimit-reset"),
+)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+@dataclass(frozen=True)
+class RetryDecision:
+    kind: str
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind != RETRY_FATAL
+
+
+def classify_error(exc: BaseException) -> RetryDecision:
+    """Decide whether a provider error is worth retrying, and when."""
+
+    status_code = _status_code(exc)
+    headers = _headers(exc)
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    message = str(exc).lower()
+
+    if any(keyword in message for keyword in FATAL_KEYWORDS):
+        return RetryDecision(RETRY_FATAL, status_code)
+    if status_code in RATE_LIMIT_STATUS_CODES or names & RATE_LIMIT_ERROR_NAMES:
+        return RetryDecision(
+            RETRY_RATE_LIMIT,
+            status_code,
+            retry_after_from_headers(headers, rate_limited=True),
+        )
+    if status_code in TRANSIENT_STATUS_CODES:
+        retry_after = None
+        if status_code in RETRY_AFTER_STATUS_CODES:
+            retry_after = retry_after_from_headers(headers)
+        return RetryDecision(RETRY_TRANSIENT, status_code, retry_after)
+    if status_code is None and names & TRANSIENT_ERROR_NAMES:
+        return RetryDecision(RETRY_TRANSIENT, None)
+
+    # Some OpenAI-compatible gateways report quota errors with other status
+    # codes (for example 403) or only in the message text.
+    if any(keyword in message for keyword in RATE_LIMIT_KEYWORDS):
+        return RetryDecision(
+            RETRY_RATE_LIMIT,
+            status_code,
+            retry_after_from_headers(headers, rate_limited=True),
+        )
+    return RetryDecision(RETRY_FATAL, status_code)
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: Optional[float] = None,
+    rng: Optional[random.Random] = None,
+) -> float:
+    """Full-jitter exponential backoff; a server hint sets the minimum wait.
+
+    The result never exceeds ``max_delay``, including server hints; callers
+    that cannot usefully retry that early should give up instead.
+    """
+
+    rng = rng or random
+    ceiling = min(max_delay, base_delay * (2 ** max(0, attempt - 1)))
+    delay = rng.uniform(0.0, max(0.0, ceiling))
+    if retry_after is not None:
+        # Spread clients that were told the same reset time.
+        spread = max(0.0, min(ceiling, retry_after)) * 0.1
+        delay = retry_after + rng.uniform(0.0, spread)
+    return min(max(0.0, max_delay), delay)
+
+
+def retry_after_from_headers(
+    headers: Optional[Mapping[str, Any]],
+    rate_limited: bool = False,
+) -> Optional[float]:
+    """Read the server's retry hint.
+
+    ``Retry-After`` is always honoured. Rate-limit bucket resets only apply to
+    rate-limit errors, and only for buckets with nothing remaining: a bucket
+    that still has capacity did not cause the error.
+    """
+
+    if not headers:
+        return None
+
+    lowered = {str(key).lower(): str(value) for key, value in headers.items()}
+    if "retry-after-ms" in lowered:
+        seconds = _parse_number(lowered["retry-after-ms"])
+        if seconds is not None:
+            return max(0.0, seconds / 1000)
+    if "retry-after" in lowered:
+        seconds = _parse_seconds_or_date(lowered["retry-after"])
+        if seconds is not None:
+            return seconds
+    if not rate_limited:
+        return None
+
+    exhausted: list[float] = []
+    for remaining_header, reset_header in RATE_LIMIT_BUCKET_HEADERS:
+        if reset_header not in lowered:
+            continue
+        if _parse_number(lowered.get(remaining_header, "")) != 0:
+            continue
+        seconds = _parse_reset(lowered[reset_header])
+        if seconds is not None:
+            exhausted.append(seconds)
+    return max(exhausted) if exhausted else None
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for candidate in (
+        getattr(exc, "status_code", None),
+        getattr(exc, "status", None),
+        getattr(getattr(exc, "response", None), "status_code", None),
+    ):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def _headers(exc: BaseException) -> Optional[Mapping[str, Any]]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None)
+    return headers if hasattr(headers, "items") else None
+
+
+def _parse_number(value: str) -> Optional[float]:
+    try:
+        return float(value.strip())
+    except ValueError:
+        return None
+
+
+def _parse_seconds_or_date(value: str) -> Optional[float]:
+    seconds = _parse_number(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def _parse_reset(value: str) -> Optional[float]:
+    """Parse reset hints such as ``1s``, ``6m0s``, ``20ms``, epochs or timestamps."""
+
+    value = value.strip()
+    number = _parse_number(value)
+    if number is not None:
+        # Large values are epoch timestamps rather than relative seconds.
+        if number > 1_000_000_000:
+            return max(0.0, number - time.time())
+        return max(0.0, number)
+
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(amount + unit for amount, unit in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,118 @@
+"""Per-stage provider, model and generation settings."""
+
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from cmai.config.settings import settings
+from cmai.providers.ollama_provider import OLLAMA_PROVIDER_NAMES
+
+ROUTE_SUMMARY = "SUMMARY"
+ROUTE_AGGREGATE = "AGGREGATE"
+ROUTE_FINAL = "FINAL"
+ROUTED_STAGES = (ROUTE_SUMMARY, ROUTE_AGGREGATE, ROUTE_FINAL)
+# Output tokens a thinking-enabled Anthropic call keeps for the answer itself;
+# Anthropic counts ``budget_tokens`` against ``max_tokens``.
+THINKING_OUTPUT_RESERVE = 256
+
+
+@dataclass(frozen=True)
+class StageRoute:
+    """Overrides for one stage; None fields fall back to the global settings."""
+
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    enable_thinking: Optional[bool] = None
+    # Not in repr: routes are part of cache keys and debug logs.
+    api_key: Optional[str] = field(default=None, repr=False)
+    api_base: Optional[str] = None
+
+    @property
+    def is_default(self) -> bool:
+        return self == StageRoute()
+
+    @property
+    def changes_provider(self) -> bool:
+        """Whether the stage talks to another provider than ``PROVIDER``."""
+
+        if not self.provider:
+            return False
+        current = (settings.PROVIDER or "openai").lower()
+        routed = self.provider.lower()
+        if routed in OLLAMA_PROVIDER_NAMES:
+            return current not in OLLAMA_PROVIDER_NAMES
+        return routed != current
+
+
+def resolve_stage_route(stage: str) -> StageRoute:
+    """Read the ``<STAGE>_*`` routing settings of one stage."""
+
+    return StageRoute(
+        provider=getattr(settings, f"{stage}_PROVIDER") or None,
+        model=getattr(settings, f"{stage}_MODEL") or None,
+        max_tokens=getattr(settings, f"{stage}_MAX_TOKENS"),
+        enable_thinking=getattr(settings, f"{stage}_ENABLE_THINKING"),
+        api_key=getattr(settings, f"{stage}_API_KEY") or None,
+        api_base=getattr(settings, f"{stage}_API_BASE") or None,
+    )
+
+
+def validate_stage_route(stage: str, route: StageRoute) -> None:
+    """Reject limits the stage's provider would refuse on every call.
+
+    With thinking enabled, Anthropic requires ``max_tokens`` to exceed
+    ``THINKING_BUDGET``; smaller values fail with a 400 that retries cannot
+    fix, so they are reported before any request is made.
+    """
+
+    provider = (route.provider or settings.PROVIDER or "openai").lower()
+    thinking = (
+        route.enable_thinking
+        if route.enable_thinking is not None
+        else settings.ENABLE_THINKING
+    )
+    if provider != "anthropic" or not thinking:
+        return
+
+    if route.max_tokens is not None:
+        max_tokens, source = route.max_tokens, f"{stage}_MAX_TOKENS"
+    else:
+        max_tokens, source = settings.MAX_TOKEN, "MAX_TOKEN"
+    required = settings.THINKING_BUDGET + THINKING_OUTPUT_RESERVE
+    if max_tokens < required:
+        raise ValueError(
+            f"{source}={max_tokens} is too small for the {stage.lower()} stage: "
+            f"with thinking enabled, Anthropic counts THINKING_BUDGET="
+            f"{settings.THINKING_BUDGET} against it. Set {source} to at least "
+            f"{required}, lower THINKING_BUDGET, or set "
+            f"{stage}_ENABLE_THINKING=false."
+        )
+
+
+def route_credentials(stage: str, route: StageRoute) -> dict[str, Any]:
+    """Provider keyword arguments for the API key and base of one stage.
+
+    A stage on the global provider inherits ``API_KEY`` and ``API_BASE``
+    unless it sets its own. A stage on another provider never does, since
+    they belong to a different API: a hosted provider then needs
+    ``<STAGE>_API_KEY`` and uses ``<STAGE>_API_BASE`` or its default endpoint.
+    An explicit ``api_base=None`` tells the provider to skip ``API_BASE``.
+    """
+
+    credentials: dict[str, Any] = {}
+    if route.api_key:
+        credentials["api_key"] = route.api_key
+    if route.api_base:
+        credentials["api_base"] = route.api_base
+    if not route.changes_provider:
+        return credentials
+
+    provider = (route.provider or "").lower()
+    if provider not in OLLAMA_PROVIDER_NAMES and not route.api_key:
+        raise ValueError(
+            f"{stage}_PROVIDER={route.provider} uses a different API than "
+            f"PROVIDER={settings.PROVIDER or 'openai'}; set {stage}_API_KEY "
+            f"(and {stage}_API_BASE if it has no default endpoint)."
+        )
+    credentials.setdefault("api_base", None)
+    return credentials
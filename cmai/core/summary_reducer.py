@@ -0,0 +1,145 @@
+"""Hierarchical map-reduce of file summaries into directory and repo summaries."""
+
+import asyncio
+from dataclasses import dataclass
+import posixpath
+from typing import Awaitable, Callable, Optional
+
+ReduceCall = Callable[[str], Awaitable[str]]
+
+
+@dataclass(frozen=True)
+class SummaryNode:
+    path: str
+    summary: str
+    file_count: int = 1
+
+
+@dataclass(frozen=True)
+class ReductionResult:
+    repo_summary: str
+    directory_summaries: list[SummaryNode]
+    calls: int
+    depth: int
+
+
+class HierarchicalSummaryReducer:
+    """Reduce file summaries to directory summaries, then to one repo summary.
+
+    Nodes are grouped by parent directory and each group is chunked to at most
+    ``fan_in`` children, so the number of levels grows logarithmically with the
+    number of files. Reduce calls within a level run concurrently. Once
+    ``max_calls`` is spent, groups are merged locally without a model call, so
+    every file still contributes to the result.
+    """
+
+    def __init__(
+        self,
+        call: ReduceCall,
+        fan_in: int,
+        concurrency: int,
+        max_calls: int,
+        language: str,
+    ) -> None:
+        self.call = call
+        self.fan_in = max(2, fan_in)
+        self.concurrency = max(1, concurrency)
+        self.max_calls = max(0, max_calls)
+        self.language = language
+        self.calls = 0
+
+    async def reduce(self, nodes: list[SummaryNode]) -> ReductionResult:
+        depth = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while len(nodes) > self.fan_in:
+            nodes = await self._reduce_level(nodes, semaphore)
+            depth += 1
+
+        repo_summary = ""
+        if nodes:
+            repo = await self._reduce_group("", nodes, semaphore)
+            repo_summary = repo.summary
+            depth += 1
+
+        return ReductionResult(
+            repo_summary=repo_summary,
+            directory_summaries=nodes,
+            calls=self.calls,
+            depth=depth,
+        )
+
+    async def _reduce_level(
+        self, nodes: list[SummaryNode], semaphore: asyncio.Semaphore
+    ) -> list[SummaryNode]:
+        groups: dict[str, list[SummaryNode]] = {}
+        for node in nodes:
+            groups.setdefault(self._parent(node.path), []).append(node)
+
+        pending: list[tuple[str, list[SummaryNode]]] = []
+        for directory, members in sorted(groups.items()):
+            for start in range(0, len(members), self.fan_in):
+                pending.append((directory, members[start : start + self.fan_in]))
+
+        return list(
+            await asyncio.gather(
+                *(
+                    self._reduce_group(directory, members, semaphore)
+                    for directory, members in pending
+                )
+            )
+        )
+
+    async def _reduce_group(
+        self,
+        directory: str,
+        members: list[SummaryNode],
+        semaphore: asyncio.Semaphore,
+    ) -> SummaryNode:
+        file_count = sum(member.file_count for member in members)
+        if len(members) == 1:
+            return SummaryNode(directory, members[0].summary, file_count)
+
+        summary: Optional[str] = None
+        if self._reserve_call():
+            async with semaphore:
+                try:
+                    prompt = self._build_prompt(directory, members)
+                    summary = (await self.call(prompt)).strip()
+                except Exception:
+                    summary = None
+        return SummaryNode(
+            directory, summary or self._merge_locally(members), file_count
+        )
+
+    def _reserve_call(self) -> bool:
+        if self.calls >= self.max_calls:
+            return False
+        self.calls += 1
+        return True
+
+    def _build_prompt(self, directory: str, members: list[SummaryNode]) -> str:
+        scope = f"directory {directory}/" if directory else "the repository"
+        lines = [
+            f"- {member.path or '.'} ({member.file_count} files): {member.summary}"
+            for member in members
+        ]
+        # Shared instructions first so reduce calls share a cacheable prefix.
+        return (
+            "Combine the staged change summaries below into one summary. "
+            "Use plain text format only.\n"
+            f"Output language: {self.language}\n"
+            "Output one or two sentences (<=40 words) naming the main changes. "
+            "No markdown, no code fences, no JSON.\n"
+            f"Summaries for {scope}:\n" + "\n".join(lines)
+        )
+
+    @staticmethod
+    def _merge_locally(members: list[SummaryNode]) -> str:
+        shown = "; ".join(member.summary for member in members[:3])
+        if len(members) > 3:
+            shown += f"; and {len(members) - 3} more"
+        return shown
+
+    @staticmethod
+    def _parent(path: str) -> str:
+        return posixpath.dirname(path.rstrip("/"))
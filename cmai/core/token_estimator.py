@@ -0,0 +1,220 @@
+"""Token estimation and context-window budgeting for prompt assembly."""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import re
+from typing import Callable, Optional
+
+from cmai.config.settings import Settings
+
+_TOKEN_PATTERN = re.compile(
+    r"[A-Za-z0-9_]+"
+    r"|[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]"
+    r"|[^\sA-Za-z0-9_]"
+    r"|\n"
+)
+
+# Prefix -> context window in tokens. The first matching prefix wins, so more
+# specific prefixes are listed first.
+MODEL_CONTEXT_WINDOWS: tuple[tuple[str, int], ...] = (
+    ("gpt-4.1", 1_047_576),
+    ("gpt-4o", 128_000),
+    ("gpt-4-turbo", 128_000),
+    ("gpt-4", 8_192),
+    ("gpt-5", 400_000),
+    ("gpt-3.5", 16_385),
+    ("o1", 200_000),
+    ("o3", 200_000),
+    ("o4", 200_000),
+    ("claude", 200_000),
+    ("qwen-turbo", 1_000_000),
+    ("qwen-long", 1_000_000),
+    ("qwen-plus", 131_072),
+    ("qwen-max", 32_768),
+    ("qwen3", 131_072),
+    ("qwen2.5", 32_768),
+    ("deepseek", 64_000),
+    ("glm-4", 128_000),
+    ("llama3", 8_192),
+)
+DEFAULT_CONTEXT_WINDOW = 32_768
+DEFAULT_OLLAMA_CONTEXT_WINDOW = 8_192
+MIN_DIFF_TOKEN_BUDGET = 1_024
+OPENAI_MODEL_PREFIXES = ("gpt-", "o1", "o3", "o4", "chatgpt-")
+
+
+class TokenEstimator(ABC):
+    """Counts tokens for a model family, memoizing results per text chunk."""
+
+    MAX_MEMO_ENTRIES = 4096
+
+    def __init__(self) -> None:
+        self._memo: "OrderedDict[bytes, int]" = OrderedDict()
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+
+        # Hunks repeat across budgeting passes; key by digest so the memo does
+        # not keep large patch strings alive.
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            return cached
+
+        tokens = self._count(text)
+        self._memo[key] = tokens
+        if len(self._memo) > self.MAX_MEMO_ENTRIES:
+            self._memo.popitem(last=False)
+        return tokens
+
+
+class ApproximateTokenEstimator(TokenEstimator):
+    """Fast local approximation tuned for source code and mixed CJK text.
+
+    Words cost roughly one token per four characters, each CJK character and
+    punctuation mark costs one token, and newlines are counted separately.
+    """
+
+    @property
+    def name(self) -> str:
+        return "approximate"
+
+    def _count(self, text: str) -> int:
+        tokens = 0
+        for match in _TOKEN_PATTERN.finditer(text):
+            piece = match.group(0)
+            if piece[0].isascii() and (piece[0].isalnum() or piece[0] == "_"):
+                tokens += (len(piece) + 3) // 4
+            else:
+                tokens += 1
+        return tokens
+
+
+class TiktokenEstimator(TokenEstimator):
+    """Exact counts for OpenAI models using the optional ``tiktoken`` package."""
+
+    def __init__(self, model: str) -> None:
+        super().__init__()
+        import tiktoken
+
+        try:
+            self._encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding("o200k_base")
+
+    @property
+    def name(self) -> str:
+        return f"tiktoken:{self._encoding.name}"
+
+    def _count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+EstimatorFactory = Callable[[str], TokenEstimator]
+
+_exact_estimators: dict[str, EstimatorFactory] = {
+    "openai": TiktokenEstimator,
+}
+_estimator_cache: dict[str, TokenEstimator] = {}
+
+
+def register_token_estimator(family: str, factory: EstimatorFactory) -> None:
+    """Register an exact tokenizer for a model family (see ``model_family``)."""
+
+    _exact_estimators[family] = factory
+    _estimator_cache.clear()
+
+
+def model_family(model: Optional[str]) -> str:
+    lower = (model or "").lower()
+    if lower.startswith(OPENAI_MODEL_PREFIXES):
+        return "openai"
+    if lower.startswith("claude"):
+        return "anthropic"
+    if lower.startswith("qwen"):
+        return "qwen"
+    if lower.startswith("glm"):
+        return "glm"
+    if lower.startswith("deepseek"):
+        return "deepseek"
+    return "generic"
+
+
+def get_token_estimator(
+    model: Optional[str], mode: str = "auto"
+) -> TokenEstimator:
+    """Return a shared estimator; exact tokenizers are used when available."""
+
+    cache_key = f"{mode}:{model or ''}"
+    estimator = _estimator_cache.get(cache_key)
+    if estimator is not None:
+        return estimator
+
+    estimator = ApproximateTokenEstimator()
+    factory = _exact_estimators.get(model_family(model))
+    if mode != "approximate" and factory is not None and model:
+        try:
+            estimator = factory(model)
+        except Exception:
+            # Exact tokenizers are optional dependencies.
+            estimator = ApproximateTokenEstimator()
+
+    _estimator_cache[cache_key] = estimator
+    return estimator
+
+
+def resolve_context_window(
+    config: Settings,
+    model: Optional[str] = None,
+    provider: Optional[str] = None,
+) -> int:
+    """Context window of ``model`` on ``provider``, defaulting to the globals."""
+
+    if config.MODEL_CONTEXT_WINDOW and config.MODEL_CONTEXT_WINDOW > 0:
+        return config.MODEL_CONTEXT_WINDOW
+
+    model = (model or config.MODEL or "").lower()
+    for prefix, window in MODEL_CONTEXT_WINDOWS:
+        if model.startswith(prefix):
+            return window
+
+    if (provider or config.PROVIDER or "").lower() in {"ollama", "local"}:
+        return DEFAULT_OLLAMA_CONTEXT_WINDOW
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def resolve_diff_token_budget(
+    config: Settings,
+    model: Optional[str] = None,
+    provider: Optional[str] = None,
+    max_output_tokens: Optional[int] = None,
+) -> int:
+    """Tokens available for staged-change context in the final prompt.
+
+    ``MAX_DIFF_TOKENS`` wins when set; otherwise a share of the model's
+    context window is used after reserving room for the response. Pass the
+    model, provider and output limit the final message is routed to when
+    they differ from the global settings.
+    """
+
+    if config.MAX_DIFF_TOKENS and config.MAX_DIFF_TOKENS > 0:
+        return config.MAX_DIFF_TOKENS
+
+    window = resolve_context_window(config, model, provider)
+    ratio = max(0.05, min(0.9, config.DIFF_CONTEXT_RATIO))
+    if max_output_tokens is None:
+        max_output_tokens = config.MAX_TOKEN
+    output_reserve = min(max(0, max_output_tokens), window // 4)
+    return max(MIN_DIFF_TOKEN_BUDGET, int(window * ratio) - output_reserve)
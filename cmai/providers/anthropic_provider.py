@@ -1,15 +1,23 @@
-from typing import Optional
+from contextlib import aclosing
+from typing import Any, Optional, Sequence
 import os
 
-from anthropic import Anthropic
 
 from cmai.config.settings import settings
 from cmai.providers.base import BaseAIClient, AIResponse
+from cmai.providers.http_transport import (
+    ANTHROPIC_VERSION,
+    DEFAULT_TIMEOUT,
+    stream_anthropic_messages,
+)
+from cmai.providers.reasoning_parser import ReasoningStreamParser, StreamDelta
 from cmai.core.logger_factory import LoggerFactory
 
 
 class AnthropicProvider(BaseAIClient):
-    """Anthropic Claude 客户端实现"""
+    """Anthropic Claude 客户端实现，直接通过异步 httpx 调用 messages 流式接口"""
+
+    supports_shared_http_client = True
 
     def __init__(
         self,
@@ -36,7 +44,7 @@ class AnthropicProvider(BaseAIClient):
             raise ValueError("API key is required for AnthropicProvider.")
 
         # 获取 API Base
-        base_url = settings.API_BASE if settings.API_BASE else None
+        base_url = self.resolve_api_base() or "https://api.anthropic.com"
 
         # 获取 model
         if not model:
@@ -44,11 +52,14 @@ class AnthropicProvider(BaseAIClient):
 
         self.model = model
 
-        # 创建 Anthropic 客户端，如果有自定义 base_url 则使用
-        if base_url:
-            self.client = Anthropic(api_key=self.api_key, base_url=base_url, **kwargs)
-        else:
-            self.client = Anthropic(api_key=self.api_key, **kwargs)
+        self.url = base_url.rstrip("/") + "/v1/messages"
+        self.headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": ANTHROPIC_VERSION,
+        }
+        self.timeout = kwargs.get("timeout", DEFAULT_TIMEOUT)
+
+        self._init_http_client(**kwargs)
 
         self.provider = "anthropic" if not settings.PROVIDER else settings.PROVIDER
 
@@ -58,6 +69,7 @@ class AnthropicProvider(BaseAIClient):
     async def normalize_commit(self, prompt: str, **kargs) -> AIResponse:
         silent = bool(kargs.pop("silent", False))
         diff_content = kargs.pop("diff_content", None)
+        cache_breakpoints = kargs.pop("cache_breakpoints", None) or ()
         if diff_content:
             log_prompt = prompt.replace(
                 diff_content, f"[Diff content hidden, length: {len(diff_content)}]"
@@ -69,51 +81,74 @@ class AnthropicProvider(BaseAIClient):
         # 构建请求参数
         create_params = {
             "model": self.model or "claude-haiku-4-5-20251001",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": settings.MAX_TOKEN,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._build_content_blocks(prompt, cache_breakpoints),
+                }
+            ],
+            "max_tokens": self.resolve_max_tokens(),
             "stream": True,
         }
 
         # 只在启用 thinking 时才添加该参数
-        if settings.ENABLE_THINKING:
+        if self.resolve_thinking():
             create_params["thinking"] = {
                 "type": "enabled",
                 "budget_tokens": settings.THINKING_BUDGET,
             }
 
-        stream = self.client.messages.create(**create_params)
-
-        response = ""
-        is_answering = False
+        parser = ReasoningStreamParser()
         input_tokens = 0
         output_tokens = 0
+        cached_tokens = None
 
         # 处理流式响应
-        with stream as completion:
-            for event in completion:
+        events = stream_anthropic_messages(
+            self.client,
+            self.url,
+            headers=self.headers,
+            payload=create_params,
+            timeout=self.timeout,
+        )
+        async with aclosing(events):
+            async for event in events:
+                event_type = event.get("type")
                 # 处理消息开始事件
-                if event.type == "message_start":
-                    if hasattr(event, "message") and hasattr(event.message, "usage"):
-                        input_tokens = event.message.usage.input_tokens
-                        self.logger.debug(f"Input tokens: {input_tokens}")
-
-                # 处理内容块增量
-                elif event.type == "content_block_delta":
-                    if hasattr(event, "delta") and hasattr(event.delta, "text"):
-                        if not is_answering:
-                            self.logger.debug("Starting to answer...")
-                            is_answering = True
-                        text = event.delta.text
-                        if not silent:
-                            self.stream_logger.info(text)
-                        response += text
+                if event_type == "message_start":
+                    usage = (event.get("message") or {}).get("usage")
+                    if usage:
+                        # 命中缓存和写入缓存的 token 不计入 input_tokens
+                        cached_tokens = usage.get("cache_read_input_tokens")
+                        input_tokens = (
+                            (usage.get("input_tokens") or 0)
+                            + (cached_tokens or 0)
+                            + (usage.get("cache_creation_input_tokens") or 0)
+                        )
+                        self.logger.debug(
+                            f"Input tokens: {input_tokens} ({cached_tokens} cached)"
+                        )
+
+                # 处理内容块增量，thinking_delta 只记录不输出
+                elif event_type == "content_block_delta":
+                    delta = event.get("delta") or {}
+                    if delta.get("type") == "thinking_delta":
+                        parser.feed_reasoning(delta.get("thinking") or "")
+                    elif delta.get("type") == "text_delta":
+                        self._echo_answer(parser.feed(delta.get("text") or ""), silent)
 
                 # 处理消息结束事件
-                elif event.type == "message_delta":
-                    if hasattr(event, "usage"):
-                        output_tokens = event.usage.output_tokens
+                elif event_type == "message_delta":
+                    usage = event.get("usage")
+                    if usage:
+                        output_tokens = usage.get("output_tokens") or 0
                         self.logger.debug(f"Output tokens: {output_tokens}")
 
+        self._echo_answer(parser.finish(), silent)
+        response = parser.answer_text
+        if parser.reasoning:
+            self.logger.debug(f"Reasoning process: {parser.reasoning_text.strip()}")
+
         total_tokens = input_tokens + output_tokens
         if total_tokens == 0:
             self.logger.warning("No usage information received")
@@ -133,4 +168,33 @@ class AnthropicProvider(BaseAIClient):
             model=self.model or "claude-haiku-4-5-20251001",
             provider=self.provider,
             tokens_used=total_tokens if total_tokens > 0 else None,
+            cached_tokens=cached_tokens,
         )
+
+    def _echo_answer(self, delta: StreamDelta, silent: bool) -> None:
+        """只输出答案部分，与未解析思考内容时的终端输出保持一致"""
+        if delta.opens_answer:
+            self.logger.debug("Starting to answer...")
+        if delta.answer and not silent:
+            self.stream_logger.info(delta.answer)
+
+    @staticmethod
+    def _build_content_blocks(
+        prompt: str, cache_breakpoints: Sequence[int]
+    ) -> list[dict[str, Any]]:
+        """按缓存断点切分提示词，每个断点前的文本块带 cache_control 标记"""
+        blocks: list[dict[str, Any]] = []
+        start = 0
+        # Anthropic 每个请求最多支持 4 个缓存断点
+        for end in sorted(set(cache_breakpoints))[:4]:
+            if start < end < len(prompt):
+                blocks.append(
+                    {
+                        "type": "text",
+                        "text": prompt[start:end],
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                )
+                start = end
+        blocks.append({"type": "text", "text": prompt[start:]})
+        return blocks
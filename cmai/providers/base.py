@@ -1,8 +1,53 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Optional, Sequence
 
+import httpx
 from pydantic import BaseModel
 
+from cmai.config.settings import settings
+from cmai.providers.reasoning_parser import StreamDelta
+
+
+class ProviderTimings(BaseModel):
+    """服务端报告的单次请求耗时（秒）和 token 数"""
+
+    load_seconds: Optional[float] = None
+    prompt_eval_seconds: Optional[float] = None
+    eval_seconds: Optional[float] = None
+    total_seconds: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    eval_tokens: Optional[int] = None
+
+    @classmethod
+    def total(cls, items: Sequence["ProviderTimings"]) -> "ProviderTimings":
+        """多次请求耗时之和，只累加报告了该项的请求"""
+
+        def add(field: str) -> Any:
+            values = [getattr(item, field) for item in items]
+            present = [value for value in values if value is not None]
+            return sum(present) if present else None
+
+        return cls(**{field: add(field) for field in cls.model_fields})
+
+    def describe(self) -> str:
+        parts = []
+        if self.load_seconds is not None:
+            parts.append(f"load {self.load_seconds:.2f}s")
+        if self.prompt_eval_seconds is not None:
+            parts.append(
+                f"prompt eval {self.prompt_eval_seconds:.2f}s "
+                f"({self.prompt_tokens or 0} tokens)"
+            )
+        if self.eval_seconds is not None:
+            rate = ""
+            if self.eval_seconds > 0 and self.eval_tokens:
+                rate = f", {self.eval_tokens / self.eval_seconds:.1f} tokens/s"
+            tokens = self.eval_tokens or 0
+            parts.append(f"eval {self.eval_seconds:.2f}s ({tokens} tokens{rate})")
+        if self.total_seconds is not None:
+            parts.append(f"total {self.total_seconds:.2f}s")
+        return ", ".join(parts) or "no timings reported"
+
 
 class AIResponse(BaseModel):
     """
@@ -13,14 +58,47 @@ class AIResponse(BaseModel):
     model: str
     provider: str
     tokens_used: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    timings: Optional[ProviderTimings] = None
     suggest_split: Optional[bool] = None
     split_reason: Optional[str] = None
     split_groups: Optional[list[str]] = None
 
 
+def cached_tokens_from_usage(usage: Any) -> Optional[int]:
+    """读取 OpenAI 兼容 usage 中的 prompt_tokens_details.cached_tokens"""
+    if isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+    else:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+    return cached if isinstance(cached, int) else None
+
+
 class BaseAIClient(ABC):
     """AI客户端抽象基类"""
 
+    # 内置 Provider 均使用异步客户端；基于同步 SDK 的自定义实现会在
+    # normalize_commit 中阻塞事件循环，需设为 True 以便调用方放到工作线程中执行
+    uses_blocking_client: bool = False
+
+    # 为 True 时 ProviderFactory 在池化模式下通过 http_client 参数传入共享的
+    # httpx.AsyncClient，实例不负责关闭该客户端
+    supports_shared_http_client: bool = False
+
+    # 由 _init_http_client 设置；只有实例自行创建的客户端才由 aclose 关闭
+    client: Any = None
+    _owns_client: bool = False
+
+    # 由子类在 __init__ 中创建
+    logger: Any
+    stream_logger: Any
+
+    # 按流水线阶段覆盖的生成参数，为 None 时沿用全局 settings
+    max_tokens: Optional[int] = None
+    enable_thinking: Optional[bool] = None
+
     def __init__(
         self, api_key: Optional[str] = None, model: Optional[str] = None, **kwargs
     ) -> None:
@@ -38,6 +116,56 @@ class BaseAIClient(ABC):
         self.model = model
         self.kwargs = kwargs
 
+    def resolve_api_base(self) -> Optional[str]:
+        """api_base 参数指定的地址，未传入时使用 API_BASE
+
+        按阶段路由到其他 Provider 时会显式传入 None，此时使用 Provider 的默认地址。
+        """
+        if "api_base" in self.kwargs:
+            return self.kwargs["api_base"]
+        return settings.API_BASE
+
+    def resolve_max_tokens(self) -> int:
+        """本实例的最大输出 token 数，未覆盖时使用 MAX_TOKEN"""
+        if self.max_tokens is not None:
+            return self.max_tokens
+        return settings.MAX_TOKEN
+
+    def resolve_thinking(self) -> bool:
+        """本实例是否启用 thinking，未覆盖时使用 ENABLE_THINKING"""
+        if self.enable_thinking is not None:
+            return self.enable_thinking
+        return settings.ENABLE_THINKING
+
+    def _echo_delta(self, delta: StreamDelta, silent: bool) -> None:
+        """将一次解析出的增量输出到终端，需要子类提供 logger 和 stream_logger"""
+        if delta.opens_reasoning and not silent:
+            self.logger.info("Detected reasoning content...\nPlease wait...")
+            # The status message is logged to stderr while streamed tokens are
+            # written to stdout. Emit an explicit separator on the stream so
+            # the first reasoning token cannot be appended to the status line.
+            self.stream_logger.info("\n")
+        if delta.reasoning and not silent:
+            self.stream_logger.info(delta.reasoning)
+        if delta.opens_answer:
+            if not silent:
+                self.stream_logger.info("\n\n")
+            self.logger.debug("Starting to answer...")
+        if delta.answer and not silent:
+            self.stream_logger.info(delta.answer)
+
+    def _init_http_client(self, **kwargs) -> httpx.AsyncClient:
+        """使用传入的共享 http_client，或创建实例自有的 httpx.AsyncClient"""
+        http_client = kwargs.get("http_client")
+        self._owns_client = http_client is None
+        self.client = http_client or httpx.AsyncClient()
+        return self.client
+
+    async def aclose(self) -> None:
+        """关闭实例自行创建的客户端，共享的客户端由 ProviderPool 统一关闭"""
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+
     @abstractmethod
     async def normalize_commit(self, prompt: str, **kargs) -> AIResponse:
         """
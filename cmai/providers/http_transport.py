@@ -0,0 +1,198 @@
+"""基于 httpx 的轻量协议客户端
+
+实现 OpenAI 兼容 chat completions 与 Anthropic messages 的 SSE 流式响应，以及
+Ollama /api/chat 的 NDJSON 流式响应，内置 Provider 无需导入任何厂商 SDK。
+"""
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import json
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+DEFAULT_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+ANTHROPIC_VERSION = "2023-06-01"
+
+# Anthropic 流中 error 事件的类型对应的 HTTP 状态码，供重试策略分类
+ANTHROPIC_ERROR_STATUS = {
+    "invalid_request_error": 400,
+    "authentication_error": 401,
+    "permission_error": 403,
+    "not_found_error": 404,
+    "request_too_large": 413,
+    "rate_limit_error": 429,
+    "api_error": 500,
+    "overloaded_error": 529,
+}
+
+
+class ProviderStreamError(Exception):
+    """服务端在流式响应中途返回的错误"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class ServerSentEvent:
+    event: str
+    data: str
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+
+class SSEDecoder:
+    """增量 SSE 解析器，逐行输入，遇到空行时产出一个完整事件"""
+
+    def __init__(self) -> None:
+        self._event = ""
+        self._data: list[str] = []
+
+    def feed(self, line: str) -> Optional[ServerSentEvent]:
+        if not line:
+            if not self._data:
+                self._event = ""
+                return None
+            event = ServerSentEvent(self._event or "message", "\n".join(self._data))
+            self._event = ""
+            self._data = []
+            return event
+        if line.startswith(":"):
+            return None
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        return None
+
+    def flush(self) -> Optional[ServerSentEvent]:
+        """流结束时产出缺少结尾空行的最后一个事件"""
+        return self.feed("")
+
+
+async def iter_sse(response: httpx.Response) -> AsyncIterator[ServerSentEvent]:
+    decoder = SSEDecoder()
+    async for line in response.aiter_lines():
+        event = decoder.feed(line)
+        if event is not None:
+            yield event
+    event = decoder.flush()
+    if event is not None:
+        yield event
+
+
+async def iter_ndjson(response: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    async for line in response.aiter_lines():
+        if line.strip():
+            yield json.loads(line)
+
+
+async def raise_for_status(response: httpx.Response) -> None:
+    """错误响应抛出带响应体的 HTTPStatusError，状态码和响应头供重试策略判断"""
+    if not response.is_error:
+        return
+    await response.aread()
+    detail = response.text.strip()[:500]
+    raise httpx.HTTPStatusError(
+        f"Error code: {response.status_code} - {detail}",
+        request=response.request,
+        response=response,
+    )
+
+
+@asynccontextmanager
+async def open_stream(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    headers: dict[str, str],
+    payload: dict[str, Any],
+    timeout: Any = DEFAULT_TIMEOUT,
+) -> AsyncIterator[httpx.Response]:
+    async with client.stream(
+        "POST", url, headers=headers, json=payload, timeout=timeout
+    ) as response:
+        await raise_for_status(response)
+        yield response
+
+
+async def stream_chat_completions(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    headers: dict[str, str],
+    payload: dict[str, Any],
+    timeout: Any = DEFAULT_TIMEOUT,
+) -> AsyncIterator[dict[str, Any]]:
+    """OpenAI 兼容 chat/completions 流，逐个产出 JSON 分块"""
+    async with open_stream(
+        client, url, headers=headers, payload=payload, timeout=timeout
+    ) as response:
+        async for event in iter_sse(response):
+            if event.data == "[DONE]":
+                return
+            chunk = event.json()
+            if isinstance(chunk, dict) and chunk.get("error"):
+                error = chunk["error"]
+                if not isinstance(error, dict):
+                    error = {"message": error}
+                code = error.get("code")
+                raise ProviderStreamError(
+                    str(error.get("message") or error),
+                    status_code=code if isinstance(code, int) else None,
+                )
+            yield chunk
+
+
+async def stream_anthropic_messages(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    headers: dict[str, str],
+    payload: dict[str, Any],
+    timeout: Any = DEFAULT_TIMEOUT,
+) -> AsyncIterator[dict[str, Any]]:
+    """Anthropic messages 流，逐个产出事件数据，事件类型在 type 字段中"""
+    async with open_stream(
+        client, url, headers=headers, payload=payload, timeout=timeout
+    ) as response:
+        async for event in iter_sse(response):
+            if event.event == "ping":
+                continue
+            data = event.json()
+            if event.event == "error" or data.get("type") == "error":
+                error = data.get("error") or {}
+                raise ProviderStreamError(
+                    f"{error.get('type', 'error')}: {error.get('message', '')}",
+                    status_code=ANTHROPIC_ERROR_STATUS.get(error.get("type")),
+                )
+            yield data
+            if data.get("type") == "message_stop":
+                return
+
+
+async def stream_ollama_chat(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    headers: dict[str, str],
+    payload: dict[str, Any],
+    timeout: Any = DEFAULT_TIMEOUT,
+) -> AsyncIterator[dict[str, Any]]:
+    """Ollama /api/chat 的 NDJSON 流，最后一个分块带 done 和耗时统计"""
+    async with open_stream(
+        client, url, headers=headers, payload=payload, timeout=timeout
+    ) as response:
+        async for chunk in iter_ndjson(response):
+            if chunk.get("error"):
+                raise ProviderStreamError(str(chunk["error"]))
+            yield chunk
+            if chunk.get("done"):
+                return
@@ -1,12 +1,71 @@
-from typing import Optional
-from ollama import AsyncClient
+from contextlib import aclosing
+from typing import Any, Optional
+
+import httpx
 
 from cmai.config.settings import settings
 from cmai.core.logger_factory import LoggerFactory
-from cmai.providers.base import BaseAIClient, AIResponse
+from cmai.core.token_estimator import get_token_estimator
+from cmai.providers.base import BaseAIClient, AIResponse, ProviderTimings
+from cmai.providers.http_transport import stream_ollama_chat
+from cmai.providers.reasoning_parser import ReasoningStreamParser
+
+# 本地模型加载和推理可能很慢，只限制连接超时
+OLLAMA_TIMEOUT = httpx.Timeout(None, connect=10.0)
+# 未按阶段限制输出长度时，为回答预留的上下文 token 数
+OLLAMA_OUTPUT_RESERVE = 2048
+OLLAMA_PROVIDER_NAMES = frozenset({"ollama", "local"})
+
+
+def normalize_ollama_host(host: str) -> str:
+    """补全协议和默认端口，与 OLLAMA_HOST 的常见写法保持一致"""
+    host = host.strip().rstrip("/")
+    if "://" not in host:
+        host = f"http://{host}"
+    scheme, _, rest = host.partition("://")
+    authority, slash, path = rest.partition("/")
+    if not authority.rsplit("]", 1)[-1].count(":"):
+        authority = f"{authority}:11434"
+    return f"{scheme}://{authority}{slash}{path}"
+
+
+def default_ollama_host() -> Optional[str]:
+    """
+    OLLAMA_HOST，或全局 PROVIDER 为 Ollama 时的 API_BASE
+
+    全局 PROVIDER 为托管服务时 API_BASE 是该服务的地址，按阶段路由到 Ollama 的
+    请求不能发到那里。
+    """
+    if settings.OLLAMA_HOST:
+        return settings.OLLAMA_HOST
+    if (settings.PROVIDER or "").lower() in OLLAMA_PROVIDER_NAMES:
+        return settings.API_BASE
+    return None
+
+
+def ollama_timings(chunk: dict[str, Any]) -> ProviderTimings:
+    """把 Ollama 响应中以纳秒计的耗时转换为秒"""
+
+    def seconds(key: str) -> Optional[float]:
+        value = chunk.get(key)
+        return value / 1e9 if isinstance(value, (int, float)) else None
+
+    return ProviderTimings(
+        load_seconds=seconds("load_duration"),
+        prompt_eval_seconds=seconds("prompt_eval_duration"),
+        eval_seconds=seconds("eval_duration"),
+        total_seconds=seconds("total_duration"),
+        prompt_tokens=chunk.get("prompt_eval_count"),
+        eval_tokens=chunk.get("eval_count"),
+    )
 
 
 class OllamaProvider(BaseAIClient):
+    supports_shared_http_client = True
+
+    # 整个运行共用的 num_ctx，由调用方按最终提示词大小设置，避免各阶段切换时重新加载模型
+    num_ctx: Optional[int] = None
+
     def __init__(
         self, api_key: Optional[str] = None, model: Optional[str] = None, **kwargs
     ) -> None:
@@ -14,15 +73,19 @@ class OllamaProvider(BaseAIClient):
 
         host = (
             kwargs.pop("host", None)
-            or settings.OLLAMA_HOST
-            or settings.API_BASE
+            or kwargs.get("api_base")
+            or default_ollama_host()
             or "http://localhost:11434"
         )
 
         if not self.model:
             self.model = "qwen3:8b"
 
-        self.client = AsyncClient(host=host)
+        self.host = normalize_ollama_host(host)
+        self.url = f"{self.host}/api/chat"
+        self.timeout = kwargs.get("timeout", OLLAMA_TIMEOUT)
+
+        self._init_http_client(**kwargs)
 
         self.logger = LoggerFactory().get_logger("OllamaProvider")
         self.stream_logger = LoggerFactory().get_stream_logger("OllamaProviderStream")
@@ -32,63 +95,63 @@ class OllamaProvider(BaseAIClient):
         # Ollama 通常不需要 API key，只需要确保能连接到 host
         return True
 
-    def _extract_reasoning_content(
-        self, content: str, accumulated_content: str
-    ) -> tuple[str, str, bool, bool]:
+    def warm_up(self) -> ProviderTimings:
+        """
+        预加载模型并按 OLLAMA_KEEP_ALIVE 保持常驻
+
+        这是阻塞调用，由调用方放到工作线程中，与 git 分析同时进行。
+        """
+        payload: dict[str, Any] = {"model": self.model}
+        if settings.OLLAMA_KEEP_ALIVE:
+            payload["keep_alive"] = settings.OLLAMA_KEEP_ALIVE
+        if settings.OLLAMA_MIN_NUM_CTX > 0:
+            # 与首个真实请求使用相同的 num_ctx，避免其因上下文大小不同而重新加载
+            payload["options"] = {
+                "num_ctx": self.num_ctx or settings.OLLAMA_MIN_NUM_CTX
+            }
+        response = httpx.post(
+            f"{self.host}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT
+        )
+        response.raise_for_status()
+        timings = ollama_timings(response.json())
+        self.logger.info(
+            f"Preloaded Ollama model {self.model}: {timings.describe()}"
+        )
+        return timings
+
+    def context_size(self, needed_tokens: int) -> Optional[int]:
+        """
+        容纳 needed_tokens 的 num_ctx
+
+        取 OLLAMA_MIN_NUM_CTX 的 2 的幂倍数，使大小相近的请求共用同一个已加载的
+        模型实例，上限为 OLLAMA_MAX_NUM_CTX。OLLAMA_MIN_NUM_CTX 为 0 时使用服务端默认值。
         """
-        从内容中提取思考部分和答案部分
+        floor = settings.OLLAMA_MIN_NUM_CTX
+        if floor <= 0:
+            return None
+        ceiling = max(floor, settings.OLLAMA_MAX_NUM_CTX)
+        num_ctx = floor
+        while num_ctx < needed_tokens and num_ctx < ceiling:
+            num_ctx *= 2
+        return min(num_ctx, ceiling)
+
+    def resolve_num_ctx(self, prompt: str) -> Optional[int]:
+        """
+        按提示词的实测 token 数加输出预留选择 num_ctx
 
-        Returns:
-            tuple: (reasoning_content, answer_content, is_reasoning, is_answering)
+        设置了 num_ctx 时沿用它，只有放不下的请求才使用更大的值。
         """
-        full_content = accumulated_content + content
-
-        # 方法1: 检查是否有 <thinking> 标签
-        if "<think>" in full_content and "</think>" in full_content:
-            import re
-
-            thinking_pattern = r"<think>(.*?)</think>"
-            matches = re.findall(thinking_pattern, full_content, re.DOTALL)
-            if matches:
-                reasoning = "".join(matches)
-                answer = re.sub(
-                    thinking_pattern, "", full_content, flags=re.DOTALL
-                ).strip()
-                return reasoning, answer, True, bool(answer)
-
-        elif "<think>" in full_content:
-            # 只有开始标记，可能还在思考阶段
-            reasoning = full_content.split("<think>", 1)[-1].strip()
-            return reasoning, "", True, False
-
-        # 检查是否有其他思考标记
-        thinking_markers = [
-            ("**思考过程:**", "**答案:**"),
-            ("**Thinking:**", "**Answer:**"),
-            ("## 思考", "## 答案"),
-            ("## Thinking", "## Answer"),
-            ("[思考]", "[答案]"),
-            ("[Thinking]", "[Answer]"),
-        ]
-
-        for start_marker, end_marker in thinking_markers:
-            if start_marker in full_content:
-                if end_marker in full_content:
-                    parts = full_content.split(end_marker, 1)
-                    if len(parts) == 2:
-                        reasoning_part = parts[0].split(start_marker, 1)[-1].strip()
-                        answer_part = parts[1].strip()
-                        return reasoning_part, answer_part, True, True
-                else:
-                    # 只有开始标记，可能还在思考阶段
-                    reasoning_part = full_content.split(start_marker, 1)[-1].strip()
-                    return reasoning_part, "", True, False
-
-        return "", content, False, True
+        estimator = get_token_estimator(self.model, settings.TOKEN_ESTIMATOR)
+        needed = estimator.count(prompt) + (self.max_tokens or OLLAMA_OUTPUT_RESERVE)
+        num_ctx = self.context_size(needed)
+        if num_ctx is None or self.num_ctx is None:
+            return num_ctx
+        return max(num_ctx, self.num_ctx)
 
     async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
         silent = bool(kwargs.pop("silent", False))
         diff_content = kwargs.pop("diff_content", None)
+        kwargs.pop("cache_breakpoints", None)
         if diff_content:
             log_prompt = prompt.replace(
                 diff_content, f"[Diff content hidden, length: {len(diff_content)}]"
@@ -97,130 +160,74 @@ class OllamaProvider(BaseAIClient):
             log_prompt = prompt
         self.logger.debug(f"Normalizing commit with prompt: {log_prompt}")
 
-        reason = ""
-        response = ""
-        accumulated_content = ""
-        is_answering = False
-        is_reasoning = False
+        parser = ReasoningStreamParser()
         total_tokens = 0
+        timings = None
+
+        # 按阶段配置的输出上限和 thinking 开关，以及按提示词大小选择的上下文窗口
+        options = dict(kwargs.pop("options", None) or {})
+        if self.max_tokens is not None:
+            options.setdefault("num_predict", self.max_tokens)
+        num_ctx = self.resolve_num_ctx(prompt)
+        if num_ctx is not None:
+            options.setdefault("num_ctx", num_ctx)
+        if options:
+            kwargs["options"] = options
+        if self.enable_thinking is not None:
+            kwargs.setdefault("think", self.enable_thinking)
+        # 在 summary 并发调用和最终调用之间保持模型常驻
+        if settings.OLLAMA_KEEP_ALIVE:
+            kwargs.setdefault("keep_alive", settings.OLLAMA_KEEP_ALIVE)
 
         try:
             # 发起流式聊天请求
-            stream = await self.client.chat(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                stream=True,
-                **kwargs,
+            stream = stream_ollama_chat(
+                self.client,
+                self.url,
+                headers={},
+                payload={
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "stream": True,
+                    **kwargs,
+                },
+                timeout=self.timeout,
             )
 
-            async for chunk in stream:
-                if "message" in chunk:
-                    content = chunk["message"].get("content", "")
-
-                    if content:
-                        accumulated_content += content
-
-                        # self.logger.debug(f"Received chunk: {content}")
-
-                        # 提取思考内容和答案内容
-                        (
-                            reasoning_content,
-                            answer_content,
-                            chunk_is_reasoning,
-                            chunk_is_answering,
-                        ) = self._extract_reasoning_content(
-                            content, accumulated_content
-                        )
-
-                        # self.logger.debug(
-                        #     f"Extracted reasoning: {reasoning_content}, "
-                        #     f"answer: {answer_content}, "
-                        #     f"is_reasoning: {chunk_is_reasoning}, "
-                        #     f"is_answering: {chunk_is_answering}"
-                        # )
-
-                        # 处理思考内容
-                        if reasoning_content and chunk_is_reasoning:
-                            if not is_reasoning:
-                                if not silent:
-                                    self.logger.info(
-                                        "Detected reasoning content...\nPlease wait..."
-                                    )
-                                    # The prompt and streamed content use
-                                    # different output streams; add an explicit
-                                    # boundary before the first token.
-                                    self.stream_logger.info("\n")
-                                is_reasoning = True
-                            # 只输出新的思考内容（避免重复）
-                            if not silent:
-                                self.stream_logger.info(content)
-                            reason = reasoning_content
-
-                        # 处理答案内容
-                        if answer_content and chunk_is_answering:
-                            if not is_answering:
-                                if not silent:
-                                    self.stream_logger.info("\n\n")
-                                self.logger.debug("Starting to answer...")
-                                is_answering = True
-                            if not silent:
-                                self.stream_logger.info(content)
-                            response = answer_content
-
-                        # 如果没有检测到特殊格式，按普通内容处理
-                        if not chunk_is_reasoning and not chunk_is_answering:
-                            if not is_answering:
-                                if not silent:
-                                    self.stream_logger.info("\n\n")
-                                self.logger.debug("Starting to answer...")
-                                is_answering = True
-                                continue
-                            if not silent:
-                                self.stream_logger.info(content)
-                            response += content
-
-                # 处理完成信息和统计
-                if chunk.get("done", False):
-                    # 获取使用情况统计
-                    if "total_duration" in chunk:
-                        self.logger.debug(
-                            f"Total duration: {chunk['total_duration']} ns"
+            async with aclosing(stream):
+                async for chunk in stream:
+                    message = chunk.get("message") or {}
+                    # 启用 think 时思考内容在独立的 thinking 字段中返回，
+                    # 否则可能以 <think> 标签或思考/答案标记混在正文中
+                    if message.get("thinking"):
+                        self._echo_delta(
+                            parser.feed_reasoning(message["thinking"]), silent
                         )
-
-                    if "prompt_eval_count" in chunk and "eval_count" in chunk:
-                        total_tokens = chunk.get("prompt_eval_count", 0) + chunk.get(
-                            "eval_count", 0
+                    if message.get("content"):
+                        self._echo_delta(parser.feed(message["content"]), silent)
+
+                    # 完成分块带有 token 数和加载、prompt eval、eval 耗时
+                    if chunk.get("done", False):
+                        timings = ollama_timings(chunk)
+                        total_tokens = (timings.prompt_tokens or 0) + (
+                            timings.eval_tokens or 0
                         )
-                        self.logger.debug(f"Received usage info: {total_tokens} tokens")
-
-                    # 记录其他有用的统计信息
-                    if "load_duration" in chunk:
-                        self.logger.debug(f"Load duration: {chunk['load_duration']} ns")
-                    if "prompt_eval_duration" in chunk:
                         self.logger.debug(
-                            f"Prompt eval duration: {chunk['prompt_eval_duration']} ns"
+                            f"Ollama timings (num_ctx {num_ctx}): "
+                            f"{timings.describe()}"
                         )
-                    if "eval_duration" in chunk:
-                        self.logger.debug(f"Eval duration: {chunk['eval_duration']} ns")
 
         except Exception as e:
             self.logger.error(f"Error during Ollama chat: {str(e)}")
             raise
 
+        self._echo_delta(parser.finish(), silent)
+
         if total_tokens == 0:
             self.logger.warning("No token usage information received")
 
-        # 最终处理：如果有累积内容但没有正确分离，再次尝试提取
-        if accumulated_content and not response:
-            _, final_answer, _, _ = self._extract_reasoning_content(
-                "", accumulated_content
-            )
-            if final_answer:
-                response = final_answer
-            else:
-                response = accumulated_content
-
-        final_response = response.strip()
+        # 思考块未闭合时没有答案，退回到思考内容
+        final_response = (parser.answer_text or parser.reasoning_text).strip()
         if not silent:
             self.stream_logger.info("\n\n")
             self.logger.info(f"Final normalized commit message: {final_response}")
@@ -230,12 +237,13 @@ class OllamaProvider(BaseAIClient):
             )
 
         # 如果有思考内容，也记录下来
-        if reason.strip():
-            self.logger.debug(f"Reasoning process: {reason.strip()}")
+        if parser.reasoning:
+            self.logger.debug(f"Reasoning process: {parser.reasoning_text.strip()}")
 
         return AIResponse(
             content=final_response,
             model=self.model,
             provider="ollama",
             tokens_used=total_tokens,
+            timings=timings,
         )
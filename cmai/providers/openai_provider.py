@@ -1,15 +1,24 @@
-from typing import Optional
+from contextlib import aclosing
+from typing import Any, Optional
 import os
 
-from openai import OpenAI
 
 from cmai.config.settings import settings
-from cmai.providers.base import BaseAIClient, AIResponse
+from cmai.providers.base import BaseAIClient, AIResponse, cached_tokens_from_usage
+from cmai.providers.http_transport import DEFAULT_TIMEOUT, stream_chat_completions
+from cmai.providers.reasoning_parser import ReasoningStreamParser
 from cmai.core.logger_factory import LoggerFactory
 
 
 class OpenAIProvider(BaseAIClient):
-    """OpenAI 兼容客户端实现"""
+    """OpenAI 兼容客户端实现，直接通过异步 httpx 调用 chat/completions 流式接口"""
+
+    supports_shared_http_client = True
+
+    # 兼容 OpenAI 协议的子类只需覆盖默认地址、默认模型和额外的请求参数
+    default_base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    default_model = "qwen-turbo-latest"
+    response_provider = "bailian"
 
     def __init__(
         self,
@@ -26,37 +35,41 @@ class OpenAIProvider(BaseAIClient):
             **kwargs: 其他可选参数，具体取决于不同的API配置。
         """
         super().__init__(api_key=api_key, model=model, **kwargs)
-        self.logger = LoggerFactory().get_logger("OpenAIProvider")
-        self.stream_logger = LoggerFactory().get_stream_logger("OpenAIProvider")
+        name = type(self).__name__
+        self.logger = LoggerFactory().get_logger(name)
+        self.stream_logger = LoggerFactory().get_stream_logger(name)
 
         self.api_key = api_key or settings.API_KEY or os.getenv("CMAI_API_KEY")
 
         # 验证API Key是否存在
         if not self.api_key:
-            raise ValueError("API key is required for OpenAIProvider.")
+            raise ValueError(f"API key is required for {name}.")
 
-        # 获取 API Base
-        if not settings.API_BASE:
-            base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        else:
-            base_url = settings.API_BASE
+        self.model = model or settings.MODEL or self.default_model
 
-        # 获取 model
-        if not model:
-            model = settings.MODEL or "qwen-turbo-latest"
+        self.url = self._resolve_base_url().rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {self.api_key}"}
+        self.timeout = kwargs.get("timeout", DEFAULT_TIMEOUT)
 
-        self.model = model
-
-        self.client = OpenAI(api_key=self.api_key, base_url=base_url, **kwargs)
+        self._init_http_client(**kwargs)
 
         self.provider = "unknown" if not settings.PROVIDER else settings.PROVIDER
 
     def validate_config(self) -> bool:
         return bool(self.api_key)
 
+    def _resolve_base_url(self) -> str:
+        return self.resolve_api_base() or self.default_base_url
+
+    def _extra_payload(self) -> dict[str, Any]:
+        """随每个请求发送的协议扩展参数"""
+        return {"stream_options": {"include_usage": True}}
+
     async def normalize_commit(self, prompt: str, **kargs) -> AIResponse:
         silent = bool(kargs.pop("silent", False))
         diff_content = kargs.pop("diff_content", None)
+        # 前缀缓存由服务端根据相同的提示词前缀自动命中，无需显式标记
+        kargs.pop("cache_breakpoints", None)
         if diff_content:
             log_prompt = prompt.replace(
                 diff_content, f"[Diff content hidden, length: {len(diff_content)}]"
@@ -65,55 +78,51 @@ class OpenAIProvider(BaseAIClient):
             log_prompt = prompt
         self.logger.debug(f"Normalizing commit with prompt: {log_prompt}")
 
-        completion = self.client.chat.completions.create(
-            model=self.model or "qwen-turbo-latest",
-            messages=[{"role": "user", "content": prompt}],
-            stream=True,
-            stream_options={"include_usage": True},
+        # 仅在按阶段配置了上限时传入 max_tokens，否则沿用服务端默认值
+        if self.max_tokens is not None:
+            kargs.setdefault("max_tokens", self.max_tokens)
+
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+            **self._extra_payload(),
             **kargs,
-        )
+        }
 
-        reason = ""
-        response = ""
-        is_answering = False
-        is_reasoning = False
+        parser = ReasoningStreamParser()
         usage = None
-        for chunk in completion:
-            if chunk.choices:
-                delta = chunk.choices[0].delta
-                if (
-                    hasattr(delta, "reasoning_content")
-                    and getattr(delta, "reasoning_content", None) is not None
-                ):
-                    if not is_reasoning:
-                        if not silent:
-                            self.logger.info(
-                                "Detected reasoning content...\nPlease wait..."
-                            )
-                            # The status message is logged to stderr while
-                            # streamed tokens are written to stdout. Emit an
-                            # explicit separator on the stream so the first
-                            # reasoning token cannot be appended to the status
-                            # line.
-                            self.stream_logger.info("\n")
-                        is_reasoning = True
-                    if not silent:
-                        self.stream_logger.info(getattr(delta, "reasoning_content", ""))
-                    reason += getattr(delta, "reasoning_content", "")
-                else:
-                    if not is_answering:
-                        if not silent:
-                            self.stream_logger.info("\n\n")
-                        self.logger.debug("Starting to answer...")
-                        is_answering = True
-                    if not silent:
-                        self.stream_logger.info(chunk.choices[0].delta.content or "")
-                    response += chunk.choices[0].delta.content or ""
-            elif chunk.usage:
-                usage = chunk.usage.total_tokens
-                self.logger.debug(f"Received usage info: {usage} tokens")
-            else:
-                self.logger.warning(f"Unexpected chunk received: {chunk}")
+        cached_tokens = None
+        chunks = stream_chat_completions(
+            self.client,
+            self.url,
+            headers=self.headers,
+            payload=payload,
+            timeout=self.timeout,
+        )
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                choices = chunk.get("choices") or []
+                if choices:
+                    delta = choices[0].get("delta") or {}
+                    if delta.get("reasoning_content"):
+                        self._echo_delta(
+                            parser.feed_reasoning(delta["reasoning_content"]), silent
+                        )
+                    if delta.get("content"):
+                        self._echo_delta(parser.feed(delta["content"]), silent)
+                # 用量信息可能在独立的末尾分块中，也可能随最后一个带 choices 的分块返回
+                if chunk.get("usage"):
+                    usage = chunk["usage"].get("total_tokens")
+                    cached_tokens = cached_tokens_from_usage(chunk["usage"])
+                    self.logger.debug(
+                        f"Received usage info: {usage} tokens "
+                        f"({cached_tokens} cached)"
+                    )
+                elif not choices:
+                    self.logger.warning(f"Unexpected chunk received: {chunk}")
+        self._echo_delta(parser.finish(), silent)
+        response = parser.answer_text
 
         if usage is None:
             self.logger.warning("No usage information received")
@@ -131,7 +140,8 @@ class OpenAIProvider(BaseAIClient):
 
         return AIResponse(
             content=response.strip(),
-            model=self.model or "qwen-turbo-latest",
-            provider="bailian",
+            model=self.model,
+            provider=self.response_provider,
             tokens_used=usage,
+            cached_tokens=cached_tokens,
         )
@@ -1,9 +1,11 @@
 from typing import Any, Dict, Optional, Type
+import asyncio
 import importlib
 
 from cmai.config.settings import settings
 from cmai.core.logger_factory import LoggerFactory
 from cmai.providers.base import BaseAIClient
+from cmai.providers.provider_pool import PoolKey, ProviderPool, key_fingerprint
 
 
 class ProviderFactory:
@@ -25,6 +27,7 @@ class ProviderFactory:
             return
 
         self.logger = LoggerFactory().get_logger("ProviderFactory")
+        self.pool = ProviderPool()
         self._register_default_providers()
         self._initialized = True
 
@@ -132,6 +135,7 @@ class ProviderFactory:
         api_key: Optional[str] = None,
         model: Optional[str] = None,
         log_creation: bool = True,
+        pooled: Optional[bool] = None,
         **kwargs,
     ) -> BaseAIClient:
         """
@@ -141,10 +145,12 @@ class ProviderFactory:
             provider_name: Provider 名称，如果为空则使用默认或配置中的值
             api_key: API 密钥
             model: 模型名称
+            pooled: 是否从连接池复用实例，为 None 时使用 ENABLE_PROVIDER_POOL。
+                仅在事件循环中且未传入其他参数时生效
             **kwargs: 其他参数
 
         Returns:
-            BaseAIClient: Provider 实例
+            BaseAIClient: Provider 实例，池化模式下可能与之前返回的实例相同
         """
         # 确定要使用的 provider 名称
         final_provider_name = self._determine_provider_name(provider_name)
@@ -157,6 +163,16 @@ class ProviderFactory:
             final_provider_name, api_key, model, **kwargs
         )
 
+        pool_key = None
+        if settings.ENABLE_PROVIDER_POOL if pooled is None else pooled:
+            pool_key = self._pool_key(final_provider_name, init_kwargs, kwargs)
+        if pool_key is not None:
+            pooled_instance = self.pool.get(pool_key)
+            if pooled_instance is not None:
+                return pooled_instance
+            if provider_class.supports_shared_http_client:
+                init_kwargs["http_client"] = self.pool.http_client()
+
         try:
             # 创建实例
             provider_instance = provider_class(**init_kwargs)
@@ -174,12 +190,42 @@ class ProviderFactory:
                 self.logger.info(
                     f"Created provider: {final_provider_name} with model: {init_kwargs.get('model', 'default')}"
                 )
+            if pool_key is not None:
+                self.pool.put(pool_key, provider_instance)
             return provider_instance
 
         except Exception as e:
             self.logger.error(f"Failed to create provider {final_provider_name}: {e}")
             raise
 
+    def _pool_key(
+        self,
+        provider_name: str,
+        init_kwargs: Dict[str, Any],
+        extra_kwargs: Dict[str, Any],
+    ) -> Optional[PoolKey]:
+        """池化实例的键；无法安全复用时返回 None"""
+        # 额外参数可能改变客户端行为，此类实例不参与复用
+        if set(extra_kwargs) - {"host", "api_base"}:
+            return None
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # 共享的异步连接池只能绑定在正在运行的事件循环上
+            return None
+        # 显式传入 api_base=None 时使用 Provider 默认地址，与继承 API_BASE 的实例区分
+        api_base = init_kwargs.get("api_base", settings.API_BASE)
+        return (
+            provider_name,
+            init_kwargs.get("model"),
+            init_kwargs.get("host") or api_base,
+            key_fingerprint(init_kwargs.get("api_key")),
+        )
+
+    async def aclose_pool(self) -> None:
+        """关闭池化的 Provider 实例和共享的 httpx 客户端"""
+        await self.pool.aclose()
+
     def _determine_provider_name(self, provider_name: Optional[str]) -> str:
         """确定要使用的 provider 名称"""
         if provider_name:
@@ -252,11 +298,16 @@ class ProviderFactory:
 
         # 针对特定 provider 的特殊处理
         if provider_name in {"ollama", "local"}:
-            # Ollama 特殊配置
-            if hasattr(settings, "OLLAMA_HOST") and settings.OLLAMA_HOST:
-                init_kwargs["host"] = settings.OLLAMA_HOST
-            elif hasattr(settings, "API_BASE") and settings.API_BASE:
-                init_kwargs["host"] = settings.API_BASE
+            from cmai.providers.ollama_provider import default_ollama_host
+
+            # Ollama 特殊配置：按阶段指定的地址优先，不使用托管服务的 API_BASE
+            host = (
+                init_kwargs.get("host")
+                or init_kwargs.pop("api_base", None)
+                or default_ollama_host()
+            )
+            if host:
+                init_kwargs["host"] = host
             if not init_kwargs.get("model"):
                 init_kwargs["model"] = "qwen3:8b"
 
@@ -291,6 +342,7 @@ def create_provider(
     api_key: Optional[str] = None,
     model: Optional[str] = None,
     log_creation: bool = True,
+    pooled: Optional[bool] = None,
     **kwargs,
 ) -> BaseAIClient:
     """
@@ -315,10 +367,21 @@ def create_provider(
         api_key,
         model,
         log_creation=log_creation,
+        pooled=pooled,
         **kwargs,
     )
 
 
+async def close_provider_pool() -> None:
+    """
+    便捷函数：关闭池化的 Provider 实例和共享的 httpx 客户端
+
+    应在事件循环结束前调用，例如一次提交信息生成完成之后。
+    """
+    factory = ProviderFactory()
+    await factory.aclose_pool()
+
+
 def register_custom_provider(name: str, provider_class: Type[BaseAIClient]):
     """
     便捷函数：注册自定义 Provider
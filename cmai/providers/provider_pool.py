@@ -0,0 +1,113 @@
+import asyncio
+import atexit
+import hashlib
+from typing import Dict, Hashable, Optional
+
+import httpx
+
+from cmai.config.settings import settings
+from cmai.core.logger_factory import LoggerFactory
+from cmai.providers.base import BaseAIClient
+
+PoolKey = tuple[Hashable, ...]
+
+
+def key_fingerprint(api_key: Optional[str]) -> Optional[str]:
+    """API 密钥的指纹，用于区分实例而不在内存键中保存明文密钥"""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderPool:
+    """在一次运行内复用 Provider 实例，并让它们共享同一个 httpx 连接池
+
+    异步 httpx 连接绑定在创建它的事件循环上，因此池只在一个事件循环内有效：
+    在新的事件循环中首次使用时会丢弃上一轮的实例。调用方应在事件循环结束前
+    调用 aclose()，进程退出时会再尝试关闭一次遗留的连接。
+    """
+
+    def __init__(self) -> None:
+        self.logger = LoggerFactory().get_logger("ProviderPool")
+        self._providers: Dict[PoolKey, BaseAIClient] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._atexit_registered = False
+
+    def get(self, key: PoolKey) -> Optional[BaseAIClient]:
+        self._bind_loop()
+        return self._providers.get(key)
+
+    def put(self, key: PoolKey, provider: BaseAIClient) -> None:
+        self._bind_loop()
+        self._providers[key] = provider
+
+    def http_client(self) -> httpx.AsyncClient:
+        """当前事件循环共享的 httpx 客户端，首次调用时创建"""
+        self._bind_loop()
+        if self._http_client is None:
+            self._http_client = self._create_http_client()
+            if not self._atexit_registered:
+                atexit.register(self._close_at_exit)
+                self._atexit_registered = True
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """关闭池中 Provider 自有的客户端以及共享的 httpx 客户端"""
+        providers = list(self._providers.values())
+        http_client = self._http_client
+        self._providers.clear()
+        self._http_client = None
+        self._loop = None
+
+        for provider in providers:
+            try:
+                await provider.aclose()
+            except Exception as e:
+                self.logger.debug(f"Failed to close provider {provider!r}: {e}")
+        if http_client is not None and not http_client.is_closed:
+            await http_client.aclose()
+            self.logger.debug(
+                f"Closed shared HTTP client after reusing {len(providers)} providers"
+            )
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            # 上一轮事件循环已结束，其连接无法在新循环中复用
+            self.logger.debug("Discarding provider pool of a finished event loop")
+            self._providers.clear()
+            self._http_client = None
+        self._loop = loop
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=max(1, settings.HTTP_MAX_CONNECTIONS),
+            max_keepalive_connections=max(0, settings.HTTP_MAX_KEEPALIVE_CONNECTIONS),
+            keepalive_expiry=max(0.0, settings.HTTP_KEEPALIVE_EXPIRY),
+        )
+        timeout = httpx.Timeout(300.0, connect=10.0)
+        if settings.HTTP2:
+            try:
+                return httpx.AsyncClient(http2=True, limits=limits, timeout=timeout)
+            except ImportError:
+                # HTTP/2 需要 h2 包: pip install 'cmai[http2]'
+                self.logger.warning(
+                    "HTTP2 is enabled but the h2 package is not installed; "
+                    "falling back to HTTP/1.1"
+                )
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+    def _close_at_exit(self) -> None:
+        http_client = self._http_client
+        self._providers.clear()
+        self._http_client = None
+        if http_client is None or http_client.is_closed:
+            return
+        try:
+            asyncio.run(http_client.aclose())
+        except Exception as e:
+            # 所属事件循环已关闭时连接已随之失效，只需丢弃引用
+            self.logger.debug(f"Failed to close shared HTTP client at exit: {e}")
@@ -0,0 +1,123 @@
+"""流式输出中思考内容与答案的增量解析"""
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+THINK_TAGS = ("<think>", "</think>")
+# 部分模型不用标签，而是用标题区分思考过程和答案
+THINKING_MARKERS = (
+    ("**思考过程:**", "**答案:**"),
+    ("**Thinking:**", "**Answer:**"),
+    ("## 思考", "## 答案"),
+    ("## Thinking", "## Answer"),
+    ("[思考]", "[答案]"),
+    ("[Thinking]", "[Answer]"),
+)
+
+
+@dataclass(frozen=True)
+class StreamDelta:
+    """一次输入解析出的新增思考内容和答案，opens_* 表示该部分首次出现"""
+
+    reasoning: str = ""
+    answer: str = ""
+    opens_reasoning: bool = False
+    opens_answer: bool = False
+
+
+class ReasoningStreamParser:
+    """按块增量解析 <think> 标签和思考/答案标记对的状态机
+
+    每次 feed 只扫描本次输入和上次留下的、可能是标记前缀的少量尾部字符，
+    因此整个流的解析是线性的。解析结果追加到 reasoning 和 answer 列表中，
+    最后由调用方一次性拼接。
+    """
+
+    def __init__(
+        self,
+        markers: Sequence[tuple[str, str]] = (THINK_TAGS, *THINKING_MARKERS),
+    ) -> None:
+        self.reasoning: list[str] = []
+        self.answer: list[str] = []
+        self._openers = {start: end for start, end in markers}
+        self._longest = max(
+            (len(token) for pair in markers for token in pair), default=1
+        )
+        # 当前思考块的结束标记，为 None 时处于答案状态
+        self._closer: Optional[str] = None
+        self._pending = ""
+
+    @property
+    def reasoning_text(self) -> str:
+        return "".join(self.reasoning)
+
+    @property
+    def answer_text(self) -> str:
+        return "".join(self.answer)
+
+    def feed(self, text: str) -> StreamDelta:
+        """解析一段正文内容"""
+        reasoning: list[str] = []
+        answer: list[str] = []
+        buffer = self._pending + text
+
+        while buffer:
+            targets = (self._closer,) if self._closer else tuple(self._openers)
+            index, token = self._find_first(buffer, targets)
+            if token is None:
+                keep = self._partial_marker_length(buffer, targets)
+                self._route(buffer[: len(buffer) - keep], reasoning, answer)
+                buffer = buffer[len(buffer) - keep :]
+                break
+            self._route(buffer[:index], reasoning, answer)
+            buffer = buffer[index + len(token) :]
+            self._closer = None if self._closer else self._openers[token]
+
+        self._pending = buffer
+        return self._commit(reasoning, answer)
+
+    def feed_reasoning(self, text: str) -> StreamDelta:
+        """记录通过独立字段返回的思考内容，例如 reasoning_content"""
+        return self._commit([text] if text else [], [])
+
+    def finish(self) -> StreamDelta:
+        """流结束时输出暂存的、最终未构成标记的尾部字符"""
+        reasoning: list[str] = []
+        answer: list[str] = []
+        self._route(self._pending, reasoning, answer)
+        self._pending = ""
+        return self._commit(reasoning, answer)
+
+    def _route(self, text: str, reasoning: list[str], answer: list[str]) -> None:
+        if text:
+            (reasoning if self._closer else answer).append(text)
+
+    def _commit(self, reasoning: list[str], answer: list[str]) -> StreamDelta:
+        delta = StreamDelta(
+            reasoning="".join(reasoning),
+            answer="".join(answer),
+            opens_reasoning=bool(reasoning) and not self.reasoning,
+            opens_answer=bool(answer) and not self.answer,
+        )
+        self.reasoning.extend(reasoning)
+        self.answer.extend(answer)
+        return delta
+
+    @staticmethod
+    def _find_first(
+        buffer: str, targets: Sequence[str]
+    ) -> tuple[int, Optional[str]]:
+        best_index, best_token = len(buffer), None
+        for token in targets:
+            index = buffer.find(token, 0, best_index + len(token))
+            if index != -1 and index < best_index:
+                best_index, best_token = index, token
+        return best_index, best_token
+
+    def _partial_marker_length(self, buffer: str, targets: Sequence[str]) -> int:
+        """buffer 末尾可能是某个标记开头的最长长度，这部分留到下一块再判断"""
+        for length in range(min(len(buffer), self._longest - 1), 0, -1):
+            tail = buffer[-length:]
+            if any(token.startswith(tail) for token in targets):
+                return length
+        return 0
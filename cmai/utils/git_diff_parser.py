@@ -0,0 +1,307 @@
+"""Parsers for ``git diff --raw --patch -z`` output."""
+
+from dataclasses import dataclass
+import re
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+NULL_OBJECT_ID = "0" * 40
+READ_CHUNK_SIZE = 64 * 1024
+MAX_LINE_BYTES = 8 * 1024
+
+LINE_FILE_HEADER = "file"
+LINE_CONTENT = "line"
+LINE_SKIPPED = "skip"
+
+
+@dataclass(frozen=True)
+class RawDiffRecord:
+    """One ``--raw`` record describing a staged path and its blob ids."""
+
+    old_mode: str
+    new_mode: str
+    old_blob: str
+    new_blob: str
+    status_code: str
+    score: Optional[int]
+    path: str
+    old_path: Optional[str] = None
+
+    @property
+    def has_patch(self) -> bool:
+        # Unmerged paths are reported as "* Unmerged path" without a patch.
+        return self.status_code != "U"
+
+
+def parse_raw_header(header: str) -> Tuple[str, str, str, str, str, Optional[int]]:
+    """Parse ``:<old mode> <new mode> <old sha> <new sha> <status>``."""
+
+    parts = header.lstrip(":").split()
+    if len(parts) != 5:
+        raise ValueError(f"Malformed raw diff record: {header!r}")
+
+    old_mode, new_mode, old_blob, new_blob, status = parts
+    score = int(status[1:]) if len(status) > 1 and status[1:].isdigit() else None
+    return old_mode, new_mode, old_blob, new_blob, status[:1], score
+
+
+def parse_raw_records(fields: List[str]) -> Tuple[List[RawDiffRecord], int]:
+    """Parse NUL separated raw records.
+
+    Returns the records and the index of the first field after the raw section,
+    which is where the patch text begins.
+    """
+
+    records: List[RawDiffRecord] = []
+    index = 0
+    while index < len(fields):
+        header = fields[index]
+        if not header.startswith(":"):
+            break
+
+        old_mode, new_mode, old_blob, new_blob, code, score = parse_raw_header(header)
+        if code in {"R", "C"}:
+            if index + 2 >= len(fields):
+                raise ValueError("Incomplete rename/copy raw diff record.")
+            old_path: Optional[str] = fields[index + 1]
+            path = fields[index + 2]
+            index += 3
+        else:
+            if index + 1 >= len(fields):
+                raise ValueError("Incomplete raw diff record.")
+            old_path = None
+            path = fields[index + 1]
+            index += 2
+
+        records.append(
+            RawDiffRecord(
+                old_mode=old_mode,
+                new_mode=new_mode,
+                old_blob=old_blob,
+                new_blob=new_blob,
+                status_code=code,
+                score=score,
+                path=path,
+                old_path=old_path,
+            )
+        )
+
+    return records, index
+
+
+@dataclass(frozen=True)
+class NumstatRecord:
+    """Added/removed line counts from ``--numstat``; ``None`` for binaries."""
+
+    added: Optional[int]
+    removed: Optional[int]
+    path: str
+    old_path: Optional[str] = None
+
+    @property
+    def is_binary(self) -> bool:
+        return self.added is None or self.removed is None
+
+
+def parse_numstat_records(fields: List[str], start: int = 0) -> List[NumstatRecord]:
+    """Parse NUL separated ``--numstat -z`` records beginning at ``start``."""
+
+    records: List[NumstatRecord] = []
+    index = start
+    while index < len(fields):
+        field = fields[index]
+        if not field:
+            index += 1
+            continue
+
+        parts = field.split("\t", 2)
+        if len(parts) != 3:
+            raise ValueError(f"Malformed numstat record: {field!r}")
+        added, removed, path = parts
+        old_path: Optional[str] = None
+        if path:
+            index += 1
+        else:
+            # Renames and copies put both paths in the following fields.
+            if index + 2 >= len(fields):
+                raise ValueError("Incomplete rename/copy numstat record.")
+            old_path = fields[index + 1]
+            path = fields[index + 2]
+            index += 3
+
+        records.append(
+            NumstatRecord(
+                added=int(added) if added.isdigit() else None,
+                removed=int(removed) if removed.isdigit() else None,
+                path=path,
+                old_path=old_path,
+            )
+        )
+
+    return records
+
+
+class PatchSplitter:
+    """Incrementally split unified patch text into per-file patches.
+
+    Hunk line counts from the ``@@`` headers are tracked so that a content line
+    can never be mistaken for the start of the next file.
+    """
+
+    def __init__(self) -> None:
+        self._current: Optional[List[str]] = None
+        self._old_remaining = 0
+        self._new_remaining = 0
+
+    @property
+    def in_hunk(self) -> bool:
+        return self._old_remaining > 0 or self._new_remaining > 0
+
+    def classify(self, line: str) -> str:
+        """Update the hunk state for ``line`` and report what it is."""
+
+        if self.in_hunk:
+            self._consume_hunk_line(line)
+            return LINE_CONTENT
+
+        if line.startswith("diff --git ") or line.startswith("diff --cc "):
+            return LINE_FILE_HEADER
+
+        if line.startswith("* Unmerged path "):
+            return LINE_SKIPPED
+
+        match = HUNK_HEADER_PATTERN.match(line)
+        if match:
+            self._old_remaining = int(match.group(1) or 1)
+            self._new_remaining = int(match.group(2) or 1)
+        return LINE_CONTENT
+
+    def feed(self, line: str) -> Optional[List[str]]:
+        """Consume one line and return the previous file's lines when it ends."""
+
+        kind = self.classify(line)
+        if kind == LINE_FILE_HEADER:
+            finished = self._current
+            self._current = [line]
+            return finished
+
+        if kind == LINE_CONTENT and self._current is not None:
+            self._current.append(line)
+        return None
+
+    def finish(self) -> Optional[List[str]]:
+        finished = self._current
+        self._current = None
+        self._old_remaining = 0
+        self._new_remaining = 0
+        return finished
+
+    def _consume_hunk_line(self, line: str) -> None:
+        marker = line[:1]
+        if marker == "-":
+            self._old_remaining -= 1
+        elif marker == "+":
+            self._new_remaining -= 1
+        elif marker == "\\":
+            return
+        else:
+            # Context lines; some tools strip the leading space of blank lines.
+            self._old_remaining -= 1
+            self._new_remaining -= 1
+
+        self._old_remaining = max(0, self._old_remaining)
+        self._new_remaining = max(0, self._new_remaining)
+
+
+class RawPatchStream:
+    """Read ``git diff -z --raw --patch`` output incrementally from a pipe.
+
+    The raw records are small and read up front; patch lines are then yielded
+    one by one. Lines longer than ``max_line_bytes`` are cut, and the rest of
+    the line is discarded while still being counted, so a single huge line
+    cannot grow the buffer.
+    """
+
+    def __init__(self, stream: BinaryIO, max_line_bytes: int = MAX_LINE_BYTES) -> None:
+        self._stream = stream
+        self._buffer = bytearray()
+        self._eof = False
+        self.max_line_bytes = max_line_bytes
+
+    def read_records(self) -> List[RawDiffRecord]:
+        fields: List[str] = []
+        while True:
+            field = self._read_field()
+            if not field:
+                break
+            fields.append(field)
+
+        records, consumed = parse_raw_records(fields)
+        if consumed != len(fields):
+            raise ValueError("Unexpected data in raw diff section.")
+        return records
+
+    def iter_lines(self) -> Iterator[Tuple[str, int]]:
+        """Yield ``(line, full_length)``; ``line`` may be shortened."""
+
+        while True:
+            newline = self._buffer.find(b"\n")
+            if newline >= 0:
+                raw = bytes(self._buffer[: min(newline, self.max_line_bytes)])
+                del self._buffer[: newline + 1]
+                yield self._decode(raw), newline
+                continue
+
+            if len(self._buffer) > self.max_line_bytes:
+                yield self._decode_long_line()
+                continue
+
+            if not self._fill():
+                if self._buffer:
+                    raw = bytes(self._buffer)
+                    self._buffer.clear()
+                    yield self._decode(raw), len(raw)
+                return
+
+    def _decode_long_line(self) -> Tuple[str, int]:
+        kept = bytes(self._buffer[: self.max_line_bytes])
+        length = len(self._buffer)
+        self._buffer.clear()
+        while True:
+            if not self._fill():
+                break
+            newline = self._buffer.find(b"\n")
+            if newline >= 0:
+                length += newline
+                del self._buffer[: newline + 1]
+                break
+            length += len(self._buffer)
+            self._buffer.clear()
+        return self._decode(kept), length
+
+    def _read_field(self) -> str:
+        while True:
+            separator = self._buffer.find(b"\0")
+            if separator >= 0:
+                raw = bytes(self._buffer[:separator])
+                del self._buffer[: separator + 1]
+                return self._decode(raw)
+            if not self._fill():
+                raw = bytes(self._buffer)
+                self._buffer.clear()
+                return self._decode(raw)
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        reader = getattr(self._stream, "read1", self._stream.read)
+        chunk = reader(READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer.extend(chunk)
+        return True
+
+    @staticmethod
+    def _decode(raw: bytes) -> str:
+        return raw.decode("utf-8", errors="replace")
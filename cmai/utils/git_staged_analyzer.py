@@ -1,10 +1,31 @@
+import hashlib
+import json
 import subprocess
+import tempfile
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional
 from pathlib import Path
 
 from cmai.core.logger_factory import LoggerFactory
+from cmai.core.stage_routing import ROUTE_FINAL, resolve_stage_route
+from cmai.core.token_estimator import get_token_estimator, resolve_diff_token_budget
 from cmai.config.settings import settings
+from cmai.utils.git_diff_parser import (
+    HUNK_HEADER_PATTERN,
+    LINE_FILE_HEADER,
+    LINE_SKIPPED,
+    NumstatRecord,
+    PatchSplitter,
+    RawDiffRecord,
+    RawPatchStream,
+    parse_numstat_records,
+    parse_raw_records,
+)
+from cmai.utils.staged_snapshot import (
+    StagedSnapshot,
+    StagedSnapshotCache,
+    build_snapshot_key,
+)
 
 
 @dataclass(frozen=True)
@@ -15,6 +36,12 @@ class StagedFileChange:
     preview_diff: str
     is_preview_only: bool
     old_path: Optional[str] = None
+    diff_length: Optional[int] = None
+    old_blob: Optional[str] = None
+    new_blob: Optional[str] = None
+    added_lines: Optional[int] = None
+    removed_lines: Optional[int] = None
+    stat_only_reason: Optional[str] = None
 
     @property
     def is_structural_change(self) -> bool:
@@ -22,17 +49,142 @@ class StagedFileChange:
 
         return self.status in {"deleted", "renamed"}
 
+    @property
+    def is_stat_only(self) -> bool:
+        """Whether the patch was intentionally skipped in favour of line counts."""
+
+        return self.stat_only_reason is not None
+
+    @property
+    def content_length(self) -> int:
+        """Size of the complete patch, even when only a preview was retained."""
+
+        if self.diff_length is not None:
+            return self.diff_length
+        return len(self.full_diff)
+
 
 @dataclass(frozen=True)
 class _StagedFileStatus:
     path: str
     status: str
     old_path: Optional[str] = None
+    old_blob: Optional[str] = None
+    new_blob: Optional[str] = None
+    added_lines: Optional[int] = None
+    removed_lines: Optional[int] = None
+    stat_only_reason: Optional[str] = None
+    is_binary: bool = False
 
     @property
     def is_structural_change(self) -> bool:
         return self.status in {"deleted", "renamed"}
 
+    @property
+    def skips_patch(self) -> bool:
+        return self.is_binary or self.stat_only_reason is not None
+
+
+class _DiffPreviewBuilder:
+    """Keep patch headers and the first ``max_changed_lines`` changed lines."""
+
+    def __init__(self, max_changed_lines: int) -> None:
+        self.max_changed_lines = max_changed_lines
+        self.lines: List[str] = []
+        self.changed_count = 0
+        self.is_full = False
+
+    def add(self, line: str) -> None:
+        if self.is_full:
+            return
+
+        if line.startswith("diff --git") or line.startswith("index "):
+            self.lines.append(line)
+            return
+
+        if line.startswith("--- ") or line.startswith("+++ ") or line.startswith("@@"):
+            self.lines.append(line)
+            return
+
+        if line.startswith("+") or line.startswith("-"):
+            self.lines.append(line)
+            self.changed_count += 1
+            if self.changed_count >= self.max_changed_lines:
+                self.is_full = True
+
+    def build(self) -> str:
+        if not self.lines:
+            return "(No textual patch available for this file.)"
+        return "\n".join(self.lines)
+
+
+class _StreamedPatch:
+    """Bounded accumulator for one file's patch read from the diff stream."""
+
+    def __init__(
+        self,
+        staged_file: "_StagedFileStatus",
+        *,
+        max_changed_lines: int,
+        full_budget: int,
+        retain: bool,
+    ) -> None:
+        self.staged_file = staged_file
+        self.full_budget = full_budget
+        self.retain = retain
+        self.preview = _DiffPreviewBuilder(max_changed_lines)
+        self.full_lines: Optional[List[str]] = [] if retain and full_budget > 0 else None
+        self.length = 0
+        self.is_binary = False
+
+    def add(self, line: str, length: int, *, is_cut: bool) -> None:
+        self.length += length + 1
+        if not self.retain:
+            return
+
+        if line.startswith("Binary files ") and line.endswith(" differ"):
+            self.is_binary = True
+        self.preview.add(line)
+
+        if self.full_lines is None:
+            return
+        if is_cut or self.length > self.full_budget:
+            # The complete patch no longer fits; only the preview is kept.
+            self.full_lines = None
+            return
+        self.full_lines.append(line)
+
+
+STATUS_NAMES = {
+    "A": "added",
+    "M": "modified",
+    "D": "deleted",
+    "R": "renamed",
+    "C": "copied",
+}
+
+
+GITATTRIBUTE_NAMES = ("linguist-generated", "linguist-vendored", "diff", "binary")
+MAX_EXCLUDED_PATHSPECS = 1000
+# Complete patches are retained up to this many characters per budget token,
+# enough to fill the token budget with whole hunks for typical source code.
+RETAINED_CHARS_PER_TOKEN = 6
+
+
+def split_patch_hunks(patch: str) -> tuple[str, List[str]]:
+    """Split one file's patch into its header and its ``@@`` hunks."""
+
+    header: List[str] = []
+    hunks: List[List[str]] = []
+    for line in patch.splitlines():
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            header.append(line)
+    return "\n".join(header), ["\n".join(hunk) for hunk in hunks]
+
 
 class GitStagedAnalyzer:
     MAX_DIFF_SIZE = settings.MAX_DIFF_LENGTH
@@ -61,52 +213,556 @@ class GitStagedAnalyzer:
             repo_path = str(Path.cwd().resolve())
         self.logger.info(f"Initializing GitStagedAnalyzer for repo: {repo_path}")
         self.repo_path = Path(repo_path).resolve()
-        self.max_diff_size = settings.MAX_DIFF_LENGTH
+        # MAX_DIFF_LENGTH is a legacy character cap, applied only when it is
+        # configured explicitly; otherwise the token budget decides.
+        self.max_diff_size: Optional[int] = (
+            settings.MAX_DIFF_LENGTH
+            if "MAX_DIFF_LENGTH" in settings.model_fields_set
+            else None
+        )
+        # The staged changes go into the final prompt, so the budget follows
+        # the model the final message is routed to.
+        final_route = resolve_stage_route(ROUTE_FINAL)
+        final_model = final_route.model or settings.MODEL
+        self.max_diff_tokens = resolve_diff_token_budget(
+            settings,
+            model=final_model,
+            provider=final_route.provider,
+            max_output_tokens=final_route.max_tokens,
+        )
+        self.token_estimator = get_token_estimator(
+            final_model, settings.TOKEN_ESTIMATOR
+        )
         self.max_diff_file_lines = settings.MAX_DIFF_FILE_LINES
+        self.stat_only_changed_lines = settings.STAT_ONLY_CHANGED_LINES
 
     def get_staged_entries(self) -> List[StagedFileChange]:
+        return list(self.get_staged_snapshot().entries)
+
+    def get_staged_snapshot(self) -> StagedSnapshot:
+        """Return the analyzed staged entries for the current index state.
+
+        The result is keyed by the index tree id (``git write-tree``) and
+        ``HEAD``, so repeated calls within a session reuse the earlier
+        analysis. With ``PERSIST_STAGED_SNAPSHOTS`` later runs against an
+        unchanged index do too. Without ``ENABLE_STAGED_SNAPSHOT_CACHE`` the
+        index is not written to a tree at all.
+        """
+
+        if not settings.ENABLE_STAGED_SNAPSHOT_CACHE:
+            return StagedSnapshot(
+                key=None,
+                tree_id=None,
+                head_id=None,
+                entries=tuple(self._collect_entries()),
+            )
+
+        tree_id = self._get_index_tree_id()
+        head_id = self._get_head_id() if tree_id else None
+        key = None
+        if tree_id:
+            key = build_snapshot_key(
+                tree_id,
+                head_id,
+                (
+                    self._retention_budget(),
+                    self.max_diff_file_lines,
+                    self.stat_only_changed_lines,
+                    ",".join(sorted(self.IGNORED_EXTENSIONS)),
+                ),
+            )
+
+        cache = StagedSnapshotCache(
+            settings.resolve_cache_dir() if settings.PERSIST_STAGED_SNAPSHOTS else None
+        )
+        if key is not None:
+            cached = cache.get(key, StagedFileChange)
+            if cached is not None:
+                return cached
+
+        snapshot = StagedSnapshot(
+            key=key,
+            tree_id=tree_id,
+            head_id=head_id,
+            entries=tuple(self._collect_entries()),
+        )
+        cache.put(snapshot)
+        return snapshot
+
+    def _collect_entries(self) -> List[StagedFileChange]:
+        try:
+            return list(self.iter_staged_entries())
+        except (subprocess.CalledProcessError, ValueError) as e:
+            self.logger.warning(
+                f"Single-pass staged diff collection failed, using per-file diffs: {e}"
+            )
+            return self._collect_per_file()
+
+    def iter_staged_entries(self) -> Iterator[StagedFileChange]:
+        """Yield staged entries while reading ``git diff`` output incrementally.
+
+        A cheap ``--raw --numstat`` pre-pass runs first: binary files, files
+        above ``STAT_ONLY_CHANGED_LINES`` and files marked as generated,
+        vendored or ``-diff`` in ``.gitattributes`` get stat-only entries, and
+        their patches are excluded from the diff request.
+
+        Complete patches are retained only while they fit into the total
+        retention budget; past that point the prompt falls back to previews
+        anyway, so only previews and patch sizes are kept. Peak memory
+        therefore depends on the budget, not on the size of the staged diff.
+        """
+
+        stats = self._get_staged_file_stats()
+        excluded = self._patch_exclusions(stats)
+        pending = sorted((stats[path] for path in excluded), key=lambda item: item.path)
+
+        # stderr goes to a file: a full stderr pipe would block git while we
+        # are still waiting for stdout to reach EOF.
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            self._single_pass_command(excluded),
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        assert process.stdout is not None
+        completed = False
+        try:
+            reader = RawPatchStream(process.stdout)
+            records = iter(
+                [record for record in reader.read_records() if record.has_patch]
+            )
+            splitter = PatchSplitter()
+            current: Optional[_StreamedPatch] = None
+            retained_length = 0
+            budget_exhausted = False
+
+            for line, length in reader.iter_lines():
+                kind = splitter.classify(line)
+                if kind == LINE_SKIPPED:
+                    continue
+
+                if kind == LINE_FILE_HEADER:
+                    entry = (
+                        self._finish_streamed_patch(current)
+                        if current is not None
+                        else None
+                    )
+                    if entry is not None:
+                        if not entry.is_structural_change and not entry.is_stat_only:
+                            if entry.is_preview_only:
+                                budget_exhausted = True
+                            else:
+                                retained_length += self._entry_content_length(entry)
+                        yield from self._take_pending_before(pending, entry.path)
+                        yield entry
+
+                    record = next(records, None)
+                    if record is None:
+                        raise ValueError("Patch without a matching raw diff record.")
+                    staged_file = stats.get(
+                        record.path
+                    ) or self._status_from_raw_record(record)
+                    full_budget = 0
+                    if not budget_exhausted:
+                        full_budget = (
+                            self._retention_budget()
+                            - retained_length
+                            - len(staged_file.path)
+                            - 2
+                        )
+                    current = _StreamedPatch(
+                        staged_file,
+                        max_changed_lines=self.max_diff_file_lines,
+                        full_budget=full_budget,
+                        retain=not staged_file.is_structural_change
+                        and not staged_file.skips_patch
+                        and not self._is_ignored_path(staged_file.path),
+                    )
+
+                if current is not None:
+                    current.add(
+                        line, length, is_cut=length > reader.max_line_bytes
+                    )
+
+            if current is not None:
+                entry = self._finish_streamed_patch(current)
+                if entry is not None:
+                    yield from self._take_pending_before(pending, entry.path)
+                    yield entry
+            yield from self._take_pending_before(pending, None)
+
+            if next(records, None) is not None:
+                raise ValueError("Raw diff record without a matching patch.")
+            completed = True
+        finally:
+            if not completed:
+                process.kill()
+            process.stdout.close()
+            return_code = process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            stderr_file.close()
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code, process.args, stderr=stderr
+            )
+
+    def _take_pending_before(
+        self, pending: List[_StagedFileStatus], path: Optional[str]
+    ) -> Iterator[StagedFileChange]:
+        """Yield entries for excluded paths that sort before ``path``.
+
+        ``git diff`` emits files in path order, so merging keeps the excluded
+        stat-only and structural entries in their usual position.
+        """
+
+        while pending and (path is None or pending[0].path < path):
+            entry = self._build_skipped_entry(pending.pop(0))
+            if entry is not None:
+                yield entry
+
+    def _get_staged_file_stats(self) -> dict[str, _StagedFileStatus]:
+        """Run the cheap ``--raw --numstat`` pre-pass and classify every path."""
+
+        try:
+            stat_result = subprocess.run(
+                [
+                    "git",
+                    "diff",
+                    "--cached",
+                    "-z",
+                    "--raw",
+                    "--numstat",
+                    "--no-abbrev",
+                    "--find-renames",
+                    "--find-copies",
+                ],
+                cwd=self.repo_path,
+                capture_output=True,
+                check=True,
+            )
+            fields = stat_result.stdout.decode("utf-8", errors="replace").split("\0")
+            raw_records, numstat_index = parse_raw_records(fields)
+            numstats = {
+                record.path: record
+                for record in parse_numstat_records(fields, numstat_index)
+            }
+        except (subprocess.CalledProcessError, ValueError) as e:
+            self.logger.warning(f"Staged numstat pre-pass failed: {e}")
+            return {}
+
+        attributes = self._get_path_attributes(
+            [record.path for record in raw_records]
+        )
+        return {
+            record.path: self._classify_staged_file(
+                record,
+                numstats.get(record.path),
+                attributes.get(record.path, {}),
+            )
+            for record in raw_records
+        }
+
+    def _classify_staged_file(
+        self,
+        record: RawDiffRecord,
+        numstat: Optional[NumstatRecord],
+        attributes: dict[str, str],
+    ) -> _StagedFileStatus:
+        staged_file = self._status_from_raw_record(record)
+        added = numstat.added if numstat else None
+        removed = numstat.removed if numstat else None
+
+        is_binary = attributes.get("binary") == "set"
+        reason: Optional[str] = None
+        if attributes.get("linguist-generated") in {"set", "true"}:
+            reason = "generated"
+        elif attributes.get("linguist-vendored") in {"set", "true"}:
+            reason = "vendored"
+        elif attributes.get("diff") == "unset" and not is_binary:
+            reason = "diff disabled"
+        elif numstat is not None and numstat.is_binary:
+            is_binary = True
+        elif (
+            self.stat_only_changed_lines > 0
+            and added is not None
+            and removed is not None
+            and added + removed > self.stat_only_changed_lines
+        ):
+            reason = "large"
+
+        return _StagedFileStatus(
+            path=staged_file.path,
+            status=staged_file.status,
+            old_path=staged_file.old_path,
+            old_blob=staged_file.old_blob,
+            new_blob=staged_file.new_blob,
+            added_lines=added,
+            removed_lines=removed,
+            stat_only_reason=reason,
+            is_binary=is_binary,
+        )
+
+    def _get_path_attributes(self, paths: List[str]) -> dict[str, dict[str, str]]:
+        """Read ``.gitattributes`` from the index for all paths in one call."""
+
+        if not paths:
+            return {}
+
+        try:
+            attr_result = subprocess.run(
+                ["git", "check-attr", "--cached", "-z", "--stdin", *GITATTRIBUTE_NAMES],
+                cwd=self.repo_path,
+                input="\0".join(paths).encode("utf-8") + b"\0",
+                capture_output=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.debug(f"Unable to read git attributes: {e}")
+            return {}
+
+        fields = attr_result.stdout.decode("utf-8", errors="replace").split("\0")
+        attributes: dict[str, dict[str, str]] = {}
+        for index in range(0, len(fields) - 2, 3):
+            path, name, value = fields[index : index + 3]
+            attributes.setdefault(path, {})[name] = value
+        return attributes
+
+    def _patch_exclusions(self, stats: dict[str, _StagedFileStatus]) -> List[str]:
+        """Paths whose patches are never used and need not be generated.
+
+        Renames and copies stay in the request so that git still pairs their
+        source and destination paths.
+        """
+
+        excluded = [
+            staged_file.path
+            for staged_file in stats.values()
+            if staged_file.status not in {"renamed", "copied"}
+            and (
+                staged_file.skips_patch
+                or staged_file.status == "deleted"
+                or self._is_ignored_path(staged_file.path)
+            )
+        ]
+        if len(excluded) > MAX_EXCLUDED_PATHSPECS:
+            # Too many pathspecs for one command line; skipped patches are
+            # still discarded while streaming.
+            return []
+        return excluded
+
+    def _single_pass_command(self, excluded: Iterable[str] = ()) -> List[str]:
+        command = [
+            "git",
+            "diff",
+            "--cached",
+            "-z",
+            "--patch",
+            "--raw",
+            "--no-abbrev",
+            "--no-color",
+            "--no-ext-diff",
+            "--find-renames",
+            "--find-copies",
+        ]
+        exclusions = [f":(top,exclude,literal){path}" for path in excluded]
+        if exclusions:
+            command.extend(["--", ":(top)", *exclusions])
+        return command
+
+    def _finish_streamed_patch(
+        self, patch: _StreamedPatch
+    ) -> Optional[StagedFileChange]:
+        staged_file = patch.staged_file
+        if not patch.retain:
+            return self._build_skipped_entry(staged_file)
+
+        if patch.is_binary:
+            return None
+
+        preview_diff = patch.preview.build()
+        if patch.full_lines is None:
+            return StagedFileChange(
+                path=staged_file.path,
+                status=staged_file.status,
+                full_diff=preview_diff,
+                preview_diff=preview_diff,
+                is_preview_only=True,
+                old_path=staged_file.old_path,
+                old_blob=staged_file.old_blob,
+                new_blob=staged_file.new_blob,
+                diff_length=patch.length,
+                added_lines=staged_file.added_lines,
+                removed_lines=staged_file.removed_lines,
+            )
+
+        full_diff = "\n".join(patch.full_lines).strip()
+        if not full_diff:
+            return None
+        return StagedFileChange(
+            path=staged_file.path,
+            status=staged_file.status,
+            full_diff=full_diff,
+            preview_diff=preview_diff,
+            is_preview_only=False,
+            old_path=staged_file.old_path,
+            old_blob=staged_file.old_blob,
+            new_blob=staged_file.new_blob,
+            diff_length=len(full_diff),
+            added_lines=staged_file.added_lines,
+            removed_lines=staged_file.removed_lines,
+        )
+
+    def _collect_per_file(self) -> List[StagedFileChange]:
         staged_files = self._get_staged_file_statuses()
         if not staged_files:
             return []
 
         entries: List[StagedFileChange] = []
         for staged_file in staged_files:
-            if staged_file.is_structural_change:
-                structural_context = self._build_structural_context(staged_file)
-                entries.append(
-                    StagedFileChange(
-                        path=staged_file.path,
-                        status=staged_file.status,
-                        full_diff=structural_context,
-                        preview_diff=structural_context,
-                        is_preview_only=True,
-                        old_path=staged_file.old_path,
-                    )
+            detailed_diff = ""
+            if not staged_file.is_structural_change:
+                detailed_diff = self._get_detailed_diff(
+                    staged_file.path, staged_file.old_path
                 )
-                continue
+            entry = self._build_entry(staged_file, detailed_diff)
+            if entry is not None:
+                entries.append(entry)
+
+        return entries
+
+    def _build_skipped_entry(
+        self, staged_file: _StagedFileStatus
+    ) -> Optional[StagedFileChange]:
+        """Build an entry for a file whose patch was not read."""
 
-            detailed_diff = self._get_detailed_diff(
-                staged_file.path, staged_file.old_path
+        if self._is_ignored_path(staged_file.path):
+            return None
+        if staged_file.is_structural_change:
+            return self._build_entry(staged_file, "")
+        if staged_file.is_binary or staged_file.stat_only_reason is None:
+            return None
+
+        added = "?" if staged_file.added_lines is None else staged_file.added_lines
+        removed = (
+            "?" if staged_file.removed_lines is None else staged_file.removed_lines
+        )
+        stat_line = (
+            f"Stat only ({staged_file.stat_only_reason}): "
+            f"+{added} -{removed} lines, patch omitted."
+        )
+        return StagedFileChange(
+            path=staged_file.path,
+            status=staged_file.status,
+            full_diff=stat_line,
+            preview_diff=stat_line,
+            is_preview_only=True,
+            old_path=staged_file.old_path,
+            old_blob=staged_file.old_blob,
+            new_blob=staged_file.new_blob,
+            added_lines=staged_file.added_lines,
+            removed_lines=staged_file.removed_lines,
+            stat_only_reason=staged_file.stat_only_reason,
+        )
+
+    def _build_entry(
+        self, staged_file: _StagedFileStatus, detailed_diff: str
+    ) -> Optional[StagedFileChange]:
+        if staged_file.is_structural_change:
+            structural_context = self._build_structural_context(staged_file)
+            return StagedFileChange(
+                path=staged_file.path,
+                status=staged_file.status,
+                full_diff=structural_context,
+                preview_diff=structural_context,
+                is_preview_only=True,
+                old_path=staged_file.old_path,
+                old_blob=staged_file.old_blob,
+                new_blob=staged_file.new_blob,
             )
-            if not detailed_diff:
-                continue
 
-            if "Binary files" in detailed_diff and "differ" in detailed_diff:
-                continue
+        if not detailed_diff:
+            return None
 
-            preview_diff = self._build_diff_preview(detailed_diff)
-            entries.append(
-                StagedFileChange(
-                    path=staged_file.path,
-                    status=staged_file.status,
-                    full_diff=detailed_diff,
-                    preview_diff=preview_diff,
-                    is_preview_only=False,
-                    old_path=staged_file.old_path,
-                )
+        if "Binary files" in detailed_diff and "differ" in detailed_diff:
+            return None
+
+        return StagedFileChange(
+            path=staged_file.path,
+            status=staged_file.status,
+            full_diff=detailed_diff,
+            preview_diff=self._build_diff_preview(detailed_diff),
+            is_preview_only=False,
+            old_path=staged_file.old_path,
+            old_blob=staged_file.old_blob,
+            new_blob=staged_file.new_blob,
+        )
+
+    @staticmethod
+    def staged_patch_id(entries: Iterable[StagedFileChange]) -> Optional[str]:
+        """Identify the staged change by the patches the prompt is built from.
+
+        Like ``git patch-id --stable``, ``index`` lines and hunk line numbers
+        are left out, so the id survives rebasing and restaging the same change
+        on top of a different ``HEAD``. Only analyzed content counts: retained
+        patches, previews with their line counts, and the stats of stat-only
+        entries.
+        """
+
+        parts = []
+        for entry in entries:
+            patch = entry.preview_diff if entry.is_preview_only else entry.full_diff
+            hunks = []
+            for line in patch.splitlines():
+                if line.startswith("index "):
+                    continue
+                hunks.append("@@" if HUNK_HEADER_PATTERN.match(line) else line)
+            parts.append(
+                [
+                    entry.status,
+                    entry.old_path or "",
+                    entry.path,
+                    entry.added_lines,
+                    entry.removed_lines,
+                    entry.stat_only_reason or "",
+                    "\n".join(hunks),
+                ]
             )
+        if not parts:
+            return None
+        payload = json.dumps(sorted(parts, key=lambda part: (part[2], part[1])))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-        return entries
+    def _get_index_tree_id(self) -> Optional[str]:
+        return self._run_git_for_id(["git", "write-tree"])
+
+    def _get_head_id(self) -> Optional[str]:
+        return self._run_git_for_id(["git", "rev-parse", "-q", "--verify", "HEAD"])
+
+    def _run_git_for_id(self, command: List[str]) -> Optional[str]:
+        try:
+            result = subprocess.run(
+                command,
+                cwd=self.repo_path,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.debug(f"Unable to run {' '.join(command)}: {e}")
+            return None
+        return result.stdout.strip() or None
+
+    def _status_from_raw_record(self, record: RawDiffRecord) -> _StagedFileStatus:
+        return _StagedFileStatus(
+            path=record.path,
+            status=STATUS_NAMES.get(record.status_code, "modified"),
+            old_path=record.old_path,
+            old_blob=record.old_blob,
+            new_blob=record.new_blob,
+        )
 
     def get_cached_diff(self) -> Optional[List[str]]:
         try:
@@ -120,31 +776,49 @@ class GitStagedAnalyzer:
             self.logger.error(f"Error checking git status: {e}")
             return None
 
+    def exceeds_prompt_budget(self, entries: List[StagedFileChange]) -> bool:
+        """Whether the complete patches do not fit into the prompt budget.
+
+        Decided from sizes and token estimates alone, without rendering.
+        """
+
+        content_entries = [
+            entry for entry in entries if not entry.is_structural_change
+        ]
+        if self._exceeds_char_limit(content_entries):
+            return True
+        if any(
+            entry.is_preview_only and not entry.is_stat_only
+            for entry in content_entries
+        ):
+            return True
+        content_tokens = sum(
+            self._full_entry_tokens(entry) for entry in content_entries
+        )
+        return content_tokens > self.max_diff_tokens
+
     def render_prompt_entries(
         self, entries: List[StagedFileChange]
     ) -> tuple[List[str], bool]:
-        full_entries = [self._render_full_entry(entry) for entry in entries]
-        content_length = sum(
-            len(self._render_full_entry(entry))
-            for entry in entries
-            if not entry.is_structural_change
-        )
-
-        if content_length <= self.max_diff_size:
-            return full_entries, False
+        if not self.exceeds_prompt_budget(entries):
+            return [self._render_full_entry(entry) for entry in entries], False
 
         self.logger.warning(
             "Staged changes too large, returning per-file truncated diff previews."
         )
+        content_entries = [
+            entry for entry in entries if not entry.is_structural_change
+        ]
+        if not self._exceeds_char_limit(content_entries):
+            return self._pack_entries_into_token_budget(entries), True
+
         truncated_entries = []
         for entry in entries:
-            if entry.is_structural_change:
+            if entry.is_structural_change or entry.is_stat_only:
                 truncated_entries.append(self._render_full_entry(entry))
                 continue
 
-            truncated_entries.append(
-                f"{entry.path} ({entry.status}):\n{entry.preview_diff}\n[truncated to first {self.max_diff_file_lines} changed lines]"
-            )
+            truncated_entries.append(self._render_preview_entry(entry))
 
         header = (
             f"Total staged changes exceed {self.max_diff_size} characters. "
@@ -152,6 +826,110 @@ class GitStagedAnalyzer:
         )
         return [header, *truncated_entries], True
 
+    def _exceeds_char_limit(self, content_entries: List[StagedFileChange]) -> bool:
+        if self.max_diff_size is None:
+            return False
+        content_length = sum(
+            self._entry_content_length(entry) for entry in content_entries
+        )
+        return content_length > self.max_diff_size
+
+    def _retention_budget(self) -> int:
+        if self.max_diff_size is not None:
+            return self.max_diff_size
+        return self.max_diff_tokens * RETAINED_CHARS_PER_TOKEN
+
+    def _full_entry_tokens(self, entry: StagedFileChange) -> int:
+        header, hunks = split_patch_hunks(entry.full_diff)
+        return (
+            self.token_estimator.count(f"{entry.path}:")
+            + self.token_estimator.count(header)
+            + sum(self.token_estimator.count(hunk) for hunk in hunks)
+        )
+
+    def _pack_entries_into_token_budget(
+        self, entries: List[StagedFileChange]
+    ) -> List[str]:
+        """Fit whole hunks into ``max_diff_tokens``.
+
+        Files are visited from cheapest to most expensive and each one gets an
+        equal share of what is left, so small files are sent completely and the
+        unused share flows on to the larger files. A file whose hunks do not
+        fit falls back to its line-limited preview.
+        """
+
+        rendered: dict[int, str] = {}
+        remaining = self.max_diff_tokens
+        packable: List[tuple[int, int, StagedFileChange]] = []
+        for index, entry in enumerate(entries):
+            if entry.is_structural_change or entry.is_stat_only:
+                rendered[index] = self._render_full_entry(entry)
+                remaining -= self.token_estimator.count(rendered[index])
+                continue
+            cost = (
+                self.token_estimator.count(entry.preview_diff)
+                if entry.is_preview_only
+                else self._full_entry_tokens(entry)
+            )
+            packable.append((cost, index, entry))
+
+        packable.sort(key=lambda item: (item[0], item[1]))
+        for position, (_, index, entry) in enumerate(packable):
+            share = max(0, remaining) // (len(packable) - position)
+            text = self._pack_entry_hunks(entry, share)
+            rendered[index] = text
+            remaining -= self.token_estimator.count(text)
+
+        header = (
+            f"Total staged changes exceed the {self.max_diff_tokens}-token context "
+            "budget. Whole hunks are packed per file; files that do not fit use "
+            f"previews limited to {self.max_diff_file_lines} changed lines."
+        )
+        return [header, *(rendered[index] for index in range(len(entries)))]
+
+    def _pack_entry_hunks(self, entry: StagedFileChange, share: int) -> str:
+        if not entry.is_preview_only and self._full_entry_tokens(entry) <= share:
+            return self._render_full_entry(entry)
+        partial = self.render_partial_hunks(entry, share)
+        return partial or self._render_preview_entry(entry)
+
+    def render_partial_hunks(
+        self, entry: StagedFileChange, share: int
+    ) -> Optional[str]:
+        """Render the leading whole hunks of a patch that fit into ``share``.
+
+        Returns None unless some, but not all, hunks of a retained patch fit.
+        """
+
+        if entry.is_preview_only or entry.is_structural_change:
+            return None
+
+        header, hunks = split_patch_hunks(entry.full_diff)
+        title = f"{entry.path}:"
+        used = self.token_estimator.count(title) + self.token_estimator.count(header)
+        selected: List[str] = []
+        for hunk in hunks:
+            hunk_tokens = self.token_estimator.count(hunk)
+            if used + hunk_tokens > share:
+                break
+            selected.append(hunk)
+            used += hunk_tokens
+
+        if not selected or len(selected) == len(hunks):
+            return None
+
+        patch = "\n".join([header, *selected]) if header else "\n".join(selected)
+        return (
+            f"{entry.path} ({entry.status}):\n{patch}\n"
+            f"[truncated to {len(selected)} of {len(hunks)} hunks]"
+        )
+
+    def _render_preview_entry(self, entry: StagedFileChange) -> str:
+        return (
+            f"{entry.path} ({entry.status}):\n{entry.preview_diff}\n"
+            f"[truncated to first {self.max_diff_file_lines} changed lines]"
+        )
+
     def _get_staged_file_statuses(self) -> List[_StagedFileStatus]:
         """Return staged file statuses while preserving rename source paths."""
         try:
@@ -202,13 +980,7 @@ class GitStagedAnalyzer:
                 if self._is_ignored_path(path):
                     continue
 
-                status = {
-                    "A": "added",
-                    "M": "modified",
-                    "D": "deleted",
-                    "R": "renamed",
-                    "C": "copied",
-                }.get(status_code, "modified")
+                status = STATUS_NAMES.get(status_code, "modified")
                 statuses.append(
                     _StagedFileStatus(
                         path=path,
@@ -237,6 +1009,9 @@ class GitStagedAnalyzer:
 
         return f"{staged_file.status.title()} file: {staged_file.path}"
 
+    def _entry_content_length(self, entry: StagedFileChange) -> int:
+        return len(entry.path) + 2 + entry.content_length
+
     def _render_full_entry(self, entry: StagedFileChange) -> str:
         if entry.status == "deleted":
             return f"Deleted file: {entry.path}"
@@ -303,30 +1078,9 @@ class GitStagedAnalyzer:
                     return f"{file_name} has an unknown status."
 
     def _build_diff_preview(self, detailed_diff: str) -> str:
-        lines = detailed_diff.splitlines()
-        selected: List[str] = []
-        changed_count = 0
-
-        for line in lines:
-            if line.startswith("diff --git") or line.startswith("index "):
-                selected.append(line)
-                continue
-
-            if (
-                line.startswith("--- ")
-                or line.startswith("+++ ")
-                or line.startswith("@@")
-            ):
-                selected.append(line)
-                continue
-
-            if line.startswith("+") or line.startswith("-"):
-                selected.append(line)
-                changed_count += 1
-                if changed_count >= self.max_diff_file_lines:
-                    break
-
-        if not selected:
-            return "(No textual patch available for this file.)"
-
-        return "\n".join(selected)
+        preview = _DiffPreviewBuilder(self.max_diff_file_lines)
+        for line in detailed_diff.splitlines():
+            preview.add(line)
+            if preview.is_full:
+                break
+        return preview.build()
@@ -0,0 +1,117 @@
+"""Content-addressed SQLite cache for model results."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from cmai.core.logger_factory import LoggerFactory
+
+CACHE_DATABASE_NAME = "results.sqlite3"
+
+
+def build_result_key(parts: Iterable[object]) -> str:
+    payload = json.dumps([str(part) for part in parts])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """JSON payloads in one SQLite table with size-bounded LRU eviction.
+
+    The database runs in WAL mode with a busy timeout, so several ``cmai``
+    processes can read and write it at the same time. Any database error
+    degrades to a cache miss instead of failing the commit.
+    """
+
+    BUSY_TIMEOUT_SECONDS = 5.0
+
+    def __init__(self, cache_dir: Path, table: str, max_entries: int) -> None:
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+
+        self.logger = LoggerFactory().get_logger("ResultCache")
+        self.path = cache_dir / CACHE_DATABASE_NAME
+        self.table = table
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._disabled = False
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(
+                    f"SELECT payload FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                self.logger.debug(f"Result cache read failed: {e}")
+                return None
+
+    def put(self, key: str, payload: dict[str, Any]) -> None:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, payload, last_used) "
+                    "VALUES (?, ?, ?)",
+                    (key, json.dumps(payload, ensure_ascii=False), time.time()),
+                )
+                connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_used DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            except sqlite3.Error as e:
+                self.logger.debug(f"Result cache write failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._connection is not None or self._disabled:
+            return self._connection
+
+        try:
+            # Cached results describe staged source code; keep them private.
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_last_used "
+                f"ON {self.table} (last_used)"
+            )
+        except (sqlite3.Error, OSError) as e:
+            self.logger.debug(f"Result cache unavailable at {self.path}: {e}")
+            self._disabled = True
+            return None
+
+        self._connection = connection
+        return connection
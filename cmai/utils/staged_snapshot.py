@@ -0,0 +1,149 @@
+"""Cache of analyzed staged changes keyed by the index tree id."""
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, ClassVar, Iterable, Optional
+
+from cmai.core.logger_factory import LoggerFactory
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+@dataclass(frozen=True)
+class StagedSnapshot:
+    """Analyzed staged entries for one index state."""
+
+    key: Optional[str]
+    tree_id: Optional[str]
+    head_id: Optional[str]
+    entries: tuple[Any, ...]
+
+
+def build_snapshot_key(
+    tree_id: str, head_id: Optional[str], options: Iterable[object]
+) -> str:
+    """Combine the index tree, ``HEAD`` and analysis options into one key.
+
+    ``git diff --cached`` compares the index against ``HEAD``, so both ids are
+    needed; the analysis options change how entries are built.
+    """
+
+    payload = json.dumps(
+        [SNAPSHOT_FORMAT_VERSION, tree_id, head_id or "", *map(str, options)]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StagedSnapshotCache:
+    """Process-wide memory cache, optionally backed by JSON files on disk.
+
+    Without a ``cache_dir`` only the memory cache is used. On disk, snapshots
+    live in ``<cache_dir>/snapshots`` with owner-only permissions, since they
+    contain the staged patch text.
+    """
+
+    MAX_MEMORY_ENTRIES = 4
+    MAX_DISK_ENTRIES = 16
+    _memory: ClassVar["OrderedDict[str, StagedSnapshot]"] = OrderedDict()
+
+    def __init__(self, cache_dir: Optional[Path]) -> None:
+        self.logger = LoggerFactory().get_logger("StagedSnapshotCache")
+        self.directory = cache_dir / "snapshots" if cache_dir else None
+
+    def get(self, key: str, entry_type: type) -> Optional[StagedSnapshot]:
+        snapshot = self._memory.get(key)
+        if snapshot is not None:
+            self._memory.move_to_end(key)
+            self.logger.debug(f"Staged snapshot memory cache hit: {key[:12]}")
+            return snapshot
+
+        snapshot = self._load(key, entry_type)
+        if snapshot is not None:
+            self._remember(snapshot)
+            self.logger.debug(f"Staged snapshot disk cache hit: {key[:12]}")
+        return snapshot
+
+    def put(self, snapshot: StagedSnapshot) -> None:
+        if snapshot.key is None:
+            return
+        self._remember(snapshot)
+        self._store(snapshot)
+
+    @classmethod
+    def clear_memory(cls) -> None:
+        cls._memory.clear()
+
+    def _remember(self, snapshot: StagedSnapshot) -> None:
+        assert snapshot.key is not None
+        self._memory[snapshot.key] = snapshot
+        self._memory.move_to_end(snapshot.key)
+        while len(self._memory) > self.MAX_MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def _path_for(self, key: str) -> Optional[Path]:
+        if self.directory is None:
+            return None
+        return self.directory / f"{key}.json"
+
+    def _load(self, key: str, entry_type: type) -> Optional[StagedSnapshot]:
+        path = self._path_for(key)
+        if path is None or not path.is_file():
+            return None
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            entries = tuple(entry_type(**item) for item in data["entries"])
+            os.utime(path)
+            return StagedSnapshot(
+                key=key,
+                tree_id=data["tree_id"],
+                head_id=data.get("head_id"),
+                entries=entries,
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.debug(f"Ignoring unreadable staged snapshot {path}: {e}")
+            return None
+
+    def _store(self, snapshot: StagedSnapshot) -> None:
+        path = self._path_for(snapshot.key) if snapshot.key else None
+        if path is None:
+            return
+
+        payload = {
+            "tree_id": snapshot.tree_id,
+            "head_id": snapshot.head_id,
+            "entries": [asdict(entry) for entry in snapshot.entries],
+        }
+        try:
+            # Snapshots contain staged source code; keep them private.
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            file_descriptor, temp_name = tempfile.mkstemp(
+                dir=path.parent, prefix=".snapshot-", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(file_descriptor, "w", encoding="utf-8") as handle:
+                    json.dump(payload, handle, ensure_ascii=False)
+                os.replace(temp_name, path)
+            except BaseException:
+                Path(temp_name).unlink(missing_ok=True)
+                raise
+            self._prune()
+        except OSError as e:
+            self.logger.debug(f"Failed to store staged snapshot: {e}")
+
+    def _prune(self) -> None:
+        if self.directory is None:
+            return
+
+        snapshots = sorted(
+            self.directory.glob("*.json"),
+            key=lambda item: item.stat().st_mtime,
+            reverse=True,
+        )
+        for stale in snapshots[self.MAX_DISK_ENTRIES :]:
+            stale.unlink(missing_ok=True)
@@ -0,0 +1,16 @@
+import pytest
+
+from cmai.config.settings import settings
+from cmai.utils.staged_snapshot import StagedSnapshotCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep analysis caches out of the user's home directory."""
+
+    monkeypatch.setattr(
+        settings, "CACHE_DIR", str(tmp_path_factory.mktemp("cmai-cache"))
+    )
+    StagedSnapshotCache.clear_memory()
+    yield
+    StagedSnapshotCache.clear_memory()
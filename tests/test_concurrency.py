@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from cmai.core.concurrency import AdaptiveConcurrencyLimiter
+
+
+class RateLimited(Exception):
+    pass
+
+
+def _is_rate_limit(exc: BaseException) -> bool:
+    return isinstance(exc, RateLimited)
+
+
+@pytest.mark.anyio
+async def test_limiter_grows_on_success_and_halves_once_per_burst():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=8)
+
+    async def succeed():
+        async with limiter.slot(_is_rate_limit):
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(succeed() for _ in range(40)))
+    assert limiter.limit == 8
+    assert limiter.peak <= 8
+    assert limiter.current == 0
+
+    async def hit_rate_limit(release: asyncio.Event):
+        with pytest.raises(RateLimited):
+            async with limiter.slot(_is_rate_limit):
+                await release.wait()
+                raise RateLimited()
+
+    release = asyncio.Event()
+    burst = [asyncio.create_task(hit_rate_limit(release)) for _ in range(4)]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*burst)
+
+    assert limiter.limit == 4
+    assert limiter.current == 0
+
+
+@pytest.mark.anyio
+async def test_limiter_caps_in_flight_calls():
+    limiter = AdaptiveConcurrencyLimiter(initial=3, maximum=3)
+    in_flight = 0
+    observed = 0
+
+    async def work():
+        nonlocal in_flight, observed
+        async with limiter.slot(_is_rate_limit):
+            in_flight += 1
+            observed = max(observed, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+
+    await asyncio.gather(*(work() for _ in range(12)))
+
+    assert observed == 3
+    assert limiter.peak == 3
@@ -300,12 +300,6 @@ def test_ollama_uses_api_base_when_legacy_host_is_absent(
 ):
     from cmai.providers import ollama_provider
 
-    captured: dict[str, str] = {}
-
-    class FakeAsyncClient:
-        def __init__(self, *, host: str):
-            captured["host"] = host
-
     class FakeLoggerFactory:
         def get_logger(self, _name):
             return object()
@@ -313,20 +307,26 @@ def test_ollama_uses_api_base_when_legacy_host_is_absent(
         def get_stream_logger(self, _name):
             return object()
 
-    monkeypatch.setattr(ollama_provider, "AsyncClient", FakeAsyncClient)
     monkeypatch.setattr(ollama_provider, "LoggerFactory", lambda: FakeLoggerFactory())
+    monkeypatch.setattr(ollama_provider.settings, "PROVIDER", "ollama")
     monkeypatch.setattr(ollama_provider.settings, "OLLAMA_HOST", None)
     monkeypatch.setattr(
         ollama_provider.settings, "API_BASE", "http://ollama.example:11434"
     )
 
-    ollama_provider.OllamaProvider(model="test-model")
+    provider = ollama_provider.OllamaProvider(model="test-model")
+
+    assert provider.host == "http://ollama.example:11434"
+
+    # With a hosted global provider, API_BASE belongs to that provider.
+    monkeypatch.setattr(ollama_provider.settings, "PROVIDER", "openai")
+    provider = ollama_provider.OllamaProvider(model="test-model")
 
-    assert captured["host"] == "http://ollama.example:11434"
+    assert provider.host == "http://localhost:11434"
 
     monkeypatch.setattr(
         ollama_provider.settings, "OLLAMA_HOST", "http://legacy.example:11434"
     )
-    ollama_provider.OllamaProvider(model="test-model")
+    provider = ollama_provider.OllamaProvider(model="test-model")
 
-    assert captured["host"] == "http://legacy.example:11434"
+    assert provider.host == "http://legacy.example:11434"
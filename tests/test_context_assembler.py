@@ -0,0 +1,125 @@
+from cmai.core.context_assembler import (
+    FIDELITY_COLLAPSED,
+    FIDELITY_HUNKS,
+    FIDELITY_PATCH,
+    FIDELITY_STAT,
+    FIDELITY_STRUCTURAL,
+    FIDELITY_SUMMARY,
+    ContextAssembler,
+)
+from cmai.core.token_estimator import ApproximateTokenEstimator
+from cmai.utils.git_staged_analyzer import StagedFileChange
+
+
+def _entry(path: str, lines: int, **kwargs) -> StagedFileChange:
+    diff = "\n".join(
+        ["@@ -1 +1 @@"] + [f"+value_{path}_{index} = {index}" for index in range(lines)]
+    )
+    values = {
+        "path": path,
+        "status": "modified",
+        "full_diff": diff,
+        "preview_diff": "\n".join(diff.splitlines()[:3]),
+        "is_preview_only": False,
+        "added_lines": lines,
+        "removed_lines": 0,
+    }
+    values.update(kwargs)
+    return StagedFileChange(**values)
+
+
+def test_assembler_picks_one_representation_per_file_within_budget():
+    estimator = ApproximateTokenEstimator()
+    entries = [
+        _entry("src/small.py", 2),
+        _entry(
+            "src/large.py",
+            400,
+            preview_diff="\n".join(f"+value_{index} = {index}" for index in range(50)),
+        ),
+        StagedFileChange(
+            path="package-lock.json",
+            status="modified",
+            full_diff="Stat only (generated): +900 -12 lines, patch omitted.",
+            preview_diff="Stat only (generated): +900 -12 lines, patch omitted.",
+            is_preview_only=True,
+            added_lines=900,
+            removed_lines=12,
+            stat_only_reason="generated",
+        ),
+        StagedFileChange(
+            path="docs/old.md",
+            status="deleted",
+            full_diff="",
+            preview_diff="",
+            is_preview_only=False,
+        ),
+    ]
+    assembler = ContextAssembler(budget=300, estimator=estimator, preview_lines=50)
+
+    assembled = assembler.assemble(
+        entries, summaries={"src/large.py": "rework value table generation"}
+    )
+
+    fidelities = {item.path: item.fidelity for item in assembled.files}
+    assert fidelities == {
+        "src/small.py": FIDELITY_PATCH,
+        "src/large.py": FIDELITY_SUMMARY,
+        "package-lock.json": FIDELITY_STAT,
+        "docs/old.md": FIDELITY_STRUCTURAL,
+    }
+    assert assembled.tokens <= 300
+    assert sum("src/large.py" in item.text for item in assembled.files) == 1
+
+
+def test_assembler_sends_full_patches_when_everything_fits():
+    assembler = ContextAssembler(
+        budget=100_000, estimator=ApproximateTokenEstimator(), preview_lines=2
+    )
+    entries = [_entry("src/a.py", 10), _entry("src/b.py", 50)]
+
+    assembled = assembler.assemble(
+        entries, summaries={"src/a.py": "a", "src/b.py": "b"}
+    )
+
+    assert [item.fidelity for item in assembled.files] == [
+        FIDELITY_PATCH,
+        FIDELITY_PATCH,
+    ]
+    assert assembled.files[1].text == f"src/b.py (modified):\n{entries[1].full_diff}"
+
+
+def test_assembler_packs_leading_hunks_of_large_patches():
+    estimator = ApproximateTokenEstimator()
+    hunks = [
+        "\n".join(
+            [f"@@ -{start} +{start} @@"] + [f"+hunk_{start}_{n}" for n in range(30)]
+        )
+        for start in range(1, 6)
+    ]
+    entry = _entry("src/large.py", 150, full_diff="\n".join(hunks))
+
+    def packer(in_entry: StagedFileChange, share: int):
+        assert in_entry is entry
+        return f"src/large.py (modified):\n{hunks[0]}\n[truncated to 1 of 5 hunks]"
+
+    budget = estimator.count(hunks[0]) + 40
+    assembled = ContextAssembler(
+        budget=budget, estimator=estimator, preview_lines=2, hunk_packer=packer
+    ).assemble([entry])
+
+    assert [item.fidelity for item in assembled.files] == [FIDELITY_HUNKS]
+    assert assembled.tokens <= budget
+
+
+def test_assembler_collapses_stat_lines_that_do_not_fit():
+    estimator = ApproximateTokenEstimator()
+    entries = [_entry(f"src/module_{index}.py", index + 1) for index in range(40)]
+    assembler = ContextAssembler(budget=60, estimator=estimator, preview_lines=2)
+
+    assembled = assembler.assemble(entries)
+
+    assert assembled.tokens <= 60
+    assert assembled.files[-1].fidelity == FIDELITY_COLLAPSED
+    kept = len(assembled.files) - 1
+    assert assembled.files[-1].text.startswith(f"... and {40 - kept} more files")
@@ -0,0 +1,34 @@
+import pytest
+
+from cmai.core.deadline import (
+    STAGE_COLLECT,
+    STAGE_FINAL,
+    STAGE_SUMMARIES,
+    Deadline,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_stage_checkpoints_are_cumulative_shares_of_the_budget():
+    clock = FakeClock()
+    deadline = Deadline(10.0, clock=clock)
+
+    assert deadline.remaining(STAGE_COLLECT) == 1.0
+    assert deadline.remaining(STAGE_SUMMARIES) == 5.5
+
+    # Time a fast stage leaves over goes to the later stages.
+    clock.now += 0.2
+    assert deadline.remaining(STAGE_SUMMARIES) == pytest.approx(5.3)
+
+    clock.now += 6.0
+    assert deadline.expired(STAGE_SUMMARIES)
+    assert not deadline.expired(STAGE_FINAL)
+    assert deadline.remaining(STAGE_FINAL) == pytest.approx(3.3)
+    assert deadline.remaining() == pytest.approx(3.8)
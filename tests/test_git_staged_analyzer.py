@@ -1,5 +1,8 @@
+import io
 import subprocess
 
+import pytest
+
 from cmai.utils.git_staged_analyzer import GitStagedAnalyzer, StagedFileChange
 
 
@@ -153,3 +156,277 @@ def test_renamed_file_preserves_source_path_without_large_diff_warning(tmp_path)
     assert entries[0].full_diff == "Renamed file: docs/large.md -> guides/large.md"
     assert is_truncated is False
     assert rendered == ["Renamed file: docs/large.md -> guides/large.md"]
+
+
+def test_streamed_collection_matches_per_file_diffs(tmp_path):
+    repo = _initialize_repository(tmp_path)
+    (repo / "app.py").write_text("a\nb\nc\n", encoding="utf-8")
+    (repo / "docs").mkdir()
+    (repo / "docs" / "guide.md").write_text("x\n" * 20, encoding="utf-8")
+    (repo / "old.txt").write_text("remove me\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+    _run_git(repo, "commit", "-m", "initial")
+
+    (repo / "app.py").write_text("a\nB\nc\nd\n", encoding="utf-8")
+    (repo / "new file.txt").write_text("hello\n", encoding="utf-8")
+    (repo / "guides").mkdir()
+    _run_git(repo, "mv", "docs/guide.md", "guides/guide.md")
+    _run_git(repo, "rm", "old.txt")
+    _run_git(repo, "add", ".")
+
+    analyzer = GitStagedAnalyzer(repo_path=str(repo))
+    streamed = list(analyzer.iter_staged_entries())
+
+    without_blobs = [
+        (entry.path, entry.status, entry.old_path, entry.full_diff, entry.preview_diff)
+        for entry in streamed
+    ]
+    assert without_blobs == [
+        (entry.path, entry.status, entry.old_path, entry.full_diff, entry.preview_diff)
+        for entry in analyzer._collect_per_file()
+    ]
+    assert [(entry.path, entry.status, entry.old_path) for entry in streamed] == [
+        ("app.py", "modified", None),
+        ("guides/guide.md", "renamed", "docs/guide.md"),
+        ("new file.txt", "added", None),
+        ("old.txt", "deleted", None),
+    ]
+
+
+def test_raw_patch_stream_pairs_records_with_patches():
+    from cmai.utils.git_diff_parser import PatchSplitter, RawPatchStream
+
+    blob = "1" * 40
+    raw = (
+        f":100644 100644 {blob} {blob} M\0a.py\0"
+        f":100644 100644 {blob} {blob} R090\0old.py\0new.py\0\0"
+    )
+    patch = "\n".join(
+        [
+            "diff --git a/a.py b/a.py",
+            "--- a/a.py",
+            "+++ b/a.py",
+            "@@ -1,2 +1,2 @@",
+            "-diff --git a/fake b/fake",
+            "+value",
+            " context",
+            "\\ No newline at end of file",
+            "diff --git a/old.py b/new.py",
+            "similarity index 90%",
+            "rename from old.py",
+            "rename to new.py",
+        ]
+    )
+
+    reader = RawPatchStream(io.BytesIO((raw + patch).encode("utf-8")))
+    records = reader.read_records()
+    splitter = PatchSplitter()
+    patches = []
+    for line, _length in reader.iter_lines():
+        finished = splitter.feed(line)
+        if finished is not None:
+            patches.append(finished)
+    patches.append(splitter.finish())
+
+    assert [(record.path, record.old_path, record.score) for record in records] == [
+        ("a.py", None, None),
+        ("new.py", "old.py", 90),
+    ]
+    assert len(patches) == 2
+    assert patches[0][-1] == "\\ No newline at end of file"
+    assert "-diff --git a/fake b/fake" in patches[0]
+    assert patches[1][0] == "diff --git a/old.py b/new.py"
+
+
+def test_iter_staged_entries_keeps_only_previews_past_size_budget(tmp_path):
+    repo = _initialize_repository(tmp_path)
+    (repo / "small.py").write_text("print('ok')\n", encoding="utf-8")
+    (repo / "dump.sql").write_text(
+        "".join(f"insert into t values ({i});\n" for i in range(5_000)),
+        encoding="utf-8",
+    )
+    (repo / "zz.py").write_text("value = 1\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+
+    analyzer = GitStagedAnalyzer(repo_path=str(repo))
+    analyzer.max_diff_size = 500
+    analyzer.max_diff_file_lines = 5
+    stream = analyzer.iter_staged_entries()
+
+    first = next(stream)
+    assert first.path == "dump.sql"
+    assert first.is_preview_only is True
+    assert first.full_diff == first.preview_diff
+    assert first.preview_diff.count("\n+insert") == 5
+    assert first.content_length > 100_000
+
+    remaining = list(stream)
+    assert [entry.path for entry in remaining] == ["small.py", "zz.py"]
+    # Once the budget is exceeded, later files keep previews only.
+    assert all(entry.is_preview_only for entry in remaining)
+
+    _, is_truncated = analyzer.render_prompt_entries([first, *remaining])
+    assert is_truncated is True
+
+
+def test_raw_patch_stream_cuts_oversized_lines():
+    import io
+
+    from cmai.utils.git_diff_parser import RawPatchStream
+
+    payload = b"\0" + b"+" + b"x" * 100 + b"\nnext\n"
+    reader = RawPatchStream(io.BytesIO(payload), max_line_bytes=10)
+
+    assert reader.read_records() == []
+    assert list(reader.iter_lines()) == [("+xxxxxxxxx", 101), ("next", 4)]
+
+
+def test_staged_snapshot_is_reused_until_the_index_changes(tmp_path, monkeypatch):
+    from cmai.utils.staged_snapshot import StagedSnapshotCache
+
+    repo = _initialize_repository(tmp_path)
+    (repo / "app.py").write_text("print('a')\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+    monkeypatch.setattr(
+        "cmai.utils.git_staged_analyzer.settings.PERSIST_STAGED_SNAPSHOTS", True
+    )
+
+    collections = []
+    original_collect = GitStagedAnalyzer._collect_entries
+
+    def counting_collect(self):
+        collections.append(self.repo_path)
+        return original_collect(self)
+
+    monkeypatch.setattr(GitStagedAnalyzer, "_collect_entries", counting_collect)
+
+    first = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    second = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    assert second is first
+    assert len(collections) == 1
+
+    # A later run starts with an empty memory cache and reads the disk copy.
+    StagedSnapshotCache.clear_memory()
+    from_disk = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    assert from_disk.entries == first.entries
+    assert len(collections) == 1
+
+    (repo / "app.py").write_text("print('b')\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+    changed = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    assert changed.tree_id != first.tree_id
+    assert "+print('b')" in changed.entries[0].full_diff
+    assert len(collections) == 2
+
+
+def test_staged_snapshots_stay_off_disk_unless_persisted(tmp_path, monkeypatch):
+    from cmai.config.settings import settings
+
+    repo = _initialize_repository(tmp_path)
+    (repo / "app.py").write_text("print('a')\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+
+    snapshot = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    assert snapshot.key is not None
+    assert not (settings.resolve_cache_dir() / "snapshots").exists()
+
+    # With the cache off the index is not even written to a tree.
+    monkeypatch.setattr(
+        "cmai.utils.git_staged_analyzer.settings.ENABLE_STAGED_SNAPSHOT_CACHE", False
+    )
+    monkeypatch.setattr(
+        GitStagedAnalyzer,
+        "_get_index_tree_id",
+        lambda self: pytest.fail("git write-tree should not run"),
+    )
+    uncached = GitStagedAnalyzer(repo_path=str(repo)).get_staged_snapshot()
+    assert uncached.key is None
+    assert uncached.entries == snapshot.entries
+
+
+def test_numstat_prepass_excludes_generated_large_and_binary_patches(tmp_path):
+    repo = _initialize_repository(tmp_path)
+    (repo / ".gitattributes").write_text(
+        "gen/* linguist-generated\nlegacy.txt -diff\n", encoding="utf-8"
+    )
+    (repo / "gen").mkdir()
+    (repo / "gen" / "client.py").write_text("x = 1\n" * 10, encoding="utf-8")
+    (repo / "legacy.txt").write_text("legacy\n", encoding="utf-8")
+    (repo / "big.csv").write_text("row\n" * 30, encoding="utf-8")
+    (repo / "logo.dat").write_bytes(b"\0\1\2binary")
+    (repo / "main.py").write_text("print('ok')\n", encoding="utf-8")
+    _run_git(repo, "add", ".")
+
+    analyzer = GitStagedAnalyzer(repo_path=str(repo))
+    analyzer.stat_only_changed_lines = 20
+    stats = analyzer._get_staged_file_stats()
+    excluded = analyzer._patch_exclusions(stats)
+    entries = list(analyzer.iter_staged_entries())
+
+    assert sorted(excluded) == ["big.csv", "gen/client.py", "legacy.txt", "logo.dat"]
+    assert [(entry.path, entry.stat_only_reason) for entry in entries] == [
+        (".gitattributes", None),
+        ("big.csv", "large"),
+        ("gen/client.py", "generated"),
+        ("legacy.txt", "diff disabled"),
+        ("main.py", None),
+    ]
+    assert entries[1].full_diff == "Stat only (large): +30 -0 lines, patch omitted."
+    assert (entries[4].added_lines, entries[4].removed_lines) == (1, 0)
+
+    rendered, is_truncated = analyzer.render_prompt_entries(entries)
+    assert is_truncated is False
+    assert "gen/client.py:\nStat only (generated): +10 -0 lines" in rendered[2]
+
+
+def test_render_prompt_entries_packs_whole_hunks_into_token_budget():
+    analyzer = GitStagedAnalyzer()
+    analyzer.max_diff_size = None
+    analyzer.max_diff_file_lines = 1
+
+    def hunk(start: int) -> str:
+        return "\n".join(
+            [f"@@ -{start},2 +{start},2 @@"]
+            + [f"-old_value_{start}_{index}" for index in range(20)]
+            + [f"+new_value_{start}_{index}" for index in range(20)]
+        )
+
+    large_diff = "\n".join(
+        ["diff --git a/big.py b/big.py", "--- a/big.py", "+++ b/big.py"]
+        + [hunk(start) for start in (1, 100, 200)]
+    )
+    small_diff = "@@ -1 +1 @@\n-a\n+b"
+    entries = [
+        StagedFileChange(
+            path="big.py",
+            status="modified",
+            full_diff=large_diff,
+            preview_diff=analyzer._build_diff_preview(large_diff),
+            is_preview_only=False,
+        ),
+        StagedFileChange(
+            path="small.py",
+            status="modified",
+            full_diff=small_diff,
+            preview_diff=small_diff,
+            is_preview_only=False,
+        ),
+    ]
+    full_tokens = sum(analyzer._full_entry_tokens(entry) for entry in entries)
+    analyzer.max_diff_tokens = full_tokens - 50
+
+    assert analyzer.exceeds_prompt_budget(entries) is True
+    rendered, truncated = analyzer.render_prompt_entries(entries)
+
+    assert truncated is True
+    assert "token context budget" in rendered[0]
+    assert "@@ -1,2 +1,2 @@" in rendered[1]
+    assert "@@ -100,2 +100,2 @@" in rendered[1]
+    assert "@@ -200,2 +200,2 @@" not in rendered[1]
+    assert "[truncated to 2 of 3 hunks]" in rendered[1]
+    assert rendered[2] == f"small.py:\n{small_diff}"
+
+    analyzer.max_diff_tokens = full_tokens
+    assert analyzer.exceeds_prompt_budget(entries) is False
+    rendered, truncated = analyzer.render_prompt_entries(entries)
+    assert truncated is False
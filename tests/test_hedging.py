@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from cmai.core.hedging import (
+    HEDGE_PRIMARY,
+    HEDGE_SECONDARY,
+    MIN_LATENCY_SAMPLES,
+    HedgeOutcome,
+    HedgeStats,
+    hedged_call,
+)
+from cmai.providers.base import AIResponse
+
+
+def _response(content: str) -> AIResponse:
+    return AIResponse(content=content, model="m", provider="p")
+
+
+def _is_valid(response: AIResponse) -> bool:
+    return bool(response.content.strip())
+
+
+@pytest.mark.anyio
+async def test_hedge_wins_when_primary_is_slow_and_primary_is_cancelled():
+    primary_cancelled = asyncio.Event()
+
+    async def primary() -> AIResponse:
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return _response("slow")
+
+    async def hedge() -> AIResponse:
+        return _response("fast")
+
+    outcome = await hedged_call(primary, hedge, delay=0.01, is_valid=_is_valid)
+
+    assert outcome.response.content == "fast"
+    assert outcome.winner == HEDGE_SECONDARY
+    assert outcome.hedged
+    assert primary_cancelled.is_set()
+
+
+@pytest.mark.anyio
+async def test_hedge_is_not_sent_when_primary_answers_in_time():
+    hedge_calls = 0
+
+    async def primary() -> AIResponse:
+        return _response("feat: add app")
+
+    async def hedge() -> AIResponse:
+        nonlocal hedge_calls
+        hedge_calls += 1
+        return _response("other")
+
+    outcome = await hedged_call(primary, hedge, delay=1.0, is_valid=_is_valid)
+
+    assert outcome.winner == HEDGE_PRIMARY
+    assert not outcome.hedged
+    assert hedge_calls == 0
+
+
+@pytest.mark.anyio
+async def test_invalid_primary_answer_starts_hedge_immediately():
+    async def primary() -> AIResponse:
+        return _response("  ")
+
+    async def hedge() -> AIResponse:
+        return _response("fix: handle empty answers")
+
+    outcome = await hedged_call(primary, hedge, delay=30.0, is_valid=_is_valid)
+
+    assert outcome.winner == HEDGE_SECONDARY
+    assert outcome.response.content == "fix: handle empty answers"
+
+
+def test_hedge_stats_use_percentile_after_enough_samples():
+    stats = HedgeStats()
+    assert stats.percentile(90) is None
+
+    for latency in range(1, MIN_LATENCY_SAMPLES + 1):
+        stats.record(
+            HedgeOutcome(
+                response=_response("ok"),
+                winner=HEDGE_SECONDARY if latency == 1 else HEDGE_PRIMARY,
+                hedged=latency <= 2,
+                primary_latency=float(latency),
+            )
+        )
+
+    assert stats.percentile(90) == 9.0
+    assert stats.hedge_rate == pytest.approx(2 / MIN_LATENCY_SAMPLES)
+    assert HedgeStats.from_payload(stats.to_payload()) == stats
@@ -23,8 +23,8 @@ def _patch_staged_state(monkeypatch, is_truncated: bool = False):
         lambda self: entries,
     )
     monkeypatch.setattr(
-        "cmai.cli.session.GitStagedAnalyzer.render_prompt_entries",
-        lambda self, in_entries: (["ctx"], is_truncated),
+        "cmai.cli.session.GitStagedAnalyzer.exceeds_prompt_budget",
+        lambda self, in_entries: is_truncated,
     )
 
 
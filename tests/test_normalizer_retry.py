@@ -1,8 +1,13 @@
-import pytest
+import asyncio
+import subprocess
+import threading
 import time
 
+import pytest
+
+from cmai.core.deadline import Deadline
 from cmai.core.normalizer import FileDiffSummary, Normalizer
-from cmai.providers.base import AIResponse
+from cmai.providers.base import AIResponse, ProviderTimings
 from cmai.utils.git_staged_analyzer import StagedFileChange
 
 
@@ -62,6 +67,91 @@ async def test_call_provider_with_retry_does_not_retry_non_limit_error(monkeypat
         await normalizer._call_provider_with_retry(NonLimitProvider(), "test")
 
 
+class _Response:
+    def __init__(self, status_code: int, headers: dict[str, str]):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str]):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = _Response(status_code, headers)
+
+
+@pytest.mark.anyio
+async def test_call_provider_with_retry_honors_retry_after_and_transient_budget(
+    monkeypatch,
+):
+    normalizer = Normalizer()
+    errors = [
+        StatusError(429, {"retry-after": "0.5"}),
+        StatusError(503, {}),
+        StatusError(503, {}),
+    ]
+
+    class StatusProvider:
+        calls = 0
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            self.calls += 1
+            raise errors.pop(0)
+
+    monkeypatch.setattr("cmai.core.normalizer.settings.RETRY_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(
+        "cmai.core.normalizer.settings.RETRY_TRANSIENT_MAX_ATTEMPTS", 2
+    )
+    monkeypatch.setattr("cmai.core.normalizer.settings.RETRY_BASE_DELAY_SECONDS", 0.1)
+    monkeypatch.setattr("cmai.core.normalizer.settings.RETRY_MAX_DELAY_SECONDS", 1.0)
+
+    sleep_calls: list[float] = []
+
+    async def fake_sleep(seconds: float):
+        sleep_calls.append(seconds)
+
+    monkeypatch.setattr("cmai.core.normalizer.asyncio.sleep", fake_sleep)
+
+    provider = StatusProvider()
+    with pytest.raises(StatusError, match="503"):
+        await normalizer._call_provider_with_retry(provider, "test")
+
+    # The 429 and the 503s draw from separate attempt budgets.
+    assert provider.calls == 3
+    assert len(sleep_calls) == 2
+    assert 0.5 <= sleep_calls[0] <= 0.55
+    assert 0.0 <= sleep_calls[1] <= 0.1
+
+
+@pytest.mark.anyio
+async def test_call_provider_with_retry_gives_up_on_long_retry_after(monkeypatch):
+    normalizer = Normalizer()
+
+    class LongWaitProvider:
+        calls = 0
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            self.calls += 1
+            raise StatusError(429, {"retry-after": "3600"})
+
+    monkeypatch.setattr("cmai.core.normalizer.settings.RETRY_MAX_ATTEMPTS", 5)
+    monkeypatch.setattr("cmai.core.normalizer.settings.RETRY_MAX_DELAY_SECONDS", 8.0)
+
+    sleep_calls: list[float] = []
+
+    async def fake_sleep(seconds: float):
+        sleep_calls.append(seconds)
+
+    monkeypatch.setattr("cmai.core.normalizer.asyncio.sleep", fake_sleep)
+
+    provider = LongWaitProvider()
+    with pytest.raises(StatusError, match="429"):
+        await normalizer._call_provider_with_retry(provider, "test")
+
+    assert provider.calls == 1
+    assert sleep_calls == []
+
+
 def test_heuristic_split_ignores_deleted_and_renamed_files():
     normalizer = Normalizer()
     file_summaries = [
@@ -187,9 +277,20 @@ async def test_summarize_files_with_ai_keeps_order_and_uses_progress(monkeypatch
 
     monkeypatch.setattr("cmai.core.normalizer.tqdm", fake_tqdm)
 
-    def fake_summarize(index: int, entry: StagedFileChange, language: str):
+    in_flight = 0
+    max_in_flight = 0
+    shared_provider = object()
+
+    async def fake_summarize(
+        provider: object, index: int, entry: StagedFileChange, language: str
+    ):
+        nonlocal in_flight, max_in_flight
         del language
-        time.sleep((len(entries) - index) * 0.01)
+        assert provider is shared_provider
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep((len(entries) - index) * 0.01)
+        in_flight -= 1
         if entry.path == "b.py":
             return index, normalizer._heuristic_file_summary(entry)
         return (
@@ -205,12 +306,14 @@ async def test_summarize_files_with_ai_keeps_order_and_uses_progress(monkeypatch
 
     monkeypatch.setattr(
         normalizer,
-        "_summarize_file_with_ai_in_thread",
+        "_summarize_file_with_ai",
         fake_summarize,
     )
+    monkeypatch.setattr("cmai.core.normalizer.settings.MAX_PROVIDER_CONCURRENCY", 2)
+    monkeypatch.setattr("cmai.core.normalizer.settings.DIFF_SUMMARY_BATCH_TOKENS", 0)
 
     file_summaries = await normalizer._summarize_files_with_ai(
-        provider=object(),
+        provider=shared_provider,
         entries=entries,
         language="English",
     )
@@ -225,3 +328,523 @@ async def test_summarize_files_with_ai_keeps_order_and_uses_progress(monkeypatch
     assert bar.desc == "Summarizing files"
     assert bar.unit == "file"
     assert bar.current == 3
+    assert max_in_flight == 2
+
+
+@pytest.mark.anyio
+async def test_summarize_files_with_ai_batches_small_files(monkeypatch):
+    normalizer = Normalizer()
+    entries = [
+        StagedFileChange(
+            path=f"src/{name}.py",
+            status="modified",
+            full_diff="",
+            preview_diff=f"+{name} = 1",
+            is_preview_only=True,
+        )
+        for name in ("a", "b", "c")
+    ]
+
+    class BatchProvider:
+        def __init__(self):
+            self.prompts: list[str] = []
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            del kwargs
+            self.prompts.append(prompt)
+            if "=== File 1 ===" in prompt:
+                content = (
+                    "File: src/a.py\nSummary: add a\nTags: core\nArea: core\n\n"
+                    "File: src/c.py\nSummary: add c\nTags: core\nArea: api\n"
+                )
+            else:
+                content = "Summary: add b alone\nTags: core\nArea: core"
+            return AIResponse(content=content, model="m", provider="p")
+
+    monkeypatch.setattr("cmai.core.normalizer.settings.DIFF_SUMMARY_BATCH_TOKENS", 1000)
+    provider = BatchProvider()
+
+    file_summaries = await normalizer._summarize_files_with_ai(
+        provider=provider,
+        entries=entries,
+        language="English",
+    )
+
+    assert [item.summary for item in file_summaries] == [
+        "add a",
+        "add b alone",
+        "add c",
+    ]
+    assert file_summaries[2].area == "api"
+    assert len(provider.prompts) == 2
+    assert "File path: src/b.py" in provider.prompts[1]
+    # The reducer's call budget is charged for calls made, not files summarized.
+    assert normalizer._summary_calls == 2
+
+
+@pytest.mark.anyio
+async def test_file_summaries_are_cached_by_blob_ids():
+    entries = [
+        StagedFileChange(
+            path="src/a.py",
+            status="modified",
+            full_diff="",
+            preview_diff="+a = 1",
+            is_preview_only=True,
+            old_blob="1" * 40,
+            new_blob="2" * 40,
+        )
+    ]
+
+    class SummaryProvider:
+        calls = 0
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            del prompt, kwargs
+            self.calls += 1
+            return AIResponse(
+                content="Summary: change a\nTags: core\nArea: core",
+                model="test",
+                provider="test",
+            )
+
+    provider = SummaryProvider()
+
+    first = await Normalizer()._summarize_files_with_ai(
+        provider=provider, entries=entries, language="English"
+    )
+    second = await Normalizer()._summarize_files_with_ai(
+        provider=provider, entries=entries, language="English"
+    )
+
+    assert provider.calls == 1
+    assert second == first
+
+    restaged = [
+        StagedFileChange(
+            path="src/a.py",
+            status="modified",
+            full_diff="",
+            preview_diff="+a = 2",
+            is_preview_only=True,
+            old_blob="1" * 40,
+            new_blob="3" * 40,
+        )
+    ]
+    await Normalizer()._summarize_files_with_ai(
+        provider=provider, entries=restaged, language="English"
+    )
+    assert provider.calls == 2
+
+
+def _init_staged_repository(repo) -> None:
+    for command in (
+        ["git", "init"],
+        ["git", "config", "user.email", "test@example.com"],
+        ["git", "config", "user.name", "Test User"],
+    ):
+        subprocess.run(command, cwd=repo, check=True, capture_output=True)
+    (repo / "app.py").write_text("print('ok')\n", encoding="utf-8")
+    subprocess.run(["git", "add", "app.py"], cwd=repo, check=True)
+
+
+class MessageProvider:
+    def __init__(self):
+        self.final_calls = 0
+        self.summary_calls = 0
+
+    async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+        del prompt
+        if "diff_content" in kwargs:
+            self.final_calls += 1
+            return AIResponse(
+                content="feat: add app", model="m", provider="p", tokens_used=7
+            )
+        self.summary_calls += 1
+        return AIResponse(content="Summary: add app", model="m", provider="p")
+
+
+@pytest.mark.anyio
+async def test_final_message_is_cached_by_staged_patch_id(tmp_path, monkeypatch):
+    _init_staged_repository(tmp_path)
+    provider = MessageProvider()
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: provider
+    )
+
+    async def generate(user_input: str, use_cache: bool = True) -> AIResponse:
+        return await Normalizer().normalize_commit(
+            user_input=user_input,
+            prompt_template="{user_input}\n{diff_content}\n{language}",
+            repo_path=str(tmp_path),
+            use_cache=use_cache,
+        )
+
+    first = await generate("add app")
+    second = await generate("add app")
+    assert provider.final_calls == 1
+    assert second == first
+
+    await generate("something else")
+    assert provider.final_calls == 2
+
+    await generate("add app", use_cache=False)
+    assert provider.final_calls == 3
+
+    def commit_only(path: str, content: str) -> None:
+        (tmp_path / path).write_text(content, encoding="utf-8")
+        subprocess.run(["git", "add", path], cwd=tmp_path, check=True)
+        subprocess.run(
+            ["git", "commit", "--quiet", "-m", path, "--", path],
+            cwd=tmp_path,
+            check=True,
+        )
+
+    # An unrelated commit moves HEAD but leaves the staged patch unchanged.
+    commit_only("other.py", "x = 1\n")
+    await generate("add app")
+    assert provider.final_calls == 3
+
+    (tmp_path / "app.py").write_text("print('changed')\n", encoding="utf-8")
+    subprocess.run(["git", "add", "app.py"], cwd=tmp_path, check=True)
+    await generate("add app")
+    assert provider.final_calls == 4
+
+    # Restaging the same hunk on a rebased file changes its blob ids and line
+    # numbers, but not its patch id.
+    base = "".join(f"line {number}\n" for number in range(8))
+    commit_only("lib.py", base)
+    (tmp_path / "lib.py").write_text(base + "added\n", encoding="utf-8")
+    subprocess.run(["git", "add", "lib.py"], cwd=tmp_path, check=True)
+    await generate("add app")
+    assert provider.final_calls == 5
+
+    commit_only("lib.py", "header\n" + base)
+    (tmp_path / "lib.py").write_text("header\n" + base + "added\n", encoding="utf-8")
+    subprocess.run(["git", "add", "lib.py"], cwd=tmp_path, check=True)
+    await generate("add app")
+    assert provider.final_calls == 5
+
+
+@pytest.mark.anyio
+async def test_deadline_falls_back_to_local_message_on_time(tmp_path, monkeypatch):
+    _init_staged_repository(tmp_path)
+
+    class HangingProvider(MessageProvider):
+        hanging = True
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            if self.hanging:
+                await asyncio.sleep(30)
+            return await super().normalize_commit(prompt, **kwargs)
+
+    provider = HangingProvider()
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: provider
+    )
+    normalizer = Normalizer()
+
+    async def generate(deadline=None) -> AIResponse:
+        return await normalizer.normalize_commit(
+            user_input="add app",
+            prompt_template="{user_input}\n{diff_content}\n{language}",
+            repo_path=str(tmp_path),
+            deadline=deadline,
+        )
+
+    started_at = time.monotonic()
+    result = await generate(Deadline(0.5))
+
+    assert time.monotonic() - started_at < 0.5
+    assert result.provider == "local"
+    assert result.content
+
+    # Results degraded by the deadline are not cached.
+    provider.hanging = False
+    result = await generate()
+    assert result.content == "feat: add app"
+
+
+@pytest.mark.anyio
+async def test_stages_are_routed_to_their_own_providers(tmp_path, monkeypatch):
+    _init_staged_repository(tmp_path)
+    created: dict[object, MessageProvider] = {}
+
+    def fake_create_provider(provider_name=None, api_key=None, model=None, **kwargs):
+        return created.setdefault((provider_name, model), MessageProvider())
+
+    monkeypatch.setattr("cmai.core.normalizer.create_provider", fake_create_provider)
+    monkeypatch.setattr("cmai.core.normalizer.settings.SUMMARY_PROVIDER", "ollama")
+    monkeypatch.setattr("cmai.core.normalizer.settings.SUMMARY_MODEL", "qwen3:8b")
+    monkeypatch.setattr("cmai.core.normalizer.settings.SUMMARY_MAX_TOKENS", 256)
+    monkeypatch.setattr(
+        "cmai.core.normalizer.settings.SUMMARY_ENABLE_THINKING", False
+    )
+
+    normalizer = Normalizer()
+    stage_providers: dict[str, MessageProvider] = {}
+    create_stage_providers = normalizer._create_stage_providers
+
+    def record_stage_providers():
+        stage_providers.update(create_stage_providers())
+        return stage_providers
+
+    monkeypatch.setattr(
+        normalizer, "_create_stage_providers", record_stage_providers
+    )
+
+    result = await normalizer.normalize_commit(
+        user_input="add app",
+        prompt_template="{user_input}\n{diff_content}\n{language}",
+        repo_path=str(tmp_path),
+    )
+
+    summary_provider = stage_providers["SUMMARY"]
+    default_provider = created[(None, None)]
+    # Overrides go on a copy, leaving the (possibly pooled) instance untouched.
+    assert summary_provider is not created[("ollama", "qwen3:8b")]
+    assert not hasattr(created[("ollama", "qwen3:8b")], "max_tokens")
+    assert stage_providers["FINAL"] is default_provider
+    assert result.content == "feat: add app"
+    assert summary_provider.summary_calls == 1
+    assert summary_provider.final_calls == 0
+    assert summary_provider.max_tokens == 256
+    assert summary_provider.enable_thinking is False
+    assert default_provider.summary_calls == 0
+    assert default_provider.final_calls == 1
+
+
+@pytest.mark.anyio
+async def test_hedged_final_call_echoes_only_the_winning_answer(monkeypatch):
+    requests: list[bool] = []
+
+    class SlowThenFastProvider:
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            requests.append(kwargs.get("silent", False))
+            if len(requests) == 1:
+                await asyncio.sleep(30)
+            return AIResponse(content="feat: add app", model="m", provider="p")
+
+    monkeypatch.setattr("cmai.core.normalizer.settings.ENABLE_HEDGING", True)
+    monkeypatch.setattr("cmai.core.normalizer.settings.HEDGE_DELAY_SECONDS", 0.01)
+    normalizer = Normalizer()
+    echoed: list[str] = []
+    monkeypatch.setattr(normalizer.stream_logger, "info", echoed.append)
+
+    response = await normalizer._generate_final_message(
+        SlowThenFastProvider(), "prompt", diff_content="diff"
+    )
+
+    assert response.content == "feat: add app"
+    assert requests == [True, True]
+    assert echoed == ["feat: add app\n\n"]
+
+
+@pytest.mark.anyio
+async def test_final_prompt_starts_with_static_instructions(tmp_path, monkeypatch):
+    _init_staged_repository(tmp_path)
+    requests: list[tuple[str, dict]] = []
+
+    class RecordingProvider(MessageProvider):
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            if "diff_content" in kwargs:
+                requests.append((prompt, kwargs))
+            return await super().normalize_commit(prompt, **kwargs)
+
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider",
+        lambda *args, **kwargs: RecordingProvider(),
+    )
+    normalizer = Normalizer()
+    for additional_prompt in ("mention the tests", "keep it short"):
+        await normalizer.normalize_commit(
+            user_input="add app",
+            prompt_template="{user_input}\n{diff_content}\n{language}",
+            repo_path=str(tmp_path),
+            additional_prompt=additional_prompt,
+        )
+
+    (first, first_kwargs), (second, second_kwargs) = requests
+    rules_end, stable_end = first_kwargs["cache_breakpoints"]
+    assert first.startswith("Commit format requirements:")
+    assert "add app" not in first[:rules_end]
+    assert second_kwargs["cache_breakpoints"] == [rules_end, stable_end]
+    assert first[:stable_end] == second[:stable_end]
+    assert first[stable_end:] != second[stable_end:]
+
+
+@pytest.mark.anyio
+async def test_regenerate_reuses_diff_insights_for_unchanged_snapshot(
+    tmp_path, monkeypatch
+):
+    _init_staged_repository(tmp_path)
+    provider = MessageProvider()
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: provider
+    )
+    monkeypatch.setattr("cmai.core.normalizer.settings.ENABLE_SUMMARY_CACHE", False)
+    normalizer = Normalizer()
+
+    async def generate(**kwargs) -> AIResponse:
+        return await normalizer.normalize_commit(
+            user_input="add app",
+            prompt_template="{user_input}\n{diff_content}\n{language}",
+            repo_path=str(tmp_path),
+            **kwargs,
+        )
+
+    await generate()
+    assert provider.summary_calls > 0
+    summary_calls = provider.summary_calls
+
+    await generate(previous_message="feat: add app", validation_errors=["too short"])
+    assert provider.summary_calls == summary_calls
+    assert provider.final_calls == 2
+
+    (tmp_path / "app.py").write_text("print('changed')\n", encoding="utf-8")
+    subprocess.run(["git", "add", "app.py"], cwd=tmp_path, check=True)
+    await generate(previous_message="feat: add app")
+    assert provider.summary_calls > summary_calls
+
+
+@pytest.mark.anyio
+async def test_merged_mode_reads_split_decision_from_final_call(tmp_path, monkeypatch):
+    _init_staged_repository(tmp_path)
+    (tmp_path / "README.md").write_text("# App\n", encoding="utf-8")
+    subprocess.run(["git", "add", "README.md"], cwd=tmp_path, check=True)
+    prompts: list[str] = []
+    final_kwargs: list[dict] = []
+
+    class SplitProvider:
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            prompts.append(prompt)
+            if "diff_content" not in kwargs:
+                return AIResponse(content="Summary: add app", model="m", provider="p")
+            final_kwargs.append(kwargs)
+            return AIResponse(
+                content=(
+                    "feat: add app\n"
+                    "=== split decision ===\n"
+                    "Suggest Split: yes\n"
+                    "Confidence: 0.9\n"
+                    "Split Reason: two topics\n"
+                    "Split Groups:\n"
+                    "- app entry point\n"
+                    "- tooling"
+                ),
+                model="m",
+                provider="p",
+            )
+
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: SplitProvider()
+    )
+    monkeypatch.setattr("cmai.core.normalizer.settings.AGGREGATE_MODE", "merged")
+    monkeypatch.setattr("cmai.core.normalizer.settings.ENABLE_SPLIT_SUGGESTION", True)
+
+    response = await Normalizer().normalize_commit(
+        user_input="add app",
+        prompt_template="{user_input}\n{diff_content}\n{language}",
+        repo_path=str(tmp_path),
+    )
+
+    assert response.content == "feat: add app"
+    assert response.suggest_split is True
+    assert response.split_reason == "two topics"
+    assert response.split_groups == ["app entry point", "tooling"]
+    assert len(final_kwargs) == 1
+    assert not any("Aggregate Summary:" in prompt for prompt in prompts)
+    # The raw answer carries the block, so it is not streamed to the user.
+    assert final_kwargs[0]["silent"] is True
+
+
+@pytest.mark.anyio
+async def test_merged_mode_skips_split_decision_for_a_single_area(
+    tmp_path, monkeypatch
+):
+    _init_staged_repository(tmp_path)
+    provider = MessageProvider()
+    final_prompts: list[str] = []
+    normalize_commit = provider.normalize_commit
+
+    async def record(prompt: str, **kwargs) -> AIResponse:
+        if "diff_content" in kwargs:
+            final_prompts.append(prompt)
+        return await normalize_commit(prompt, **kwargs)
+
+    provider.normalize_commit = record
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: provider
+    )
+    monkeypatch.setattr("cmai.core.normalizer.settings.AGGREGATE_MODE", "merged")
+    monkeypatch.setattr("cmai.core.normalizer.settings.ENABLE_SPLIT_SUGGESTION", True)
+
+    await Normalizer().normalize_commit(
+        user_input="add app",
+        prompt_template="{user_input}\n{diff_content}\n{language}",
+        repo_path=str(tmp_path),
+    )
+
+    assert final_prompts
+    assert "=== split decision ===" not in final_prompts[0]
+
+
+@pytest.mark.anyio
+async def test_local_models_are_warmed_up_once_and_timings_are_collected(
+    tmp_path, monkeypatch
+):
+    _init_staged_repository(tmp_path)
+    warmed = threading.Event()
+    warm_up_calls: list[tuple[str, int]] = []
+    request_sizes: list[int] = []
+
+    class LocalProvider(MessageProvider):
+        host = "http://localhost:11434"
+        model = "qwen3:8b"
+        num_ctx = None
+
+        def context_size(self, needed_tokens: int) -> int:
+            request_sizes.append(needed_tokens)
+            return 16384
+
+        def warm_up(self):
+            warm_up_calls.append((self.model, self.num_ctx))
+            warmed.set()
+
+        async def normalize_commit(self, prompt: str, **kwargs) -> AIResponse:
+            response = await super().normalize_commit(prompt, **kwargs)
+            return response.model_copy(
+                update={"timings": ProviderTimings(eval_seconds=0.5, eval_tokens=4)}
+            )
+
+    local = LocalProvider()
+    monkeypatch.setattr(
+        "cmai.core.normalizer.create_provider", lambda *args, **kwargs: local
+    )
+    monkeypatch.setattr("cmai.core.normalizer.settings.OLLAMA_WARMUP", True)
+    monkeypatch.setattr("cmai.core.normalizer.settings.SUMMARY_MAX_TOKENS", 128)
+
+    normalizer = Normalizer()
+
+    async def generate() -> AIResponse:
+        return await normalizer.normalize_commit(
+            user_input="add app",
+            prompt_template="{user_input}\n{diff_content}\n{language}",
+            repo_path=str(tmp_path),
+            use_cache=False,
+        )
+
+    result = await generate()
+
+    assert result.content == "feat: add app"
+    assert warmed.wait(timeout=5)
+    # The summary stage gets its own copy, but both target the same model and
+    # share the context size picked for the final prompt.
+    assert warm_up_calls == [("qwen3:8b", 16384)]
+    assert len(set(request_sizes)) == 1
+    assert result.timings.eval_tokens == 4
+    assert len(normalizer._provider_timings) == 2
+
+    # Regenerating with the same Normalizer does not warm the model again.
+    await generate()
+    assert len(warm_up_calls) == 1
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from cmai.core.retry_policy import RETRY_RATE_LIMIT, RETRY_TRANSIENT, classify_error
+from cmai.providers.anthropic_provider import AnthropicProvider
+from cmai.providers.base import cached_tokens_from_usage
+from cmai.providers.http_transport import (
+    ProviderStreamError,
+    ServerSentEvent,
+    SSEDecoder,
+)
+from cmai.providers.ollama_provider import OllamaProvider, normalize_ollama_host
+from cmai.providers.openai_provider import OpenAIProvider
+from cmai.providers.provider_factory import close_provider_pool, create_provider
+from cmai.providers.zai_provider import ZhipuAiProvider
+
+
+def test_anthropic_content_blocks_mark_cache_breakpoints():
+    prompt = "rules\n\nstaged changes\n\nvalidation errors"
+    first = len("rules")
+    second = len("rules\n\nstaged changes")
+
+    blocks = AnthropicProvider._build_content_blocks(prompt, [second, first])
+
+    assert "".join(block["text"] for block in blocks) == prompt
+    assert [block["text"] for block in blocks] == [
+        "rules",
+        "\n\nstaged changes",
+        "\n\nvalidation errors",
+    ]
+    assert [block.get("cache_control") for block in blocks] == [
+        {"type": "ephemeral"},
+        {"type": "ephemeral"},
+        None,
+    ]
+    assert AnthropicProvider._build_content_blocks(prompt, []) == [
+        {"type": "text", "text": prompt}
+    ]
+
+
+def test_cached_tokens_are_read_from_openai_compatible_usage():
+    usage = SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+
+    assert cached_tokens_from_usage(usage) == 1024
+    assert cached_tokens_from_usage(SimpleNamespace(prompt_tokens_details=None)) is None
+    usage_dict = {"prompt_tokens_details": {"cached_tokens": 5}}
+    assert cached_tokens_from_usage(usage_dict) == 5
+
+
+def _zai_provider(monkeypatch, handler):
+    monkeypatch.setattr("cmai.providers.openai_provider.settings.API_KEY", "test-key")
+    monkeypatch.setattr("cmai.providers.openai_provider.settings.API_BASE", None)
+    provider = ZhipuAiProvider(model="glm-test")
+    provider.client = httpx.AsyncClient(
+        base_url="https://zai.test/", transport=httpx.MockTransport(handler)
+    )
+    return provider
+
+
+def _sse(*chunks):
+    lines = [f"data: {json.dumps(chunk)}" for chunk in chunks] + ["data: [DONE]"]
+    return "\n\n".join(lines) + "\n\n"
+
+
+@pytest.mark.anyio
+async def test_zai_provider_streams_concurrent_requests_on_one_loop(monkeypatch):
+    in_flight = 0
+    both_started = asyncio.Event()
+
+    async def handler(request):
+        nonlocal in_flight
+        in_flight += 1
+        if in_flight == 2:
+            both_started.set()
+        # Only returns once the other request is in flight as well.
+        await asyncio.wait_for(both_started.wait(), timeout=5)
+        body = _sse(
+            {"choices": [{"delta": {"content": "feat: add"}}]},
+            {
+                "choices": [{"delta": {"content": " parser"}}],
+                "usage": {
+                    "total_tokens": 42,
+                    "prompt_tokens_details": {"cached_tokens": 8},
+                },
+            },
+        )
+        return httpx.Response(200, text=body)
+
+    provider = _zai_provider(monkeypatch, handler)
+
+    first, second = await asyncio.gather(
+        provider.normalize_commit("prompt", silent=True),
+        provider.normalize_commit("prompt", silent=True),
+    )
+
+    assert first.content == second.content == "feat: add parser"
+    assert first.tokens_used == 42
+    assert first.cached_tokens == 8
+
+
+@pytest.mark.anyio
+async def test_zai_provider_errors_keep_status_and_headers(monkeypatch):
+    def handler(request):
+        return httpx.Response(
+            429, headers={"retry-after": "3"}, json={"error": "rate limited"}
+        )
+
+    provider = _zai_provider(monkeypatch, handler)
+
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        await provider.normalize_commit("prompt", silent=True)
+
+    decision = classify_error(excinfo.value)
+    assert decision.kind == RETRY_RATE_LIMIT
+    assert decision.retry_after == 3
+
+
+@pytest.mark.anyio
+async def test_factory_pools_providers_over_one_http_client(monkeypatch):
+    monkeypatch.setattr("cmai.providers.provider_factory.settings.API_KEY", "k1")
+    monkeypatch.setattr("cmai.providers.provider_factory.settings.API_BASE", None)
+    monkeypatch.setattr(
+        "cmai.providers.provider_factory.settings.ENABLE_PROVIDER_POOL", True
+    )
+
+    first = create_provider("zai", model="glm-a", log_creation=False)
+    again = create_provider("zai", model="glm-a", log_creation=False)
+    other_model = create_provider("zai", model="glm-b", log_creation=False)
+    other_key = create_provider(
+        "zai", api_key="k2", model="glm-a", log_creation=False
+    )
+    unpooled = create_provider("zai", model="glm-a", log_creation=False, pooled=False)
+
+    assert again is first
+    assert other_model is not first and other_key is not first
+    assert unpooled is not first
+    assert first.client is other_model.client is other_key.client
+    assert unpooled.client is not first.client
+
+    await close_provider_pool()
+
+    assert first.client.is_closed
+    assert create_provider("zai", model="glm-a", log_creation=False) is not first
+    await close_provider_pool()
+    assert not unpooled.client.is_closed
+    await unpooled.aclose()
+    assert unpooled.client.is_closed
+
+
+def test_factory_does_not_pool_outside_an_event_loop(monkeypatch):
+    monkeypatch.setattr("cmai.providers.provider_factory.settings.API_KEY", "k1")
+    monkeypatch.setattr(
+        "cmai.providers.provider_factory.settings.ENABLE_PROVIDER_POOL", True
+    )
+
+    first = create_provider("zai", model="glm-a", log_creation=False)
+
+    assert create_provider("zai", model="glm-a", log_creation=False) is not first
+
+
+def test_routed_providers_do_not_inherit_another_providers_api_settings(
+    monkeypatch,
+):
+    from cmai.core.stage_routing import StageRoute, route_credentials
+
+    monkeypatch.setattr("cmai.config.settings.settings.PROVIDER", "openai")
+    monkeypatch.setattr("cmai.config.settings.settings.API_KEY", "openai-key")
+    monkeypatch.setattr(
+        "cmai.config.settings.settings.API_BASE", "https://api.openai.test/v1"
+    )
+    monkeypatch.setattr("cmai.config.settings.settings.OLLAMA_HOST", None)
+
+    # The same provider keeps the global settings unless the stage sets its own.
+    assert route_credentials("SUMMARY", StageRoute(model="small")) == {}
+    assert route_credentials(
+        "SUMMARY", StageRoute(api_base="https://proxy.test/v1")
+    ) == {"api_base": "https://proxy.test/v1"}
+
+    with pytest.raises(ValueError, match="SUMMARY_API_KEY"):
+        route_credentials("SUMMARY", StageRoute(provider="anthropic"))
+
+    credentials = route_credentials(
+        "FINAL", StageRoute(provider="anthropic", api_key="anthropic-key")
+    )
+    anthropic = create_provider(
+        "anthropic",
+        model="claude-test",
+        log_creation=False,
+        pooled=False,
+        **credentials,
+    )
+    assert anthropic.api_key == "anthropic-key"
+    assert anthropic.url == "https://api.anthropic.com/v1/messages"
+
+    credentials = route_credentials("SUMMARY", StageRoute(provider="ollama"))
+    ollama = create_provider(
+        "ollama", model="qwen3:8b", log_creation=False, pooled=False, **credentials
+    )
+    assert ollama.host == "http://localhost:11434"
+
+    credentials = route_credentials(
+        "SUMMARY", StageRoute(provider="ollama", api_base="gpu-box")
+    )
+    ollama = create_provider(
+        "ollama", model="qwen3:8b", log_creation=False, pooled=False, **credentials
+    )
+    assert ollama.host == "http://gpu-box:11434"
+
+
+def test_thinking_stages_need_room_beyond_the_thinking_budget(monkeypatch):
+    from cmai.core.stage_routing import StageRoute, validate_stage_route
+
+    monkeypatch.setattr("cmai.config.settings.settings.PROVIDER", "openai")
+    monkeypatch.setattr("cmai.config.settings.settings.ENABLE_THINKING", True)
+    monkeypatch.setattr("cmai.config.settings.settings.THINKING_BUDGET", 1024)
+    monkeypatch.setattr("cmai.config.settings.settings.MAX_TOKEN", 8192)
+
+    with pytest.raises(ValueError, match="SUMMARY_MAX_TOKENS=256"):
+        validate_stage_route(
+            "SUMMARY", StageRoute(provider="anthropic", max_tokens=256)
+        )
+    validate_stage_route(
+        "SUMMARY",
+        StageRoute(provider="anthropic", max_tokens=256, enable_thinking=False),
+    )
+    validate_stage_route("SUMMARY", StageRoute(provider="anthropic"))
+    # Other providers have no such constraint.
+    validate_stage_route("SUMMARY", StageRoute(max_tokens=256))
+
+
+def test_sse_decoder_joins_data_lines_and_skips_comments():
+    decoder = SSEDecoder()
+    lines = [
+        ": keep-alive",
+        "event: content_block_delta",
+        'data: {"a":',
+        "data: 1}",
+        "",
+        "",
+        "data:[DONE]",
+    ]
+
+    events = [event for event in map(decoder.feed, lines) if event is not None]
+
+    assert events == [ServerSentEvent("content_block_delta", '{"a":\n1}')]
+    assert events[0].json() == {"a": 1}
+    assert decoder.flush() == ServerSentEvent("message", "[DONE]")
+    assert decoder.flush() is None
+
+
+def _mock_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.anyio
+async def test_openai_provider_streams_chat_completions(monkeypatch):
+    monkeypatch.setattr("cmai.providers.openai_provider.settings.API_KEY", "sk")
+    monkeypatch.setattr(
+        "cmai.providers.openai_provider.settings.API_BASE", "https://llm.test/v1/"
+    )
+    requests: list[httpx.Request] = []
+
+    def handler(request):
+        requests.append(request)
+        body = _sse(
+            {"choices": [{"delta": {"reasoning_content": "hmm"}}]},
+            {"choices": [{"delta": {"content": "fix: "}}]},
+            {"choices": [{"delta": {"content": "typo"}}]},
+            {"choices": [], "usage": {"total_tokens": 9}},
+        )
+        return httpx.Response(200, text=body)
+
+    provider = OpenAIProvider(model="gpt-test", http_client=_mock_client(handler))
+    result = await provider.normalize_commit("prompt", silent=True)
+
+    assert result.content == "fix: typo"
+    assert result.tokens_used == 9
+    assert str(requests[0].url) == "https://llm.test/v1/chat/completions"
+    assert requests[0].headers["authorization"] == "Bearer sk"
+    assert json.loads(requests[0].content)["stream_options"] == {
+        "include_usage": True
+    }
+
+
+@pytest.mark.anyio
+async def test_anthropic_provider_streams_messages_and_raises_stream_errors(
+    monkeypatch,
+):
+    monkeypatch.setattr("cmai.providers.anthropic_provider.settings.API_KEY", "ak")
+    monkeypatch.setattr("cmai.providers.anthropic_provider.settings.API_BASE", None)
+    monkeypatch.setattr(
+        "cmai.providers.anthropic_provider.settings.ENABLE_THINKING", False
+    )
+    events = [
+        (
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "usage": {"input_tokens": 10, "cache_read_input_tokens": 90}
+                },
+            },
+        ),
+        ("ping", {"type": "ping"}),
+        (
+            "content_block_delta",
+            {
+                "type": "content_block_delta",
+                "delta": {"type": "text_delta", "text": "docs"},
+            },
+        ),
+        (
+            "message_delta",
+            {"type": "message_delta", "usage": {"output_tokens": 5}},
+        ),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    overloaded = False
+
+    def handler(request):
+        assert str(request.url) == "https://api.anthropic.com/v1/messages"
+        assert request.headers["x-api-key"] == "ak"
+        stream = events
+        if overloaded:
+            stream = events[:1] + [
+                (
+                    "error",
+                    {
+                        "type": "error",
+                        "error": {"type": "overloaded_error", "message": "busy"},
+                    },
+                )
+            ]
+        body = "".join(
+            f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in stream
+        )
+        return httpx.Response(200, text=body)
+
+    provider = AnthropicProvider(
+        model="claude-test", http_client=_mock_client(handler)
+    )
+    result = await provider.normalize_commit("prompt", silent=True)
+
+    assert result.content == "docs"
+    assert result.tokens_used == 105
+    assert result.cached_tokens == 90
+
+    overloaded = True
+    with pytest.raises(ProviderStreamError) as excinfo:
+        await provider.normalize_commit("prompt", silent=True)
+    assert classify_error(excinfo.value).kind == RETRY_TRANSIENT
+
+
+@pytest.mark.anyio
+async def test_ollama_provider_streams_ndjson(monkeypatch):
+    monkeypatch.setattr("cmai.providers.ollama_provider.settings.OLLAMA_HOST", None)
+    monkeypatch.setattr("cmai.providers.ollama_provider.settings.API_BASE", None)
+
+    monkeypatch.setattr(
+        "cmai.providers.ollama_provider.settings.OLLAMA_KEEP_ALIVE", "30m"
+    )
+    monkeypatch.setattr(
+        "cmai.providers.ollama_provider.settings.OLLAMA_MIN_NUM_CTX", 4096
+    )
+    monkeypatch.setattr(
+        "cmai.providers.ollama_provider.settings.OLLAMA_MAX_NUM_CTX", 32768
+    )
+    payloads: list[dict] = []
+
+    def handler(request):
+        assert str(request.url) == "http://localhost:11434/api/chat"
+        payloads.append(json.loads(request.content))
+        lines = [
+            {"message": {"content": "<thi"}},
+            {"message": {"content": "nk>plan</th"}},
+            {"message": {"content": "ink>\n\nchore: "}},
+            {"message": {"content": "bump"}},
+            {
+                "done": True,
+                "prompt_eval_count": 3,
+                "eval_count": 4,
+                "load_duration": 2_500_000_000,
+                "eval_duration": 500_000_000,
+            },
+        ]
+        body = "\n".join(json.dumps(line) for line in lines)
+        return httpx.Response(200, text=body)
+
+    provider = OllamaProvider(model="qwen3:8b", http_client=_mock_client(handler))
+    result = await provider.normalize_commit("prompt", silent=True)
+
+    assert result.content == "chore: bump"
+    assert result.tokens_used == 7
+    assert result.timings.load_seconds == 2.5
+    assert result.timings.eval_seconds == 0.5
+    assert result.timings.eval_tokens == 4
+    assert payloads[0]["keep_alive"] == "30m"
+    assert payloads[0]["options"] == {"num_ctx": 4096}
+
+    # Prompts that do not fit double num_ctx until they do, up to the cap.
+    provider.max_tokens = 256
+    assert provider.resolve_num_ctx("word " * 5000) == 8192
+    assert provider.resolve_num_ctx("word " * 100_000) == 32768
+    # A run-level num_ctx is reused by smaller requests.
+    provider.num_ctx = provider.context_size(10_000)
+    assert provider.num_ctx == 16384
+    assert provider.resolve_num_ctx("prompt") == 16384
+    assert normalize_ollama_host("localhost") == "http://localhost:11434"
+    assert normalize_ollama_host("https://gpu.test:443/") == "https://gpu.test:443"
+
+
+def test_ollama_warm_up_preloads_model_with_keep_alive(monkeypatch):
+    monkeypatch.setattr("cmai.providers.ollama_provider.settings.OLLAMA_HOST", None)
+    monkeypatch.setattr("cmai.providers.ollama_provider.settings.API_BASE", None)
+    monkeypatch.setattr(
+        "cmai.providers.ollama_provider.settings.OLLAMA_KEEP_ALIVE", "1h"
+    )
+    monkeypatch.setattr(
+        "cmai.providers.ollama_provider.settings.OLLAMA_MIN_NUM_CTX", 4096
+    )
+    requests: list[tuple[str, dict]] = []
+
+    def fake_post(url, json, timeout):
+        requests.append((url, json))
+        request = httpx.Request("POST", url)
+        body = {"done": True, "done_reason": "load", "load_duration": 3_000_000_000}
+        return httpx.Response(200, json=body, request=request)
+
+    monkeypatch.setattr("cmai.providers.ollama_provider.httpx.post", fake_post)
+
+    timings = OllamaProvider(model="qwen3:8b").warm_up()
+
+    assert timings.load_seconds == 3.0
+    assert requests == [
+        (
+            "http://localhost:11434/api/generate",
+            {"model": "qwen3:8b", "keep_alive": "1h", "options": {"num_ctx": 4096}},
+        )
+    ]
+
+
+def test_provider_factory_does_not_import_vendor_sdks():
+    code = (
+        "import sys\n"
+        "from cmai.providers.provider_factory import ProviderFactory\n"
+        "ProviderFactory()\n"
+        "loaded = {'openai', 'anthropic', 'zai', 'ollama'} & set(sys.modules)\n"
+        "assert not loaded, loaded\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,53 @@
+from cmai.providers.reasoning_parser import ReasoningStreamParser
+
+
+def _feed_all(parser: ReasoningStreamParser, chunks):
+    deltas = [parser.feed(chunk) for chunk in chunks]
+    deltas.append(parser.finish())
+    return deltas
+
+
+def test_think_tags_split_across_chunks():
+    text = "<think>plan the\nchange</think>\n\nfeat: add parser"
+    parser = ReasoningStreamParser()
+
+    deltas = _feed_all(parser, list(text))
+
+    assert parser.reasoning_text == "plan the\nchange"
+    assert parser.answer_text == "\n\nfeat: add parser"
+    assert "".join(delta.reasoning for delta in deltas) == parser.reasoning_text
+    assert sum(delta.opens_reasoning for delta in deltas) == 1
+    assert sum(delta.opens_answer for delta in deltas) == 1
+
+
+def test_marker_pairs_separate_reasoning_and_answer():
+    parser = ReasoningStreamParser()
+
+    _feed_all(parser, ["**Thinking:** check the ", "diff\n**Ans", "wer:** fix: typo"])
+
+    assert parser.reasoning_text == " check the diff\n"
+    assert parser.answer_text == " fix: typo"
+
+
+def test_plain_content_is_answer_and_partial_markers_are_flushed():
+    parser = ReasoningStreamParser()
+
+    first = parser.feed("fix: handle <thi")
+    assert first.answer == "fix: handle "
+    assert first.opens_answer
+
+    last = parser.finish()
+    assert last.answer == "<thi"
+    assert not last.opens_answer
+    assert parser.answer_text == "fix: handle <thi"
+    assert parser.reasoning == []
+
+
+def test_unclosed_think_block_and_separate_reasoning_field():
+    parser = ReasoningStreamParser()
+
+    assert parser.feed_reasoning("from a field").opens_reasoning
+    _feed_all(parser, ["<think>still ", "thinking"])
+
+    assert parser.reasoning_text == "from a fieldstill thinking"
+    assert parser.answer_text == ""
@@ -0,0 +1,90 @@
+import random
+
+from cmai.core.retry_policy import (
+    RETRY_FATAL,
+    RETRY_RATE_LIMIT,
+    RETRY_TRANSIENT,
+    backoff_delay,
+    classify_error,
+    retry_after_from_headers,
+)
+
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict[str, str]):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = _Response(status_code, headers or {})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def test_classify_error_uses_status_codes_and_error_types():
+    rate_limited = classify_error(APIStatusError(429, {"Retry-After": "7"}))
+    assert rate_limited.kind == RETRY_RATE_LIMIT
+    assert rate_limited.retry_after == 7.0
+
+    unavailable = classify_error(APIStatusError(503, {"Retry-After": "2"}))
+    assert unavailable.kind == RETRY_TRANSIENT
+    assert unavailable.retry_after == 2.0
+    # Retry hints only count on rate limits and 503s.
+    assert classify_error(APIStatusError(500, {"Retry-After": "30"})).retry_after is None
+    assert classify_error(APIStatusError(409)).kind == RETRY_FATAL
+    bucket_headers = {
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert classify_error(APIStatusError(502, bucket_headers)).retry_after is None
+    assert classify_error(APIStatusError(429, bucket_headers)).retry_after == 360.0
+    assert classify_error(APIConnectionError("reset by peer")).kind == RETRY_TRANSIENT
+    assert classify_error(APIStatusError(400)).kind == RETRY_FATAL
+    assert classify_error(RuntimeError("network disconnected")).kind == RETRY_FATAL
+    # Gateways that report quota errors with other status codes.
+    assert classify_error(RuntimeError("403 - RPM limit exceeded")).kind == (
+        RETRY_RATE_LIMIT
+    )
+    # Billing quota errors are permanent, even when sent as a 429.
+    insufficient_quota = APIStatusError(429)
+    insufficient_quota.args = ("Error code: 429 - {'code': 'insufficient_quota'}",)
+    assert classify_error(insufficient_quota).kind == RETRY_FATAL
+
+
+def test_retry_after_from_headers_prefers_exhausted_bucket():
+    assert retry_after_from_headers({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_from_headers({"Retry-After": "3"}) == 3.0
+    buckets = {
+        "x-ratelimit-remaining-requests": "12",
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert retry_after_from_headers(buckets, rate_limited=True) == 360.0
+    assert retry_after_from_headers(buckets) is None
+    # Buckets with capacity left did not cause the rate limit.
+    assert (
+        retry_after_from_headers(
+            {"x-ratelimit-reset-requests": "20ms", "x-ratelimit-reset-tokens": "2s"},
+            rate_limited=True,
+        )
+        is None
+    )
+    assert retry_after_from_headers({"content-type": "application/json"}) is None
+
+
+def test_backoff_delay_applies_full_jitter_within_cap():
+    rng = random.Random(0)
+    delays = [backoff_delay(4, 0.5, 2.0, rng=rng) for _ in range(200)]
+
+    assert all(0.0 <= delay <= 2.0 for delay in delays)
+    assert min(delays) < 0.5 < max(delays)
+    assert 10.0 <= backoff_delay(1, 0.5, 20.0, retry_after=10.0, rng=rng) <= 10.05
+    # Server hints are capped at the maximum delay as well.
+    assert backoff_delay(1, 0.5, 2.0, retry_after=3600.0, rng=rng) == 2.0
@@ -0,0 +1,56 @@
+import pytest
+
+from cmai.core.summary_reducer import HierarchicalSummaryReducer, SummaryNode
+
+
+def _nodes(count: int) -> list[SummaryNode]:
+    return [
+        SummaryNode(
+            f"pkg{index % 5}/module{index % 3}/file{index}.py", f"change {index}"
+        )
+        for index in range(count)
+    ]
+
+
+@pytest.mark.anyio
+async def test_reducer_covers_every_file_with_bounded_fan_in():
+    prompts: list[str] = []
+
+    async def call(prompt: str) -> str:
+        prompts.append(prompt)
+        assert prompt.count("\n- ") <= 4
+        return f"summary {len(prompts)}"
+
+    reducer = HierarchicalSummaryReducer(
+        call, fan_in=4, concurrency=3, max_calls=1000, language="English"
+    )
+
+    result = await reducer.reduce(_nodes(300))
+
+    assert result.repo_summary.startswith("summary ")
+    assert len(result.directory_summaries) <= 4
+    assert sum(node.file_count for node in result.directory_summaries) == 300
+    assert result.calls == len(prompts)
+    assert result.depth <= 6
+
+
+@pytest.mark.anyio
+async def test_reducer_merges_locally_once_call_budget_is_spent():
+    calls = 0
+
+    async def call(prompt: str) -> str:
+        nonlocal calls
+        del prompt
+        calls += 1
+        return "model summary"
+
+    reducer = HierarchicalSummaryReducer(
+        call, fan_in=4, concurrency=2, max_calls=3, language="English"
+    )
+
+    result = await reducer.reduce(_nodes(100))
+
+    assert calls == 3
+    assert result.calls == 3
+    assert result.repo_summary
+    assert sum(node.file_count for node in result.directory_summaries) == 100
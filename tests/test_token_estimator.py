@@ -0,0 +1,44 @@
+from cmai.config.settings import Settings
+from cmai.core.token_estimator import (
+    ApproximateTokenEstimator,
+    get_token_estimator,
+    resolve_context_window,
+    resolve_diff_token_budget,
+)
+
+
+def test_approximate_estimator_counts_code_and_cjk_text():
+    estimator = ApproximateTokenEstimator()
+
+    assert estimator.count("") == 0
+    assert estimator.count("value") == 2
+    assert estimator.count("x = 1\n") == 4
+    assert estimator.count("修复登录") == 4
+    assert estimator.count("修复登录") == 4
+
+
+def test_approximate_mode_skips_exact_tokenizers():
+    estimator = get_token_estimator("gpt-4o", "approximate")
+
+    assert estimator.name == "approximate"
+
+
+def test_diff_token_budget_uses_context_window_share():
+    config = Settings(PROVIDER="openai", MODEL="gpt-4o", MAX_TOKEN=4000)
+
+    assert resolve_context_window(config) == 128_000
+    assert resolve_diff_token_budget(config) == 60_000
+
+    config = Settings(PROVIDER="ollama", MODEL="my-local-model", MAX_TOKEN=4000)
+    assert resolve_diff_token_budget(config) == 2_048
+
+    config = Settings(MODEL="gpt-4o", MAX_DIFF_TOKENS=1234)
+    assert resolve_diff_token_budget(config) == 1234
+
+
+def test_diff_token_budget_follows_the_routed_final_model():
+    config = Settings(PROVIDER="ollama", MODEL="my-local-model", MAX_TOKEN=4000)
+
+    assert resolve_diff_token_budget(
+        config, model="gpt-4o", provider="openai", max_output_tokens=1000
+    ) == 63_000